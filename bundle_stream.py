@@ -0,0 +1,212 @@
+import os
+import io
+import re
+import json
+import logging
+from package_archive import split_archive_path, get_archive
+from resource_cache import load_resource
+
+try:
+    import ijson
+except ImportError:
+    ijson = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_STREAM_THRESHOLD_MB = 8
+ENTRY_RESOURCE = "entry.item.resource"
+# Element path of a streamed entry resource, as a whole-file walk of the Bundle would see it
+ENTRY_PATH = "Bundle.entry.resource"
+# Characters read at a time by the fallback parser
+STREAM_CHUNK_CHARS = 256 * 1024
+
+_decoder = json.JSONDecoder()
+_whitespace = re.compile(r'[ \t\n\r]*')
+_threshold_bytes = DEFAULT_STREAM_THRESHOLD_MB * 1024 * 1024
+
+
+def configure_stream_threshold(threshold_mb):
+    """Example files larger than threshold_mb are streamed one entry at a time"""
+    global _threshold_bytes
+    _threshold_bytes = int(threshold_mb * 1024 * 1024)
+    logger.info(f"Streaming examples over {threshold_mb} MB with {'ijson' if ijson else 'the json module'}")
+
+
+def get_stream_threshold():
+    return _threshold_bytes
+
+
+def _file_size(path):
+    archive, member = split_archive_path(path)
+    if archive is None:
+        return os.path.getsize(path)
+    return get_archive(archive).size(member)
+
+
+##
+## Streaming parsers: yield each entry.resource, then the resource with an empty entry list
+##
+def _iter_ijson(stream):
+    """Event-driven parse with ijson; only one entry resource is ever built at a time"""
+    shell = ijson.ObjectBuilder()
+    builder = None
+    for prefix, event, value in ijson.parse(stream, use_float=True):
+        if builder is not None:
+            builder.event(event, value)
+            if prefix == ENTRY_RESOURCE and event in ('end_map', 'end_array'):
+                if isinstance(builder.value, dict):
+                    yield builder.value
+                builder = None
+        elif prefix == ENTRY_RESOURCE and event in ('start_map', 'start_array'):
+            builder = ijson.ObjectBuilder()
+            builder.event(event, value)
+        elif prefix == '' and event == 'map_key' and value == 'entry':
+            # Keep the entry key where it was, so the shell's element order matches the file
+            shell.event(event, value)
+            shell.event('start_array', None)
+            shell.event('end_array', None)
+        elif prefix == 'entry' or prefix.startswith('entry.'):
+            continue
+        else:
+            shell.event(event, value)
+    yield shell.value
+
+
+def _skip(text, pos):
+    return _whitespace.match(text, pos).end()
+
+
+class _ChunkedText:
+    """
+    JSON text read from a stream in chunks. Only the value being decoded (and the
+    chunk it ends in) is held; text before it is dropped as parsing moves on.
+    """
+
+    def __init__(self, stream, chunk_size):
+        self.stream = stream
+        self.chunk_size = chunk_size
+        self.text = ''
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self, size):
+        chunk = self.stream.read(size)
+        if not chunk:
+            self.eof = True
+            return False
+        self.text = self.text[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """The next non-whitespace character, or '' at the end of the stream"""
+        while True:
+            self.pos = _skip(self.text, self.pos)
+            if self.pos < len(self.text):
+                return self.text[self.pos]
+            if not self._fill(self.chunk_size):
+                return ''
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expecting '{char}' at position {self.pos}")
+        self.pos += 1
+
+    def decode(self):
+        """
+        The next JSON value. More text is read until the value decodes and the character
+        after it is in memory too (so a number isn't cut short at a chunk boundary);
+        each extra read is twice the last, so a large value costs linear time.
+        """
+        self.peek()
+        size = self.chunk_size
+        while True:
+            try:
+                value, end = _decoder.raw_decode(self.text, self.pos)
+                if self.eof or _skip(self.text, end) < len(self.text):
+                    self.pos = end
+                    return value
+            except ValueError:
+                if self.eof:
+                    raise
+            if self._fill(size):
+                size *= 2
+
+
+def _iter_stream(stream, chunk_size=STREAM_CHUNK_CHARS):
+    """
+    Fallback without ijson: walk the top-level object of a text stream with
+    JSONDecoder.raw_decode, decoding one entry at a time, so only a chunk of the
+    source and a single entry are held rather than the file or its parsed tree.
+    """
+    reader = _ChunkedText(stream, chunk_size)
+    shell = {}
+    reader.expect('{')
+    while reader.peek() not in ('}', ''):
+        key = reader.decode()
+        reader.expect(':')
+        if key == 'entry' and reader.peek() == '[':
+            shell[key] = []
+            reader.expect('[')
+            while reader.peek() not in (']', ''):
+                entry = reader.decode()
+                if isinstance(entry, dict) and isinstance(entry.get('resource'), dict):
+                    yield entry['resource']
+                if reader.peek() == ',':
+                    reader.expect(',')
+            reader.expect(']')
+        else:
+            shell[key] = reader.decode()
+        if reader.peek() == ',':
+            reader.expect(',')
+    reader.expect('}')
+    yield shell
+
+
+def _iter_text(text, chunk_size=STREAM_CHUNK_CHARS):
+    """_iter_stream over JSON text already in memory"""
+    yield from _iter_stream(io.StringIO(text), chunk_size)
+
+
+def _open_binary(path):
+    archive, member = split_archive_path(path)
+    if archive is None:
+        return open(path, 'rb')
+    return get_archive(archive).open(member)
+
+
+def stream_bundle_resources(path):
+    """
+    Parse a (Bundle) file incrementally, yielding each entry.resource in turn and
+    finally the top-level resource with its entry list emptied (the key kept in
+    place). Files and tarball members are read as streams, never whole.
+    """
+    with _open_binary(path) as stream:
+        if ijson is not None:
+            yield from _iter_ijson(stream)
+        else:
+            with io.TextIOWrapper(stream, encoding='utf-8-sig') as text:
+                yield from _iter_stream(text)
+
+
+def iter_example_resources(path, threshold_bytes=None):
+    """
+    (entry path, resource) for an example file. A file up to the streaming threshold
+    is loaded whole (through the shared resource cache) and yielded as (None, resource).
+    A larger one is streamed: each entry.resource is yielded as (ENTRY_PATH, entry
+    resource), followed by (None, the Bundle with an empty entry list), and nothing is
+    cached. Either way the file is one example; the entries are parts of it.
+    """
+    if threshold_bytes is None:
+        threshold_bytes = _threshold_bytes
+    if threshold_bytes <= 0 or _file_size(path) <= threshold_bytes:
+        yield None, load_resource(path)
+        return
+    logger.info(f"Streaming large example {path}")
+    resources = stream_bundle_resources(path)
+    previous = next(resources, None)
+    for resource in resources:
+        yield ENTRY_PATH, previous
+        previous = resource
+    if previous is not None:
+        yield None, previous
@@ -0,0 +1,96 @@
+import re
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def _compile_patterns(patterns):
+    """
+    One regex for a list of path patterns. '*' matches any run of characters and a
+    pattern also covers everything below it, so 'Observation.meta' matches
+    'Observation.meta.tag'. Returns None for an empty list.
+    """
+    patterns = [p for p in (patterns or []) if p]
+    if not patterns:
+        return None
+    parts = [re.escape(p).replace(r'\*', '.*') for p in patterns]
+    return re.compile(r'(?:' + '|'.join(parts) + r')(?:\..*)?\Z')
+
+
+##
+## CodingExtractor: every coded element of a resource in one walk of its tree
+##
+class CodingExtractor:
+    """
+    Walks a resource once and finds (path, system, code) for every element that
+    carries both a system and a code: Codings (wherever they are: CodeableConcepts,
+    valueCoding, extensions, contained and Bundle entry resources) and Quantities
+    with a coded unit. Bare code primitives (status, gender, ...) have no system and
+    so can't be validated against a CodeSystem; they aren't reported.
+
+    Paths look like 'Observation.code.coding', with list indexes left out, as in
+    membership.collect_codings_with_paths. A path is reported if it matches an allow
+    pattern (or there are none) and no deny pattern; denied subtrees aren't walked.
+
+    Args:
+        allow: path patterns to report ('*' is a wildcard, a pattern covers its descendants)
+        deny: path patterns never to report
+    """
+
+    def __init__(self, allow=None, deny=None):
+        self.allow = list(allow or [])
+        self.deny = list(deny or [])
+        self._allow = _compile_patterns(self.allow)
+        self._deny = _compile_patterns(self.deny)
+        self._decisions = {}
+
+    def _walkable(self, path):
+        decision = self._decisions.get(path)
+        if decision is None:
+            denied = self._deny is not None and self._deny.match(path) is not None
+            allowed = self._allow is None or self._allow.match(path) is not None
+            decision = (not denied, allowed)
+            self._decisions[path] = decision
+        return decision
+
+    def extract(self, resource, path=None):
+        """
+        List of (path, system, code) in document order, duplicates included. path is
+        the resource's element path, by default its resourceType.
+        """
+        found = []
+        self._walk(resource, path if path is not None else resource.get('resourceType') or '', found)
+        return found
+
+    def _walk(self, node, path, found):
+        if isinstance(node, dict):
+            walk, report = self._walkable(path)
+            if not walk:
+                return
+            system, code = node.get('system'), node.get('code')
+            if report and isinstance(system, str) and isinstance(code, str) and system.strip() and code.strip():
+                found.append((path, system, code))
+            for key, value in node.items():
+                if isinstance(value, (dict, list)):
+                    self._walk(value, f"{path}.{key}" if path else key, found)
+        elif isinstance(node, list):
+            for item in node:
+                if isinstance(item, (dict, list)):
+                    self._walk(item, path, found)
+
+    def codings(self, resource):
+        """Unique (system, code) pairs in the order they are found"""
+        return list(dict.fromkeys((system, code) for _, system, code in self.extract(resource)))
+
+
+_extractor = CodingExtractor()
+
+def configure_coding_paths(allow=None, deny=None):
+    """Set the allow/deny path patterns used for every example from now on"""
+    global _extractor
+    _extractor = CodingExtractor(allow, deny)
+    logger.info(f"Coding extraction paths: allow {_extractor.allow or 'all'}, deny {_extractor.deny or 'none'}")
+    return _extractor
+
+def get_coding_extractor():
+    return _extractor
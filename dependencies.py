@@ -0,0 +1,242 @@
+import os
+import re
+import json
+import hashlib
+import logging
+import tempfile
+import threading
+from package_archive import load_json, path_exists, strip_archive_suffix
+
+logger = logging.getLogger(__name__)
+
+GRAPH_CACHE_FILE = "dependency-graphs.json"
+VERSION_ALIASES = ("dev", "current", "cibuild")
+_graph_file_lock = threading.Lock()
+_version_pattern = re.compile(r'^(\d+)(?:\.(\d+|x|\*))?(?:\.(\d+|x|\*))?(?:-([0-9A-Za-z.-]+))?(?:\+.*)?$')
+
+
+##
+## FHIR package versions: semver with x wildcards and the dev/current/cibuild aliases
+##
+def parse_version(version):
+    """
+    (major, minor, patch, prerelease) for a semver version, or None if it isn't one.
+    Missing minor/patch parts are 0; prerelease is '' for a release.
+    """
+    match = _version_pattern.match(version or '')
+    if not match or any(part in ('x', '*') for part in match.groups()[1:3]):
+        return None
+    major, minor, patch, prerelease = match.groups()
+    return int(major), int(minor or 0), int(patch or 0), prerelease or ''
+
+
+def version_key(version):
+    """Sort key: numeric parts, then a release above its prereleases (semver precedence)"""
+    parsed = parse_version(version)
+    if parsed is None:
+        return (-1, -1, -1, 0, ())
+    major, minor, patch, prerelease = parsed
+    identifiers = tuple((0, int(p), '') if p.isdigit() else (1, 0, p) for p in prerelease.split('.')) if prerelease else ()
+    return (major, minor, patch, 0 if prerelease else 1, identifiers)
+
+
+def version_matches(requested, version):
+    """
+    Does a cached version satisfy a dependency version? Supports exact versions,
+    x/* wildcards (4.0.x, 1.x), npm-style ^ and ~ ranges and 'latest'/'*'.
+    Prereleases only match when asked for explicitly.
+    """
+    requested = (requested or '').strip()
+    if requested == version:
+        return True
+    parsed = parse_version(version)
+    if parsed is None:
+        return False
+    if requested in ('', '*', 'x', 'latest'):
+        return not parsed[3]
+    if requested[0] in '^~':
+        base = parse_version(requested[1:])
+        if base is None or parsed[3] and parsed[:3] != base[:3]:
+            return False
+        if version_key(version) < version_key(requested[1:]):
+            return False
+        if requested[0] == '~':
+            return parsed[:2] == base[:2]
+        if base[0] > 0:
+            return parsed[0] == base[0]
+        return parsed[:2] == base[:2]
+    parts = requested.split('-', 1)[0].split('.')
+    if not any(part in ('x', '*') for part in parts):
+        return False
+    if parsed[3]:
+        return False
+    for wanted, have in zip(parts, parsed[:3]):
+        if wanted in ('x', '*'):
+            break
+        if not wanted.isdigit() or int(wanted) != have:
+            return False
+    return True
+
+
+##
+## DependencyResolver: transitive package dependencies from the FHIR package cache
+##
+class DependencyResolver:
+    """
+    Resolves the full dependency graph of a set of packages against a FHIR package
+    cache. The cache folder is listed once; each package name is resolved to one
+    cached version (the first request for a name wins, as npm's flat install does),
+    and each resolved package's package.json is read once.
+
+    Versions are chosen as: the exact name#version; for dev/current/cibuild a cached
+    version ending in that alias; otherwise the highest version satisfying the request
+    (x wildcards, ^ and ~ ranges); failing that the highest cached version, with a warning.
+
+    Args:
+        fhir_cache_path: root of the FHIR package cache
+        graph_cache_dir: folder for the on-disk memo of resolved graphs (None: don't keep one)
+    """
+
+    def __init__(self, fhir_cache_path, graph_cache_dir=None):
+        self.fhir_cache_path = fhir_cache_path
+        self.graph_cache_dir = graph_cache_dir
+        self._available = None
+
+    def available(self):
+        """name -> {version: path} for every package in the cache"""
+        if self._available is None:
+            self._available = {}
+            try:
+                entries = sorted(os.listdir(self.fhir_cache_path))
+            except OSError as e:
+                logger.warning(f"Unable to read FHIR package cache {self.fhir_cache_path}: {e}")
+                entries = []
+            for entry in entries:
+                name, sep, version = strip_archive_suffix(entry).partition('#')
+                if sep:
+                    self._available.setdefault(name, {}).setdefault(version, os.path.join(self.fhir_cache_path, entry))
+        return self._available
+
+    def resolve_version(self, name, requested):
+        """(version, path) of the cached package best matching name#requested, or (None, None)"""
+        versions = self.available().get(name, {})
+        if not versions:
+            return None, None
+        if requested in versions:
+            return requested, versions[requested]
+        if requested in VERSION_ALIASES:
+            for version in sorted(versions, key=version_key, reverse=True):
+                if version.endswith(requested):
+                    return version, versions[version]
+        matching = [version for version in versions if version_matches(requested, version)]
+        if matching:
+            version = max(matching, key=version_key)
+            return version, versions[version]
+        version = max(versions, key=version_key)
+        logger.warning(f"Package {name}#{requested} not found, using {name}#{version} instead")
+        return version, versions[version]
+
+    @staticmethod
+    def _dependencies(package_path):
+        package_json_path = os.path.join(package_path, "package", "package.json")
+        if not path_exists(package_json_path):
+            return None, None, {}
+        try:
+            package_data = load_json(package_json_path)
+        except Exception as e:
+            logger.error(f"Error reading dependencies for {package_path}: {e}")
+            return None, None, {}
+        return package_data.get("name"), package_data.get("version"), package_data.get("dependencies") or {}
+
+    def _graph_key(self, roots):
+        try:
+            cache_mtime = os.stat(self.fhir_cache_path).st_mtime_ns
+        except OSError:
+            cache_mtime = 0
+        source = json.dumps({"roots": roots, "cache": self.fhir_cache_path, "cache-mtime": cache_mtime}, sort_keys=True)
+        return hashlib.sha1(source.encode("utf-8")).hexdigest()
+
+    def _load_graphs(self):
+        try:
+            with open(os.path.join(self.graph_cache_dir, GRAPH_CACHE_FILE), 'r') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_graph(self, key, graph):
+        # Resolvers run from several threads: read-modify-write the file under one lock,
+        # through a temporary file of its own so a partial write is never seen
+        with _graph_file_lock:
+            graphs = self._load_graphs()
+            graphs[key] = graph
+            temp_path = None
+            try:
+                os.makedirs(self.graph_cache_dir, exist_ok=True)
+                with tempfile.NamedTemporaryFile('w', dir=self.graph_cache_dir, suffix=".tmp", delete=False) as f:
+                    temp_path = f.name
+                    json.dump(graphs, f, indent=2)
+                os.replace(temp_path, os.path.join(self.graph_cache_dir, GRAPH_CACHE_FILE))
+            except OSError as e:
+                logger.debug(f"Unable to save dependency graph: {e}")
+                if temp_path and os.path.exists(temp_path):
+                    os.unlink(temp_path)
+
+    def resolve(self, npm_path_list):
+        """
+        The transitive dependencies of the packages in npm_path_list, breadth first,
+        as dicts with name, version, requested, path and dependencies (names).
+        The root packages themselves are not included.
+        """
+        roots = []
+        for npm_path in npm_path_list:
+            name, version, dependencies = self._dependencies(npm_path)
+            roots.append({"name": name, "version": version, "dependencies": dependencies})
+
+        key = None
+        if self.graph_cache_dir:
+            key = self._graph_key(roots)
+            cached = self._load_graphs().get(key)
+            if cached is not None and all(os.path.exists(package["path"]) for package in cached):
+                logger.info(f"Using cached dependency graph ({len(cached)} packages)")
+                return cached
+
+        resolved = {}
+        queue = [(name, requested) for root in roots for name, requested in root["dependencies"].items()]
+        root_names = {root["name"] for root in roots if root["name"]}
+        while queue:
+            name, requested = queue.pop(0)
+            if name in root_names:
+                continue
+            if name in resolved:
+                if resolved[name]["requested"] != requested:
+                    logger.debug(f"{name}#{requested} also requested, keeping {name}#{resolved[name]['version']}")
+                continue
+            version, path = self.resolve_version(name, requested)
+            if path is None:
+                logger.warning(f"Dependency package not found in cache: {name}#{requested}")
+                resolved[name] = None
+                continue
+            _, _, dependencies = self._dependencies(path)
+            resolved[name] = {"name": name, "version": version, "requested": requested,
+                              "path": path, "dependencies": sorted(dependencies)}
+            queue.extend(dependencies.items())
+
+        graph = [package for package in resolved.values() if package]
+        logger.info(f"Resolved {len(graph)} dependency packages")
+        if key:
+            self._save_graph(key, graph)
+        return graph
+
+
+_graph_cache_dir = None
+_resolver_lock = threading.Lock()
+
+def configure_dependency_cache(graph_cache_dir):
+    """Keep resolved dependency graphs under graph_cache_dir between runs"""
+    global _graph_cache_dir
+    with _resolver_lock:
+        _graph_cache_dir = graph_cache_dir
+
+def resolve_dependencies(npm_path_list, fhir_cache_path):
+    """Transitive dependencies of the packages, using the configured on-disk memo"""
+    return DependencyResolver(fhir_cache_path, _graph_cache_dir).resolve(npm_path_list)
@@ -0,0 +1,152 @@
+import os
+import logging
+import threading
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from package_archive import path_mtime, split_archive_path, get_archive
+from bundle_stream import iter_example_resources, get_stream_threshold
+from coding_extractor import CodingExtractor, get_coding_extractor
+
+logger = logging.getLogger(__name__)
+
+# What the checks need from one example file, small enough to send between processes:
+#   codings   - unique (system, code) pairs for the example CodeSystem check
+#   resources - (resourceType, profiles, ((path, system, code), ...)) of the file's resource
+#               for the ValueSet membership check; a streamed Bundle gives the same row as
+#               one loaded whole (its profiles, Bundle.entry.resource paths)
+ExampleScan = namedtuple("ExampleScan", ["codings", "resources"])
+
+# Target number of chunks per worker, so a slow chunk late in the run doesn't hold up the rest
+CHUNKS_PER_WORKER = 4
+
+_scans = {}
+_scan_lock = threading.Lock()
+
+
+def scan_example_file(file, threshold_bytes=None, coding_paths=None):
+    """
+    Parse one example file and extract everything the example and membership checks
+    use, with one walk of each resource. coding_paths is an (allow, deny) pair of path
+    patterns; by default the configured ones are used.
+    """
+    extractor = CodingExtractor(*coding_paths) if coding_paths else get_coding_extractor()
+    entries = []
+    resource = {}
+    for entry_path, item in iter_example_resources(file, threshold_bytes):
+        if entry_path:
+            entries.extend(extractor.extract(item, entry_path))
+        else:
+            resource = item
+    found = _extract_around_entries(extractor, resource, entries) if entries else extractor.extract(resource)
+    codings = dict.fromkeys((system, code) for _, system, code in found)
+    profiles = resource.get('meta', {}).get('profile', []) or []
+    if not isinstance(profiles, (list, tuple)):
+        profiles = [profiles]
+    resources = ((resource.get('resourceType'), tuple(p for p in profiles if p), tuple(dict.fromkeys(found))),)
+    return ExampleScan(tuple(codings), resources)
+
+
+def _extract_around_entries(extractor, resource, entries):
+    """
+    Codings of a streamed Bundle in document order: those of the elements before its
+    (emptied) entry list, then the entries' own, then those after it. The result is
+    the same as a walk of the whole file.
+    """
+    keys = list(resource)
+    cut = keys.index('entry') if 'entry' in resource else len(keys)
+    root = resource.get('resourceType') or ''
+    head = extractor.extract({key: resource[key] for key in keys[:cut]}, root)
+    tail = extractor.extract({key: resource[key] for key in keys[cut + 1:]}, root)
+    return head + entries + tail
+
+
+def _scan_chunk(files, threshold_bytes, coding_paths=None):
+    """Worker: scan a chunk of files, returning (file, scan or None, error) for each"""
+    results = []
+    for file in files:
+        try:
+            results.append((file, scan_example_file(file, threshold_bytes, coding_paths), None))
+        except Exception as e:
+            results.append((file, None, str(e)))
+    return results
+
+
+def _file_size(file):
+    archive, member = split_archive_path(file)
+    try:
+        return get_archive(archive).size(member) if archive else os.path.getsize(file)
+    except OSError:
+        return 0
+
+
+def balance_chunks(files, workers):
+    """
+    Split files into chunks of roughly equal total size, largest first. Files bigger
+    than a chunk get one to themselves, and handing the big ones out first keeps a
+    large Bundle from being the last thing left running on one core.
+    """
+    sized = sorted(((_file_size(file), file) for file in files), key=lambda item: -item[0])
+    target = max(1, sum(size for size, _ in sized) // max(1, workers * CHUNKS_PER_WORKER))
+    chunks, chunk, chunk_size = [], [], 0
+    for size, file in sized:
+        chunk.append(file)
+        chunk_size += size
+        if chunk_size >= target:
+            chunks.append(chunk)
+            chunk, chunk_size = [], 0
+    if chunk:
+        chunks.append(chunk)
+    return chunks
+
+
+def scan_examples(files, max_workers=0):
+    """
+    Parse example files in a process pool (max_workers processes, 0 for one per core)
+    and keep their scans for the checks, which do the network validation in this
+    process. Files already scanned are skipped. Falls back to scanning here if the
+    pool can't be used. Returns the number of files scanned.
+    """
+    todo = []
+    for file in dict.fromkeys(files):
+        try:
+            key = (file, path_mtime(file))
+        except OSError:
+            continue
+        if key not in _scans:
+            todo.append(key)
+    if not todo:
+        return 0
+    workers = max_workers if max_workers and max_workers > 0 else (os.cpu_count() or 1)
+    workers = min(workers, len(todo))
+    mtimes = dict(todo)
+    results = []
+    if workers > 1:
+        try:
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                extractor = get_coding_extractor()
+                futures = [executor.submit(_scan_chunk, chunk, get_stream_threshold(), (extractor.allow, extractor.deny))
+                           for chunk in balance_chunks(list(mtimes), workers)]
+                for future in futures:
+                    results.extend(future.result())
+        except Exception as e:
+            logger.warning(f"Example scan pool failed ({e}), scanning in process")
+            results = []
+    if not results:
+        results = _scan_chunk(list(mtimes), get_stream_threshold())
+    with _scan_lock:
+        for file, scan, error in results:
+            if error:
+                logger.warning(f"Unable to read example {file}: {error}")
+            else:
+                _scans[(file, mtimes[file])] = scan
+    logger.info(f"Scanned {len(results)} example files with {workers} worker(s)")
+    return len(results)
+
+
+def get_example_scan(file):
+    """The scan of an example file, from the pool stage or parsed now if it wasn't scanned"""
+    key = (file, path_mtime(file))
+    with _scan_lock:
+        if key not in _scans:
+            _scans[key] = scan_example_file(file)
+        return _scans[key]
@@ -0,0 +1,15 @@
+"""
+Stand-ins for terminology server HTTP responses, shared by the test scripts
+"""
+
+
+class FakeResponse:
+    """A requests.Response look-alike with a status code, JSON body and headers"""
+
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self._data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self._data
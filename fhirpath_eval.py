@@ -0,0 +1,100 @@
+import re
+from decimal import Decimal
+import logging
+import threading
+from fhirpathpy import compile as compile_fhirpath
+
+logger = logging.getLogger(__name__)
+
+# Compiled fhirpathpy expressions are kept for the whole run; the expressions used are few
+_compiled = {}
+_plans = {}
+_lock = threading.Lock()
+
+_identifier = re.compile(r"([a-z_][A-Za-z0-9_]*)")
+_where = re.compile(r"where\(\s*([A-Za-z_][A-Za-z0-9_]*)\s*=\s*'([^'\\]*)'\s*\)")
+_indexer = re.compile(r"\[(\d+)\]")
+# Words that are FHIRPath operators or literals rather than element names
+_reserved = {"and", "or", "xor", "implies", "is", "as", "div", "mod", "in", "contains", "true", "false"}
+
+
+def _plan(expression):
+    """
+    Steps for an expression the fast path can run, or None. Handles dotted element
+    paths starting with an element name (not a type), [n] indexers and
+    where(field = 'literal') filters, e.g. "parameter.where(name = 'result').valueBoolean".
+    """
+    steps = []
+    pos = 0
+    expression = expression.strip()
+    while True:
+        match = _where.match(expression, pos)
+        if match:
+            steps.append(("where", match.group(1), match.group(2)))
+        else:
+            match = _identifier.match(expression, pos)
+            if not match or match.group(1) in _reserved or expression.startswith('(', match.end()):
+                return None
+            steps.append(("child", match.group(1)))
+        pos = match.end()
+        index = _indexer.match(expression, pos)
+        if index:
+            steps.append(("index", int(index.group(1))))
+            pos = index.end()
+        if pos == len(expression):
+            return steps
+        if expression[pos] != '.':
+            return None
+        pos += 1
+
+
+def _run(resource, steps):
+    """Walk plain JSON data the way FHIRPath navigates it (collections flatten, nulls drop out)"""
+    items = [resource] if resource is not None else []
+    for step in steps:
+        kind = step[0]
+        if kind == "child":
+            name = step[1]
+            next_items = []
+            for item in items:
+                if isinstance(item, dict):
+                    value = item.get(name)
+                    if isinstance(value, list):
+                        next_items.extend(v for v in value if v is not None)
+                    elif value is not None:
+                        next_items.append(value)
+            items = next_items
+        elif kind == "where":
+            _, field, literal = step
+            items = [item for item in items if isinstance(item, dict) and item.get(field) == literal]
+        else:
+            items = items[step[1]:step[1] + 1]
+    # fhirpathpy returns decimal values as Decimal
+    return [Decimal(str(item)) if isinstance(item, float) else item for item in items]
+
+
+def _compiled_expression(expression):
+    with _lock:
+        compiled = _compiled.get(expression)
+        if compiled is None:
+            compiled = compile_fhirpath(expression)
+            _compiled[expression] = compiled
+        return compiled
+
+
+##
+## evaluate: FHIRPath over plain JSON, with a fast path for simple navigation
+##
+def evaluate(resource, expression):
+    """
+    Drop-in for fhirpathpy.evaluate(resource, expression). Simple navigation
+    expressions are run as direct dict traversal; anything else is evaluated by
+    fhirpathpy, with each expression parsed and compiled only once.
+    """
+    plan = _plans.get(expression)
+    if plan is None and expression not in _plans:
+        plan = _plan(expression)
+        _plans[expression] = plan
+    if plan is not None:
+        return _run(resource, plan)
+    return _compiled_expression(expression)(resource)
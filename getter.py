@@ -4,11 +4,92 @@ import logging
 import shutil
 import os
 import glob
+import sys
 from utils import get_config
+from package_archive import ARCHIVE_SUFFIXES, is_archive, strip_archive_suffix
 from pathlib import Path
 
 logger = logging.getLogger(__name__)
 
+def find_cached_package(fhir_cache_path, name, version):
+    """
+    Find a package folder in the FHIR package cache.
+    Tries name#version first; for the 'dev'/'current'/'cibuild' aliases looks for a folder
+    ending in that alias, and otherwise falls back to the most recently modified version.
+    A package tarball (name#version.tgz) is used the same way as an extracted folder.
+    Returns the folder (or tarball) path, or None if no version of the package is cached.
+    """
+    for candidate in [f"{name}#{version}"] + [f"{name}#{version}{suffix}" for suffix in ARCHIVE_SUFFIXES]:
+        cache_package_path = os.path.join(fhir_cache_path, candidate)
+        if os.path.exists(cache_package_path):
+            return cache_package_path
+
+    # Handle version aliases like 'dev' or 'current'
+    matching_packages = glob.glob(os.path.join(fhir_cache_path, f"{name}#*"))
+    if version in ['dev', 'current', 'cibuild']:
+        # Look for exact match first, then any dev/current version
+        for pkg_path in matching_packages:
+            if strip_archive_suffix(os.path.basename(pkg_path)).endswith(f"#{version}"):
+                return pkg_path
+
+    if matching_packages:
+        # If still not found, use the most recent version
+        matching_packages.sort(key=os.path.getmtime, reverse=True)
+        logger.warning(f"Package {name}#{version} not found, using {os.path.basename(matching_packages[0])} instead")
+        return matching_packages[0]
+    return None
+
+
+# Ways of making a cached package available under rootdir/packages, cheapest isolated first
+MATERIALISE_METHODS = ["reflink", "hardlink", "symlink", "copy"]
+
+
+def _reflink_tree(src, dst):
+    """Copy-on-write clone of a folder (btrfs, XFS, APFS); fails where the filesystem can't"""
+    if sys.platform == "darwin":
+        command = ["cp", "-Rc", src, dst]
+    else:
+        command = ["cp", "-R", "--reflink=always", src, dst]
+    subprocess.run(command, check=True, capture_output=True)
+
+
+def _remove_materialised(path):
+    if os.path.islink(path) or os.path.isfile(path):
+        os.unlink(path)
+    elif os.path.isdir(path):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def materialise_package(src, dst, method="auto"):
+    """
+    Make the cached package folder src available at dst without copying its files.
+
+    reflink clones files copy-on-write, hardlink links each file into a fresh folder
+    tree (in both, deleting or adding files under dst never touches the cache, but a
+    hardlinked file shares its data with the cache and must not be rewritten), symlink
+    links the whole folder, and copy is a plain copytree. Nothing in this tool writes
+    into a materialised package; generated indexes live under rootdir/cache.
+    With method "auto" each is tried in that order until one works on this filesystem.
+    Returns the method used.
+    """
+    methods = MATERIALISE_METHODS if method == "auto" else [method]
+    for candidate in methods:
+        try:
+            if candidate == "reflink":
+                _reflink_tree(src, dst)
+            elif candidate == "hardlink":
+                shutil.copytree(src, dst, copy_function=os.link)
+            elif candidate == "symlink":
+                os.symlink(src, dst, target_is_directory=True)
+            else:
+                shutil.copytree(src, dst)
+            return candidate
+        except (OSError, subprocess.CalledProcessError, shutil.Error) as e:
+            logger.debug(f"Unable to {candidate} {src} to {dst}: {e}")
+            _remove_materialised(dst)
+    raise OSError(f"Unable to materialise {src} at {dst} using {', '.join(methods)}")
+
+
 def get_fhir_packages(mode, data_dir, config_file):
     """
     Get FHIR packages from the local FHIR package cache instead of downloading via npm
@@ -25,6 +106,15 @@ def get_fhir_packages(mode, data_dir, config_file):
     if not os.path.exists(fhir_cache_path):
         raise FileNotFoundError(f"FHIR package cache not found at: {fhir_cache_path}")
     
+    # How packages are made available locally: auto, in-place, reflink, hardlink, symlink or copy
+    try:
+        materialisation = get_config(config_file, key="package-materialisation") or "auto"
+    except KeyError:
+        materialisation = "auto"
+    if materialisation not in ["auto", "in-place"] + MATERIALISE_METHODS:
+        logger.warning(f"Unknown package-materialisation '{materialisation}', using auto")
+        materialisation = "auto"
+
     # Create local package directory for copying packages
     local_packages_path = os.path.join(data_dir, "packages")
 
@@ -50,38 +140,30 @@ def get_fhir_packages(mode, data_dir, config_file):
 
         # Look for the package in the FHIR cache
         package_pattern = f"{name}#{version}"
-        cache_package_path = os.path.join(fhir_cache_path, package_pattern)
-        
-        # Handle version aliases like 'dev' or 'current'
-        if not os.path.exists(cache_package_path):
-            # Try to find packages that match the name pattern
-            matching_packages = glob.glob(os.path.join(fhir_cache_path, f"{name}#*"))
-            if version in ['dev', 'current', 'cibuild']:
-                # Look for exact match first, then any dev/current version
-                for pkg_path in matching_packages:
-                    pkg_name = os.path.basename(pkg_path)
-                    if pkg_name.endswith(f"#{version}"):
-                        cache_package_path = pkg_path
-                        break
-            
-            if not os.path.exists(cache_package_path) and matching_packages:
-                # If still not found, use the most recent version
-                matching_packages.sort(key=os.path.getmtime, reverse=True)
-                cache_package_path = matching_packages[0]
-                logger.warning(f"Package {package_pattern} not found, using {os.path.basename(cache_package_path)} instead")
+        cache_package_path = find_cached_package(fhir_cache_path, name, version)
 
         local_package_path = os.path.join(local_packages_path, f"{name}#{version}")
         
-        if not os.path.exists(cache_package_path):
+        if not cache_package_path:
             logger.error(f"Package {package_pattern} not found in FHIR cache at {fhir_cache_path}")
             logger.info(f"Available packages matching {name}: {[os.path.basename(p) for p in glob.glob(os.path.join(fhir_cache_path, f'{name}#*'))]}")
             continue
             
-        # Copy package from cache to local directory if not already there
+        # Read the package straight from the cache; tarballs are always read without extracting
+        if materialisation == "in-place" or is_archive(cache_package_path):
+            logger.info(f"Using {title}: {name} ({version}) in place from FHIR cache")
+            path_list.append(cache_package_path)
+            continue
+
+        # A symlink left pointing at a package that has since been removed from the cache
+        if os.path.islink(local_package_path) and not os.path.exists(local_package_path):
+            os.unlink(local_package_path)
+
+        # Materialise package from cache to local directory if not already there
         if not os.path.exists(local_package_path):
             try:
-                shutil.copytree(cache_package_path, local_package_path)
-                logger.info(f"Copied {title}: {name} ({version}) from FHIR cache")
+                method = materialise_package(cache_package_path, local_package_path, materialisation)
+                logger.info(f"Materialised {title}: {name} ({version}) from FHIR cache using {method}")
                 print(f"Using cached package {title}: {name} ({version})...")
             except Exception as e:
                 logger.error(f"Error copying package {name}: {e}")
@@ -0,0 +1,348 @@
+import os
+import logging
+from dependencies import resolve_dependencies
+from package_index import get_package_index
+from package_archive import path_isdir
+from utils import get_config
+
+logger = logging.getLogger(__name__)
+
+LOCAL_TERMINOLOGY_DEFAULTS = {
+    "enabled": True,
+    "include-dependencies": True
+}
+
+def get_local_terminology_options(config_file):
+    """local-terminology config section, with defaults for any missing keys"""
+    options = dict(LOCAL_TERMINOLOGY_DEFAULTS)
+    try:
+        options.update(get_config(config_file, "local-terminology") or {})
+    except Exception:
+        pass
+    return options
+
+
+def _version_key(version):
+    """Sort key so '4.0.1' < '4.0.10' and numeric versions sort above labels like 'current'"""
+    parts = []
+    for part in str(version or '').replace('-', '.').split('.'):
+        parts.append((1, int(part), '') if part.isdigit() else (0, 0, part))
+    return parts
+
+
+def _abstract_or_inactive(props):
+    """Do a concept's properties (as held by the provider) mark it notSelectable or inactive?"""
+    return (props.get("notSelectable") == "true" or props.get("inactive") == "true"
+            or props.get("status") in ("retired", "inactive"))
+
+
+def _package_dir(package_path):
+    """The folder holding the resources: <package>/package if present, else the folder itself"""
+    inner = os.path.join(package_path, "package")
+    return inner if path_isdir(inner) else package_path
+
+
+##
+## LocalCodeSystemProvider: answer CodeSystem/$validate-code from package content
+##
+class LocalCodeSystemProvider:
+    """
+    Index of the CodeSystem resources published in FHIR packages.
+
+    Only CodeSystems with content 'complete' can answer validation questions
+    locally; concepts (including nested ones) are held in a set per system url.
+    When the same url appears in several packages the highest version wins.
+    Systems that are fragments, not-present, examples or simply unknown return
+    None from validate() so the caller falls back to the terminology server.
+    """
+
+    def __init__(self):
+        self._systems = {}
+
+    def __len__(self):
+        return len(self._systems)
+
+    def add_package(self, package_path):
+        """Index every complete CodeSystem in a package folder"""
+        package_dir = _package_dir(os.path.abspath(package_path))
+        count = 0
+        for entry in get_package_index(package_path).of_type("CodeSystem", folder=package_dir):
+            try:
+                resource = entry.load()
+            except Exception as e:
+                logger.debug(f"Error reading CodeSystem file {entry.path}: {e}")
+                continue
+            if self.add_codesystem(resource):
+                count += 1
+        logger.info(f"Indexed {count} complete CodeSystems from {package_path}")
+        return count
+
+    def add_codesystem(self, resource):
+        """Index one CodeSystem resource; returns True if it can be used for validation"""
+        if resource.get("resourceType") != "CodeSystem" or resource.get("content") != "complete":
+            return False
+        url = resource.get("url")
+        if not url:
+            return False
+        existing = self._systems.get(url)
+        if existing and _version_key(existing["version"]) >= _version_key(resource.get("version")):
+            return True
+
+        case_sensitive = resource.get("caseSensitive", True)
+        codes = set()
+        children = {}
+        properties = {}
+        stack = [(concept, None) for concept in resource.get("concept", [])]
+        while stack:
+            concept, parent = stack.pop()
+            code = concept.get("code")
+            if not code:
+                continue
+            codes.add(code)
+            if parent:
+                children.setdefault(parent, []).append(code)
+            for prop in concept.get("property", []):
+                value = next((v for k, v in prop.items() if k.startswith("value")), None)
+                if prop.get("code") == "parent" and value:
+                    children.setdefault(value, []).append(code)
+                properties.setdefault(code, {})[prop.get("code")] = str(value).lower() if isinstance(value, bool) else str(value)
+            stack.extend((child, code) for child in concept.get("concept", []))
+        flagged = {code for code, props in properties.items() if _abstract_or_inactive(props)}
+
+        self._systems[url] = {
+            "version": resource.get("version"),
+            "case_sensitive": case_sensitive,
+            "codes": codes,
+            "folded": codes if case_sensitive else {code.lower() for code in codes},
+            "children": children,
+            "properties": properties,
+            "flagged": flagged
+        }
+        return True
+
+    def knows(self, system):
+        return system in self._systems
+
+    def version(self, system):
+        entry = self._systems.get(system)
+        return entry["version"] if entry else None
+
+    def validate(self, system, code):
+        """True/False if the system is held locally in full, None if the server has to answer"""
+        entry = self._systems.get(system)
+        if entry is None:
+            return None
+        if not entry["case_sensitive"]:
+            code = code.lower()
+        return code in entry["folded"]
+
+    def flagged(self, system):
+        """Codes of a locally held system that are abstract (notSelectable) or inactive"""
+        entry = self._systems.get(system)
+        return entry["flagged"] if entry else set()
+
+    def codes(self, system):
+        """All codes of a locally held system, or None"""
+        entry = self._systems.get(system)
+        return entry["codes"] if entry else None
+
+    def descendants(self, system, code):
+        """Codes below code in the hierarchy (not including code itself)"""
+        children = self._systems[system]["children"]
+        found = set()
+        stack = list(children.get(code, []))
+        while stack:
+            child = stack.pop()
+            if child not in found:
+                found.add(child)
+                stack.extend(children.get(child, []))
+        return found
+
+    def filter(self, system, prop, op, value):
+        """
+        Codes matching a ValueSet compose filter, or None if the filter isn't supported.
+        Supports is-a / descendent-of on the concept hierarchy and '=' on concept properties.
+        """
+        entry = self._systems.get(system)
+        if entry is None or value is None:
+            return None
+        if prop == "concept" and op == "is-a":
+            return ({value} | self.descendants(system, value)) if value in entry["codes"] else set()
+        if prop == "concept" and op == "descendent-of":
+            return self.descendants(system, value)
+        if op == "=":
+            if prop in ("concept", "code"):
+                return {value} & entry["codes"]
+            return {code for code, props in entry["properties"].items() if props.get(prop) == value}
+        return None
+
+
+##
+## LocalValueSetExpander: expand simple ValueSet composes without the server
+##
+class LocalValueSetExpander:
+    """
+    Expands ValueSets published in FHIR packages using LocalCodeSystemProvider.
+
+    Handles compose include/exclude by concept list, whole-system includes, imports
+    of other ValueSets and is-a / descendent-of / '=' filters over local CodeSystems.
+    Anything else (unknown systems, other filter operators, missing ValueSets)
+    makes expand() return None so the caller can use the server's $expand. So does
+    a whole-system or filter include that takes in abstract or inactive concepts,
+    since servers differ in whether (and how) those appear in an expansion.
+    Results, including failures, are memoized per canonical|version.
+    """
+
+    def __init__(self, provider):
+        self.provider = provider
+        self._valuesets = {}
+        self._expansions = {}
+
+    def add_package(self, package_path):
+        """Index the ValueSet resources in a package folder"""
+        package_dir = _package_dir(os.path.abspath(package_path))
+        count = 0
+        for entry in get_package_index(package_path).of_type("ValueSet", folder=package_dir):
+            try:
+                resource = entry.load()
+            except Exception as e:
+                logger.debug(f"Error reading ValueSet file {entry.path}: {e}")
+                continue
+            if self.add_valueset(resource):
+                count += 1
+        logger.info(f"Indexed {count} ValueSets from {package_path}")
+        return count
+
+    def add_valueset(self, resource):
+        if resource.get("resourceType") != "ValueSet" or not resource.get("url"):
+            return False
+        url = resource["url"]
+        version = resource.get("version")
+        if version:
+            self._valuesets[f"{url}|{version}"] = resource
+        existing = self._valuesets.get(url)
+        if existing is None or _version_key(existing.get("version")) < _version_key(version):
+            self._valuesets[url] = resource
+        return True
+
+    def expand(self, canonical):
+        """
+        Members of a ValueSet as a frozenset of (system, code), or None if the
+        expansion can't be worked out locally
+        """
+        if canonical not in self._expansions:
+            self._expansions[canonical] = self._expand(canonical, set())
+        return self._expansions[canonical]
+
+    def contains(self, canonical, system, code):
+        """True/False for ValueSet membership, or None if the ValueSet can't be expanded locally"""
+        members = self.expand(canonical)
+        if members is None:
+            return None
+        return (system, code) in members
+
+    def _expand(self, canonical, in_progress):
+        if canonical in self._expansions:
+            return self._expansions[canonical]
+        resource = self._valuesets.get(canonical)
+        if resource is None or canonical in in_progress:
+            return None
+        compose = resource.get("compose")
+        if not compose or not compose.get("include"):
+            return None
+        in_progress = in_progress | {canonical}
+
+        members = set()
+        for include in compose.get("include", []):
+            part = self._compose_part(include, in_progress, include=True)
+            if part is None:
+                return None
+            members |= part
+        for exclude in compose.get("exclude", []):
+            part = self._compose_part(exclude, in_progress)
+            if part is None:
+                return None
+            members -= part
+        return frozenset(members)
+
+    def _compose_part(self, part, in_progress, include=False):
+        """(system, code) set for one compose include/exclude entry, or None"""
+        result = None
+        system = part.get("system")
+        if system:
+            local_version = self.provider.version(system)
+            if part.get("version") and local_version and part["version"] != local_version:
+                return None
+            if part.get("concept"):
+                codes = {concept.get("code") for concept in part["concept"] if concept.get("code")}
+            elif part.get("filter"):
+                codes = None
+                for f in part["filter"]:
+                    matched = self.provider.filter(system, f.get("property"), f.get("op"), f.get("value"))
+                    if matched is None:
+                        return None
+                    codes = matched if codes is None else codes & matched
+            else:
+                codes = self.provider.codes(system)
+                if codes is None:
+                    return None
+            if include and not part.get("concept") and codes & self.provider.flagged(system):
+                logger.debug(f"Include of {system} takes in abstract or inactive concepts, leaving it to the server")
+                return None
+            result = {(system, code) for code in codes}
+
+        # Imported ValueSets intersect with each other and with any system part
+        for imported in part.get("valueSet", []):
+            members = self._expand(imported, in_progress)
+            if members is None:
+                return None
+            self._expansions[imported] = members
+            result = set(members) if result is None else result & members
+        return result
+
+
+_provider = None
+_expander = None
+
+def get_local_provider():
+    """Return the configured local CodeSystem provider, or None if local validation is off"""
+    return _provider
+
+def get_local_expander():
+    """Return the configured local ValueSet expander, or None if local terminology is off"""
+    return _expander
+
+def configure_local_terminology(npm_path_list, config_file):
+    """
+    Build the process-wide LocalCodeSystemProvider and LocalValueSetExpander from the
+    IG packages and (optionally) their transitive dependencies in the FHIR package
+    cache, resolved the same way as for the binding report.
+    """
+    global _provider, _expander
+    options = get_local_terminology_options(config_file)
+    if not options["enabled"]:
+        _provider = None
+        _expander = None
+        return None
+
+    package_paths = list(npm_path_list)
+    if options["include-dependencies"]:
+        try:
+            fhir_cache_path = get_config(config_file, key="fhir-package-cache")
+        except Exception:
+            fhir_cache_path = None
+        if fhir_cache_path and os.path.exists(fhir_cache_path):
+            package_paths.extend(package["path"] for package in resolve_dependencies(npm_path_list, fhir_cache_path))
+
+    provider = LocalCodeSystemProvider()
+    expander = LocalValueSetExpander(provider)
+    for package_path in package_paths:
+        try:
+            provider.add_package(package_path)
+            expander.add_package(package_path)
+        except Exception as e:
+            logger.warning(f"Unable to index terminology in {package_path}: {e}")
+    logger.info(f"Local terminology: {len(provider)} complete CodeSystems available for offline validation")
+    _provider = provider
+    _expander = expander
+    return provider
@@ -1,12 +1,49 @@
 import argparse
 import os
 import sys
+from concurrent.futures import ThreadPoolExecutor
 from  getter import get_npm_packages
-from tester import run_example_check, run_capability_test, run_valueset_binding_report
-from utils import check_path, get_config
+from tester import run_example_check, run_capability_test, run_valueset_binding_report, write_server_matrix, get_example_files
+from utils import check_path, get_config, get_tx_client_options, endpoint_slug
+from txclient import configure_client, get_client
+from txcache import configure_cache
+from local_terminology import configure_local_terminology
+from package_cache_index import configure_package_cache_index
+from package_index import configure_folder_index_cache
+from resource_cache import configure_resource_cache, DEFAULT_MAX_MB
+from bundle_stream import configure_stream_threshold, DEFAULT_STREAM_THRESHOLD_MB
+from example_scan import scan_examples
+from coding_extractor import configure_coding_paths
+from dependencies import configure_dependency_cache
 import logging
 from datetime import datetime
 
+def run_server_checks(endpoint, config_file, npm_path_list, outdir):
+    """
+    Run the example, binding and membership checks against one terminology server,
+    writing its reports to outdir. Returns the summary used for the cross-server matrix.
+    """
+    logger = logging.getLogger(__name__)
+    check_path(outdir)
+    summary = {}
+
+    # Run Example checks
+    run_example_check(endpoint, config_file, npm_path_list, outdir, summary)
+    logger.info(f"Example checks completed for {endpoint}")
+    
+    # Run ValueSet binding report
+    run_valueset_binding_report(npm_path_list, outdir, config_file, endpoint, summary)
+    logger.info(f"ValueSet binding report completed for {endpoint}")
+
+    # Run Example ValueSet membership checks against profile bindings
+    try:
+        from membership import run_example_valueset_membership_check
+        run_example_valueset_membership_check(endpoint, config_file, npm_path_list, outdir)
+        logger.info(f"Example ValueSet membership checks completed for {endpoint}")
+    except Exception as e:
+        logger.warning(f"Skipping ValueSet membership checks for {endpoint} due to error: {e}")
+    return summary
+
 def main():
     """
     Check terminology using the $validate-code operation on a single fhir IG npm package
@@ -23,6 +60,10 @@ def main():
 
     logger = logging.getLogger(__name__)
     parser.add_argument("-r", "--rootdir", help="Root data folder", default=defaultpath)   
+    parser.add_argument("-e", "--endpoint", action="append", help="Terminology server base URL, repeat to compare several servers (default: endpoint in config.json)")
+    cache_group = parser.add_mutually_exclusive_group()
+    cache_group.add_argument("--no-cache", action="store_true", help="Don't read or write the persistent terminology result cache")
+    cache_group.add_argument("--refresh-cache", action="store_true", help="Ignore cached terminology results and re-ask the server, updating the cache")
     args = parser.parse_args()
     ## Create the data path if it doesn't exist
     check_path(args.rootdir)
@@ -45,11 +86,26 @@ def main():
     # Get the initial config
     conf = get_config(config_file,"init")[0]
     mode = conf["mode"] or "clean"
-    endpoint = conf["endpoint"] 
-    # First check that the tx server instance is up 
-    http_stat = run_capability_test(endpoint)
-    if http_stat != 200:
-        logger.fatal(f'Capability test failed with status: {http_stat}')
+    # Unique endpoints from the command line, in the order given
+    endpoints = list(dict.fromkeys(args.endpoint or [conf["endpoint"]]))
+    # One pooled client is shared by all terminology server calls
+    tx_options = get_tx_client_options(config_file)
+    configure_client(tx_options)
+    # Terminology answers are cached between runs under rootdir unless disabled
+    cache = None
+    if not args.no_cache:
+        cache = configure_cache(os.path.join(args.rootdir, "cache"), ttl=tx_options["cache-ttl-hours"] * 3600, refresh=args.refresh_cache)
+    # First check that the tx server instances are up 
+    available = []
+    for endpoint in endpoints:
+        http_stat = run_capability_test(endpoint)
+        if http_stat != 200:
+            logger.error(f'Capability test failed for {endpoint} with status: {http_stat}')
+            print(f'Skipping {endpoint}: capability test failed with status {http_stat}')
+        else:
+            available.append(endpoint)
+    if not available:
+        logger.fatal('Capability test failed for every terminology server')
         sys.exit(1)
     logger.info("Passed Capability test, continue on with other checks")
 
@@ -57,22 +113,74 @@ def main():
     npm_path_list = get_npm_packages(mode, data_dir=args.rootdir, config_file=config_file)
     print('...npm packages done')
 
-    # Run Example checks
-    run_example_check(endpoint, config_file, npm_path_list, outdir)
-    logger.info("Example checks completed")
-    
-    # Run ValueSet binding report
-    run_valueset_binding_report(npm_path_list, outdir, config_file)
-    logger.info("ValueSet binding report completed")
+    # Parsed resources are shared by every stage, up to resource-cache-mb of source JSON
+    try:
+        resource_cache = configure_resource_cache(get_config(config_file, "resource-cache-mb"))
+    except KeyError:
+        resource_cache = configure_resource_cache(DEFAULT_MAX_MB)
+    # Example files over stream-threshold-mb are parsed one Bundle entry at a time
+    try:
+        configure_stream_threshold(get_config(config_file, "stream-threshold-mb"))
+    except KeyError:
+        configure_stream_threshold(DEFAULT_STREAM_THRESHOLD_MB)
 
-    # Run Example ValueSet membership checks against profile bindings
+    # Folders without an .index.json are indexed once; the result is kept here, never in the package
+    configure_folder_index_cache(os.path.join(args.rootdir, "cache"))
+    # Index the whole FHIR package cache by canonical url (incremental, kept between runs)
+    fhir_cache_path = get_config(config_file, "fhir-package-cache")
+    if fhir_cache_path and os.path.isdir(fhir_cache_path):
+        configure_package_cache_index(fhir_cache_path, os.path.join(args.rootdir, "cache"))
+    # Resolved dependency graphs are kept between runs too
+    configure_dependency_cache(os.path.join(args.rootdir, "cache"))
+
+    # Index complete CodeSystems from the packages so most codes validate offline.
+    # Not when comparing servers: a local answer would fill every server column alike
+    if len(available) == 1:
+        configure_local_terminology(npm_path_list, config_file)
+    else:
+        logger.info("Comparing terminology servers, local terminology is off so every answer comes from the server")
+
+    # Which element paths of the examples have their codings checked
     try:
-        from membership import run_example_valueset_membership_check
-        run_example_valueset_membership_check(endpoint, config_file, npm_path_list, outdir)
-        logger.info("Example ValueSet membership checks completed")
-    except Exception as e:
-        logger.warning(f"Skipping ValueSet membership checks due to error: {e}")
+        coding_paths = get_config(config_file, "coding-paths") or {}
+    except KeyError:
+        coding_paths = {}
+    configure_coding_paths(coding_paths.get("allow"), coding_paths.get("deny"))
+
+    # Parse the examples and extract their codings across all cores; validation stays in this process
+    try:
+        scan_workers = get_config(config_file, "scan-workers")
+    except KeyError:
+        scan_workers = 0
+    scanned = scan_examples(get_example_files(npm_path_list, config_file), scan_workers)
+    print(f'...{scanned} example files scanned')
+
+    # A comparison only when more than one server passed the capability test
+    if len(available) == 1:
+        run_server_checks(available[0], config_file, npm_path_list, outdir)
+    else:
+        # Each server gets its own report folder; the package parse is shared between them
+        with ThreadPoolExecutor(max_workers=len(available)) as executor:
+            futures = {endpoint: executor.submit(run_server_checks, endpoint, config_file, npm_path_list,
+                                                 os.path.join(outdir, endpoint_slug(endpoint)))
+                       for endpoint in available}
+            summaries = {endpoint: future.result() for endpoint, future in futures.items()}
+        write_server_matrix(summaries, outdir)
+        print(f"...server comparison written to {os.path.join(outdir, 'ServerComparison.tsv')}")
     
+    client_stats = get_client().stats()
+    print(f"Terminology client: {client_stats['retries']} retries, {client_stats['throttled']} throttled responses, "
+          f"{client_stats['breaker_trips']} circuit breaker trips")
+    logger.info(f"Terminology client stats: {client_stats}")
+    if cache:
+        stats = cache.stats()
+        print(f"Terminology cache: {stats['hits']} hits, {stats['misses']} misses ({stats['hit_rate']:.1f}% hit rate)")
+        logger.info(f"Terminology cache stats: {stats}")
+
+    resource_stats = resource_cache.stats()
+    print(f"Resource cache: {resource_stats['hits']} hits, {resource_stats['misses']} misses ({resource_stats['hit_rate']:.1f}% hit rate)")
+    logger.info(f"Resource cache stats: {resource_stats}")
+
     end_time = datetime.now()
     print(f"Run finished: {end_time.isoformat(timespec='seconds')}")
     logger.info("Finished")
@@ -1,15 +1,92 @@
 import os
 import json
 import logging
-import requests
-from fhirpathpy import evaluate
-from utils import get_config, split_node_path
+from urllib.parse import quote
+from requests import RequestException
+from fhirpath_eval import evaluate
+from utils import get_config, get_tx_client_options, split_node_path
+from txclient import get_client, EndpointUnavailable
+from txcache import get_cache
+from local_terminology import get_local_expander
+from package_index import get_package_index
+from package_archive import list_json_files, path_mtime
+from example_scan import get_example_scan
+from coding_extractor import get_coding_extractor
+from profile_analysis import analyse_profile
 
 logger = logging.getLogger(__name__)
 _valueset_validate_cache = {}
+_binding_map_cache = {}
+_merged_bindings_cache = {}
+_expansion_members_cache = {}
+VS_VALIDATE_CODE = 'ValueSet/$validate-code'
 
 
-def validate_code_in_valueset(endpoint, valueset_url, coding):
+def _collect_expansion_codes(contains, members):
+    """Add (system, code) for every selectable entry of an expansion.contains tree"""
+    for entry in contains:
+        if entry.get('system') and entry.get('code') and not entry.get('abstract', False):
+            members.add((entry['system'], entry['code']))
+        _collect_expansion_codes(entry.get('contains', []), members)
+
+
+def prefetch_valueset_members(endpoint, valueset_url, size_limit, page_size=1000):
+    """
+    Expand a ValueSet on the terminology server once, paging through $expand with
+    offset/count, and keep its members for in-memory membership checks.
+
+    Args:
+        endpoint: FHIR terminology server base URL
+        valueset_url: canonical URL of the ValueSet (may include |version)
+        size_limit: ValueSets with more members than this are not prefetched
+        page_size: number of concepts requested per $expand page
+
+    Returns:
+        frozenset of (system, code), or None if the ValueSet is too large or
+        couldn't be expanded (callers then fall back to $validate-code)
+    """
+    cache_key = (endpoint, valueset_url)
+    if cache_key in _expansion_members_cache:
+        return _expansion_members_cache[cache_key]
+
+    members = set()
+    offset = 0
+    total = None
+    try:
+        while True:
+            url = f"{endpoint}/ValueSet/$expand?url={quote(valueset_url, safe='')}&offset={offset}&count={page_size}"
+            response = get_client().get(url)
+            if response.status_code != 200:
+                logger.debug(f"Prefetch $expand of {valueset_url} failed: http status {response.status_code}")
+                members = None
+                break
+            expansion = response.json().get('expansion', {})
+            if total is None:
+                total = expansion.get('total')
+                if total is not None and total > size_limit:
+                    logger.info(f"ValueSet {valueset_url} has {total} members, above prefetch limit {size_limit}; using $validate-code")
+                    members = None
+                    break
+            page = expansion.get('contains', [])
+            _collect_expansion_codes(page, members)
+            offset += len(page)
+            if len(members) > size_limit:
+                members = None
+                break
+            if not page or len(page) < page_size or (total is not None and offset >= total):
+                break
+    except (EndpointUnavailable, RequestException, ValueError) as e:
+        logger.debug(f"Prefetch $expand of {valueset_url} failed: {e}")
+        members = None
+
+    if members is not None:
+        members = frozenset(members)
+        logger.info(f"Prefetched {len(members)} members of ValueSet {valueset_url}")
+    _expansion_members_cache[cache_key] = members
+    return members
+
+
+def validate_code_in_valueset(endpoint, valueset_url, coding, prefetch_limit=0, page_size=1000):
     """
     Validate a Coding against a ValueSet using $validate-code (POST Parameters)
 
@@ -17,9 +94,12 @@ def validate_code_in_valueset(endpoint, valueset_url, coding):
         endpoint: FHIR terminology server base URL
         valueset_url: canonical URL of the ValueSet (may include version after |, e.g., "...ValueSet/foo|4.0.1")
         coding: dict with keys {'system', 'code'}
+        prefetch_limit: if > 0, ValueSets with up to this many members are expanded once
+            (see prefetch_valueset_members) and membership is answered in memory
+        page_size: $expand page size used when prefetching
 
     Returns:
-        dict: {'result': 'PASS'|'CHECK'|'NOT_APPLICABLE', 'reason': str, 'status_code': int}
+        dict: {'result': 'PASS'|'CHECK'|'NOT_APPLICABLE'|'UNAVAILABLE', 'reason': str, 'status_code': int}
     """
     try:
         cache_key = (endpoint, valueset_url, coding.get('system'), coding.get('code'))
@@ -33,6 +113,33 @@ def validate_code_in_valueset(endpoint, valueset_url, coding):
             base_url = valueset_url
             version = None
 
+        # Try a local expansion first; only go to the server if it can't be resolved here
+        expander = get_local_expander()
+        member = expander.contains(valueset_url, coding.get('system'), coding.get('code')) if expander else None
+        if member is not None:
+            result = {"result": 'PASS' if member else 'CHECK',
+                      "reason": '' if member else 'Not a member of ValueSet',
+                      "status_code": 200}
+            _valueset_validate_cache[cache_key] = result
+            return result
+
+        if prefetch_limit:
+            members = prefetch_valueset_members(endpoint, valueset_url, prefetch_limit, page_size)
+            if members is not None:
+                member = (coding.get('system'), coding.get('code')) in members
+                result = {"result": 'PASS' if member else 'CHECK',
+                          "reason": '' if member else 'Not a member of ValueSet',
+                          "status_code": 200}
+                _valueset_validate_cache[cache_key] = result
+                return result
+
+        cache = get_cache()
+        if cache:
+            stored = cache.get(endpoint, VS_VALIDATE_CODE, base_url, version, coding.get('system'), coding.get('code'))
+            if stored is not None:
+                _valueset_validate_cache[cache_key] = stored
+                return stored
+
         # Build Parameters resource
         parameters = [
             {"name": "url", "valueUri": base_url},
@@ -53,7 +160,11 @@ def validate_code_in_valueset(endpoint, valueset_url, coding):
             'Content-Type': 'application/fhir+json'
         }
         url = f"{endpoint}/ValueSet/$validate-code"
-        response = requests.post(url, headers=headers, json=params, timeout=30)
+        try:
+            # $validate-code doesn't change server state, so it is safe to retry
+            response = get_client().post(url, headers=headers, json=params, idempotent=True)
+        except EndpointUnavailable as e:
+            return {"result": 'UNAVAILABLE', "reason": str(e), "status_code": 0}
         status = response.status_code
         reason = ''
         result_flag = 'CHECK'
@@ -77,6 +188,10 @@ def validate_code_in_valueset(endpoint, valueset_url, coding):
                 else:
                     result_flag = 'CHECK'
                     reason = 'Not a member of ValueSet'
+        elif status == 429 or status >= 500:
+            # Server busy or failing even after retries; not a statement about the code
+            result_flag = 'UNAVAILABLE'
+            reason = f'http status: {status}'
         elif status == 404:
             # Clearer message when ValueSet is absent on the terminology server
             if version:
@@ -95,8 +210,16 @@ def validate_code_in_valueset(endpoint, valueset_url, coding):
             except Exception:
                 reason = f'http status: {status}'
         result = {"result": result_flag, "reason": reason, "status_code": status}
+        if result_flag == 'UNAVAILABLE':
+            return result
         _valueset_validate_cache[cache_key] = result
+        # Only definitive answers are kept between runs
+        if cache and status in (200, 404):
+            cache.put(endpoint, VS_VALIDATE_CODE, base_url, version, coding.get('system'), coding.get('code'), result=result)
         return result
+    except RequestException as e:
+        logger.debug(f"Terminology server unreachable validating coding in ValueSet {valueset_url}: {e}")
+        return {"result": 'UNAVAILABLE', "reason": f'exception: {e}', "status_code": 0}
     except Exception as e:
         logger.debug(f"Error validating coding in ValueSet {valueset_url}: {e}")
         return {"result": 'CHECK', "reason": f'exception: {e}', "status_code": 0}
@@ -104,204 +227,223 @@ def validate_code_in_valueset(endpoint, valueset_url, coding):
 
 def find_profile_by_url(ig_package_dir, profile_url):
     """Locate a StructureDefinition in an IG package directory by its canonical URL"""
-    try:
-        for root, dirs, files in os.walk(ig_package_dir):
-            for file in files:
-                if file.startswith("StructureDefinition") and file.endswith(".json"):
-                    path = os.path.join(root, file)
-                    with open(path, 'r') as f:
-                        data = json.load(f)
-                    if data.get('resourceType') == 'StructureDefinition' and data.get('url') == profile_url:
-                        return path
-    except Exception as e:
-        logger.debug(f"Error finding profile {profile_url} in {ig_package_dir}: {e}")
-    return None
+    entry = get_package_index(ig_package_dir).get(profile_url, "StructureDefinition")
+    return entry["path"] if entry else None
 
 
 def find_profiles_by_resource_type(ig_package_dir, resource_type):
     """
     Find all profiles in an IG package that constrain a given resource type.
-    Returns list of profile paths that have baseDefinition constraining the resource type.
+    Returns list of profile paths whose type (or resolved baseDefinition chain) is
+    exactly that resource type, from the package index's type -> profiles map.
     """
-    profiles = []
-    try:
-        for root, dirs, files in os.walk(ig_package_dir):
-            for file in files:
-                if file.startswith("StructureDefinition") and file.endswith(".json"):
-                    path = os.path.join(root, file)
-                    with open(path, 'r') as f:
-                        data = json.load(f)
-                    if data.get('resourceType') != 'StructureDefinition':
-                        continue
-                    # Check if this profile constrains the resource type
-                    base = data.get('baseDefinition', '')
-                    if resource_type in base and data.get('kind') == 'resource':
-                        profiles.append(path)
-    except Exception as e:
-        logger.debug(f"Error finding profiles by resource type {resource_type} in {ig_package_dir}: {e}")
-    return profiles
+    return [entry["path"] for entry in get_package_index(ig_package_dir).profiles_of_type(resource_type)]
 
 
 def build_binding_map(profile_path, config_options):
     """
     Build a mapping of element path -> list of bindings from a StructureDefinition.
     Includes main binding, additional-binding extension, and legacy additionalBinding.
-    Filters by minimum binding strengths and optional MustSupport.
+    Filters by minimum binding strengths and optional MustSupport, using the profile
+    analysis shared with the ValueSet binding report.
     """
     bindings = {}
     try:
-        with open(profile_path, 'r') as f:
-            sd = json.load(f)
-        if sd.get('resourceType') != 'StructureDefinition':
+        analysis = analyse_profile(profile_path)
+        if analysis is None:
             return bindings
-
-        require_must_support = config_options.get("require-must-support", True)
-        min_strengths = set(config_options.get("minimum-binding-strength", ["required", "extensible", "preferred"]))
-
-        for view in ("snapshot", "differential"):
-            elements = evaluate(sd, f"{view}.element")
-            if not isinstance(elements, (list, tuple)):
-                elements = [elements] if elements is not None else []
-            for el in elements:
-                if not isinstance(el, dict):
-                    continue
-                path = el.get('path')
-                if not path:
-                    continue
-                must_support = el.get('mustSupport', False)
-                if require_must_support and not must_support:
-                    continue
-                # Main binding
-                if 'binding' in el:
-                    b = el['binding']
-                    vs = b.get('valueSet')
-                    strength = b.get('strength')
-                    if vs and strength in min_strengths:
-                        bindings.setdefault(path, []).append({"valueSet": vs, "strength": strength})
-
-                    # additional-binding extension
-                    ext = b.get('extension')
-                    if ext:
-                        if not isinstance(ext, (list, tuple)):
-                            ext = [ext]
-                        for e in ext:
-                            if isinstance(e, dict) and e.get('url') == 'http://hl7.org/fhir/tools/StructureDefinition/additional-binding':
-                                nested = e.get('extension') or []
-                                if not isinstance(nested, (list, tuple)):
-                                    nested = [nested]
-                                vs_url = None
-                                purpose = None
-                                for ne in nested:
-                                    if not isinstance(ne, dict):
-                                        continue
-                                    if ne.get('url') == 'valueSet':
-                                        vs_url = ne.get('valueCanonical')
-                                    elif ne.get('url') == 'purpose':
-                                        purpose = ne.get('valueCode')
-                                chosen_strength = purpose if purpose in min_strengths else strength
-                                if vs_url and chosen_strength in min_strengths:
-                                    bindings.setdefault(path, []).append({"valueSet": vs_url, "strength": chosen_strength})
-
-                    # legacy additionalBinding
-                    add = b.get('additionalBinding')
-                    if add:
-                        if not isinstance(add, (list, tuple)):
-                            add = [add]
-                        for ab in add:
-                            if isinstance(ab, dict):
-                                vs2 = ab.get('valueSet')
-                                st2 = ab.get('strength')
-                                if vs2 and st2 in min_strengths:
-                                    bindings.setdefault(path, []).append({"valueSet": vs2, "strength": st2})
+        for binding, strength in analysis.bindings(config_options):
+            bindings.setdefault(binding.path, []).append({"valueSet": binding.valueSet, "strength": strength})
     except Exception as e:
         logger.debug(f"Error building binding map from {profile_path}: {e}")
     return bindings
 
 
-def collect_codings_with_paths(resource):
-    """Traverse a resource and collect (path, coding) for any Coding dicts"""
-    codings = []
+def _options_key(config_options):
+    return json.dumps(config_options, sort_keys=True, default=str)
 
-    def walk(node, path):
-        if isinstance(node, dict):
-            # Detect Coding
-            if 'system' in node and 'code' in node and isinstance(node.get('system'), str) and isinstance(node.get('code'), str):
-                codings.append((path, {"system": node.get('system'), "code": node.get('code')}))
-            for k, v in node.items():
-                walk(v, f"{path}.{k}" if path else k)
-        elif isinstance(node, list):
-            for item in node:
-                walk(item, path)
 
-    root_path = resource.get('resourceType') or ''
-    walk(resource, root_path)
-    return codings
+def get_binding_map(profile_path, config_options):
+    """
+    build_binding_map for one profile, computed once per (profile, options) and
+    reused while the profile file is unchanged. The map is shared: don't modify it.
+    """
+    key = (profile_path, path_mtime(profile_path), _options_key(config_options))
+    bindings = _binding_map_cache.get(key)
+    if bindings is None:
+        bindings = build_binding_map(profile_path, config_options)
+        _binding_map_cache[key] = bindings
+    return bindings
 
 
-def best_binding_paths(coding_path, binding_keys):
+def get_merged_bindings(package_dir, profiles, config_options):
     """
-    Find best matching binding paths for a coding path.
-    Normalises paths (removing slice names and value[x] polymorphism) before matching
-    to avoid mapping extension codings onto unrelated element bindings.
-    Returns only the MOST SPECIFIC (longest) match to prevent extension bindings
-    from also matching parent element bindings.
+    The binding maps of several profiles (canonical urls) merged into one, with each
+    path's bindings deduplicated by (valueSet, strength). Memoized per distinct
+    combination of profiles, so examples sharing a meta.profile share the map, and
+    rebuilt when one of the profile files changes.
     """
+    profile_paths = []
+    for purl in profiles:
+        profile_path = find_profile_by_url(package_dir, purl)
+        if profile_path:
+            profile_paths.append(profile_path)
+        else:
+            logger.debug(f"Profile not found in {package_dir}: {purl}")
+    key = (package_dir, tuple((path, path_mtime(path)) for path in profile_paths), _options_key(config_options))
+    merged = _merged_bindings_cache.get(key)
+    if merged is None:
+        merged = {}
+        for profile_path in profile_paths:
+            for path, entries in get_binding_map(profile_path, config_options).items():
+                merged.setdefault(path, []).extend(entries)
+        for path, entries in merged.items():
+            unique = {}
+            for entry in entries:
+                unique.setdefault((entry.get('valueSet'), entry.get('strength')), entry)
+            merged[path] = list(unique.values())
+        _merged_bindings_cache[key] = merged
+    return merged
+
+
+def collect_codings_with_paths(resource, extractor=None):
+    """Traverse a resource and collect (path, coding) for any Coding dicts on allowed paths"""
+    extractor = extractor or get_coding_extractor()
+    return [(path, {"system": system, "code": code}) for path, system, code in extractor.extract(resource)]
+
+
+def _normalise_binding_path(path):
+    """Path segments with slice names (extension:foo) and value[x] types (valueCoding) removed"""
+    parts = []
+    for seg in path.split('.'):
+        if seg.startswith('extension:'):
+            parts.append('extension')
+        elif seg.startswith('value'):
+            parts.append('value')
+        else:
+            parts.append(seg)
+    return parts
 
-    def _normalise(path):
-        parts = []
-        for seg in path.split('.'):
-            if seg.startswith('extension:'):
-                parts.append('extension')
-            elif seg.startswith('value'):
-                parts.append('value')
-            else:
-                parts.append(seg)
-        return '.'.join(parts)
 
-    norm_path = _normalise(coding_path)
-    # Some profiles bind at the element level (e.g., Medication.code.extension) while
-    # instance codings sit under Medication.code.coding.extension; allow a variant with
-    # the first '.coding.' segment removed to match those bindings.
-    variants = [norm_path]
-    if '.coding.' in norm_path:
-        variants.append(norm_path.replace('.coding.', '.', 1))
+##
+## BindingMatcher: longest-match lookup of coding paths against binding paths
+##
+class BindingMatcher:
+    """
+    Precompiled matcher for one set of binding paths (the keys of a merged binding
+    map). The normalised paths are held in a segment trie, so a lookup walks the
+    coding path once, in O(path depth), instead of scanning every key. Results are
+    memoized per coding path. See best_binding_paths for the matching rules.
+    """
 
-    norm_keys = [(key, _normalise(key)) for key in binding_keys]
-    keys_sorted = sorted(norm_keys, key=lambda kv: len(kv[1]), reverse=True)
+    def __init__(self, binding_keys):
+        self._root = {}
+        self._order = {}
+        for position, key in enumerate(binding_keys):
+            parts = _normalise_binding_path(key)
+            norm_key = '.'.join(parts)
+            node = self._root
+            for seg in parts:
+                node = node.setdefault(seg, {})
+            # Terminal: (normalised key, binding in an extension context, raw keys)
+            terminal = node.setdefault(None, (norm_key, '.extension.' in norm_key, []))
+            terminal[2].append(key)
+            self._order.setdefault(key, position)
+        self._memo = {}
+
+    def _prefix_terminals(self, parts):
+        """Terminals of the keys that are segment prefixes of (or equal to) parts"""
+        node = self._root
+        found = []
+        for seg in parts:
+            node = node.get(seg)
+            if node is None:
+                break
+            if None in node:
+                found.append(node[None])
+        return found
+
+    def _subtree_terminals(self, parts):
+        """Terminals of the keys strictly below parts"""
+        node = self._root
+        for seg in parts:
+            node = node.get(seg)
+            if node is None:
+                return []
+        found = []
+        stack = [child for seg, child in node.items() if seg is not None]
+        while stack:
+            node = stack.pop()
+            if None in node:
+                found.append(node[None])
+            stack.extend(child for seg, child in node.items() if seg is not None)
+        return found
+
+    def _longest(self, terminals):
+        if not terminals:
+            return []
+        max_len = max(len(norm_key) for norm_key, _, _ in terminals)
+        keys = {key for norm_key, _, raw_keys in terminals if len(norm_key) == max_len for key in raw_keys}
+        return sorted(keys, key=self._order.get)
+
+    def match(self, coding_path):
+        result = self._memo.get(coding_path)
+        if result is None:
+            result = self._match(coding_path)
+            self._memo[coding_path] = result
+        return list(result)
+
+    def _match(self, coding_path):
+        parts = _normalise_binding_path(coding_path)
+        norm_path = '.'.join(parts)
+        variants = [parts]
+        if '.coding.' in norm_path:
+            variants.append(norm_path.replace('.coding.', '.', 1).split('.'))
+        coding_in_extension = '.extension.' in norm_path
+
+        terminals = {}
+        for variant in variants:
+            for terminal in self._prefix_terminals(variant):
+                if coding_in_extension and not terminal[1]:
+                    continue
+                terminals[terminal[0]] = terminal
+        if terminals:
+            return self._longest(list(terminals.values()))
 
-    candidates = []
+        if coding_path.endswith('.coding') or coding_path.endswith('.valueCoding'):
+            parent = parts[:-1]
+            terminals = {terminal[0]: terminal for terminal in self._prefix_terminals(parent) + self._subtree_terminals(parent)}
+            return self._longest(list(terminals.values()))
+        return []
+
+
+_binding_matchers = {}
+
+def get_binding_matcher(binding_keys):
+    """BindingMatcher for a set of binding paths, built once per distinct set"""
+    key = tuple(binding_keys)
+    matcher = _binding_matchers.get(key)
+    if matcher is None:
+        matcher = BindingMatcher(key)
+        _binding_matchers[key] = matcher
+    return matcher
 
-    # First pass: exact and prefix matches
-    # If coding is in an extension context (.extension.), only match bindings that also contain .extension.
-    coding_in_extension = '.extension.' in norm_path
-    
-    for raw_key, norm_key in keys_sorted:
-        # If coding is in extension but binding is not, skip it (don't match parent element bindings to extension codings)
-        if coding_in_extension and '.extension.' not in norm_key:
-            continue
-            
-        for candidate_path in variants:
-            if candidate_path == norm_key or candidate_path.startswith(norm_key + '.'):
-                candidates.append((raw_key, len(norm_key)))
-                break
-    
-    # Return only the longest (most specific) match(es)
-    if candidates:
-        max_len = max(c[1] for c in candidates)
-        return [c[0] for c in candidates if c[1] == max_len]
 
-    # If nothing and path ends with '.coding' or '.valueCoding', try parent using normalised values
-    if coding_path.endswith('.coding') or coding_path.endswith('.valueCoding'):
-        parent_norm = norm_path.rsplit('.', 1)[0]
-        for raw_key, norm_key in keys_sorted:
-            if parent_norm == norm_key or parent_norm.startswith(norm_key + '.') or norm_key.startswith(parent_norm + '.'):
-                candidates.append((raw_key, len(norm_key)))
-        # Return only the longest match from parent fallback
-        if candidates:
-            max_len = max(c[1] for c in candidates)
-            return [c[0] for c in candidates if c[1] == max_len]
+def best_binding_paths(coding_path, binding_keys):
+    """
+    Find best matching binding paths for a coding path.
+    Normalises paths (removing slice names and value[x] polymorphism) before matching
+    to avoid mapping extension codings onto unrelated element bindings.
+    Returns only the MOST SPECIFIC (longest) match to prevent extension bindings
+    from also matching parent element bindings.
 
-    return []
+    Some profiles bind at the element level (e.g., Medication.code.extension) while
+    instance codings sit under Medication.code.coding.extension, so a variant of the
+    path with the first '.coding.' segment removed is matched too. A coding in an
+    extension context only matches bindings that are also in one. If nothing matches
+    a path ending in .coding or .valueCoding, its parent element is tried instead.
+    """
+    return get_binding_matcher(binding_keys).match(coding_path)
 
 
 def run_example_valueset_membership_check(endpoint, config_file, npm_path_list, outdir):
@@ -318,6 +460,11 @@ def run_example_valueset_membership_check(endpoint, config_file, npm_path_list,
     except Exception:
         config_options = {}
 
+    # Expansion prefetch: small bound ValueSets are expanded once and checked in memory
+    tx_options = get_tx_client_options(config_file)
+    prefetch_limit = tx_options['expansion-prefetch-limit']
+    page_size = tx_options['expansion-page-size']
+
     # Load excluded ValueSets
     try:
         excluded_vs_config = get_config(config_file, 'valueset-excluded') or []
@@ -381,154 +528,125 @@ def run_example_valueset_membership_check(endpoint, config_file, npm_path_list,
         for root_dir, recursive in example_dirs:
             for ex in glob_json(root_dir, recursive=recursive):
                 try:
-                    with open(ex, 'r') as f:
-                        resource = json.load(f)
+                    # Parsed once by the example scan (large Bundles: one entry per resource)
+                    for resource_type, explicit_profiles, coded_paths in get_example_scan(ex).resources:
                     
-                    # Try to get explicit profiles from meta.profile
-                    profiles = resource.get('meta', {}).get('profile', []) or []
-                    if not isinstance(profiles, (list, tuple)):
-                        profiles = [profiles]
-                    profiles = [p for p in profiles if p]  # Filter out empty strings
+                        # Explicit profiles from meta.profile
+                        profiles = list(explicit_profiles)
                     
-                    # Fallback: if no explicit profile, infer from resource type
-                    resource_type = resource.get('resourceType')
-                    if not profiles and resource_type:
-                        logger.debug(f"No explicit profile for {resource_type} in {ex}, inferring from resource type")
-                        inferred_profile_paths = find_profiles_by_resource_type(package_dir, resource_type)
-                        if inferred_profile_paths:
-                            # Extract URLs from inferred profiles and use those paths directly
-                            for profile_path in inferred_profile_paths:
-                                try:
-                                    with open(profile_path, 'r') as pf:
-                                        profile_data = json.load(pf)
-                                        profile_url = profile_data.get('url')
-                                        if profile_url:
-                                            profiles.append(profile_url)
-                                except Exception:
-                                    pass
+                        # Fallback: if no explicit profile, infer from resource type
+                        if not profiles and resource_type:
+                            logger.debug(f"No explicit profile for {resource_type} in {ex}, inferring from resource type")
+                            # Canonical urls come straight from the package index
+                            for entry in get_package_index(package_dir).profiles_of_type(resource_type):
+                                if entry.get('url'):
+                                    profiles.append(entry['url'])
                     
-                    # Build merged binding map from all referenced or inferred profiles
-                    merged_bindings = {}
-                    for purl in profiles:
-                        profile_path = find_profile_by_url(package_dir, purl)
-                        if not profile_path:
-                            logger.debug(f"Profile not found for example {ex}: {purl}")
-                            continue
-                        bmap = build_binding_map(profile_path, config_options)
-                        for k, v in bmap.items():
-                            merged_bindings.setdefault(k, []).extend(v)
-
-                    if not merged_bindings:
-                        # No binding info; skip this example
-                        continue
-
-                    # Collect codings with their resource paths
-                    codings = collect_codings_with_paths(resource)
-                    seen_validations = set()
-                    for path, coding in codings:
-                        bind_keys = list(merged_bindings.keys())
-                        matched_paths = best_binding_paths(path, bind_keys)
-                        if not matched_paths:
+                        # Merged binding map of all referenced or inferred profiles (memoized per combination)
+                        merged_bindings = get_merged_bindings(package_dir, profiles, config_options)
+
+                        if not merged_bindings:
+                            # No binding info; skip this example
                             continue
-                        for mp in matched_paths:
-                            # Deduplicate bindings per path
-                            unique_bindings = []
-                            seen_bindings = set()
-                            for entry in merged_bindings.get(mp, []):
-                                vs_url = entry.get('valueSet')
-                                strength = entry.get('strength')
-                                key = (vs_url, strength)
-                                if key in seen_bindings:
-                                    continue
-                                seen_bindings.add(key)
-                                unique_bindings.append(entry)
-
-                            for entry in unique_bindings:
-                                vs_url = entry.get('valueSet')
-                                strength = entry.get('strength')
-
-                                # Check if CodeSystem is excluded
-                                coding_system = coding.get('system')
-                                cs_base = coding_system.split('|')[0] if coding_system and '|' in coding_system else coding_system
-                                if cs_base in excluded_cs_uris:
-                                    reason = f"Codesystem is excluded"
-                                    if cs_base in cs_reason_map:
-                                        reason = f"Codesystem is excluded: {cs_reason_map[cs_base]}"
-                                    results_rows.append({
-                                        'file': split_node_path(ex),
-                                        'source': ex,
-                                        'path': path,
-                                        'binding_path': mp,
-                                        'system': coding_system,
-                                        'code': coding.get('code'),
-                                        'valueset': vs_url,
-                                        'strength': strength,
-                                        'vs_result': 'EXCLUDED',
-                                        'reason': reason
-                                    })
-                                    continue
+
+                        # Collect codings with their resource paths
+                        codings = [(path, {"system": system, "code": code}) for path, system, code in coded_paths]
+                        seen_validations = set()
+                        matcher = get_binding_matcher(merged_bindings.keys())
+                        for path, coding in codings:
+                            matched_paths = matcher.match(path)
+                            if not matched_paths:
+                                continue
+                            for mp in matched_paths:
+                                # Bindings are already deduplicated per path in the merged map
+                                unique_bindings = merged_bindings.get(mp, [])
+
+                                for entry in unique_bindings:
+                                    vs_url = entry.get('valueSet')
+                                    strength = entry.get('strength')
+
+                                    # Check if CodeSystem is excluded
+                                    coding_system = coding.get('system')
+                                    cs_base = coding_system.split('|')[0] if coding_system and '|' in coding_system else coding_system
+                                    if cs_base in excluded_cs_uris:
+                                        reason = f"Codesystem is excluded"
+                                        if cs_base in cs_reason_map:
+                                            reason = f"Codesystem is excluded: {cs_reason_map[cs_base]}"
+                                        results_rows.append({
+                                            'file': split_node_path(ex),
+                                            'source': ex,
+                                            'path': path,
+                                            'binding_path': mp,
+                                            'system': coding_system,
+                                            'code': coding.get('code'),
+                                            'valueset': vs_url,
+                                            'strength': strength,
+                                            'vs_result': 'EXCLUDED',
+                                            'reason': reason
+                                        })
+                                        continue
+                                
+                                    # Check if ValueSet is excluded
+                                    vs_base = vs_url.split('|')[0] if '|' in vs_url else vs_url
+                                    if vs_base in excluded_vs_uris:
+                                        # Find the exclusion reason
+                                        reason = 'ValueSet excluded from validation'
+                                        for exc in excluded_vs_config:
+                                            if exc.get('uri', '').split('|')[0] == vs_base:
+                                                reason = exc.get('reason', reason)
+                                                break
+                                        results_rows.append({
+                                            'file': split_node_path(ex),
+                                            'path': path,
+                                            'binding_path': mp,
+                                            'system': coding.get('system'),
+                                            'code': coding.get('code'),
+                                            'valueset': vs_url,
+                                            'strength': strength,
+                                            'vs_result': 'EXCLUDED',
+                                            'reason': reason
+                                        })
+                                        continue
+                                
+                                    validation_key = (vs_url, coding.get('system'), coding.get('code'))
+                                    if validation_key in seen_validations:
+                                        check = _valueset_validate_cache.get((endpoint, *validation_key))
+                                        if not check:
+                                            check = validate_code_in_valueset(endpoint, vs_url, coding, prefetch_limit, page_size)
+                                    else:
+                                        seen_validations.add(validation_key)
+                                        check = validate_code_in_valueset(endpoint, vs_url, coding, prefetch_limit, page_size)
+                                    result_status = check['result']
+                                    result_reason = check['reason']
+                                
+                                    # If validation checked but code not in ValueSet, detect if it's a system mismatch
+                                    if result_status == 'CHECK' and 'Not a member of ValueSet' in result_reason:
+                                        # Heuristic: detect system mismatch by checking if coding system is obviously incompatible
+                                        coding_system = coding.get('system', '').lower()
+                                        vs_url_lower = vs_url.lower()
+                                        # If code is from AIR/PBS/MIMS and ValueSet is for SNOMED/LOINC/AMT, mark as NOT_APPLICABLE
+                                        if ('air-' in coding_system or '/air/' in coding_system or 'pbs' in coding_system or 'mims' in coding_system) and \
+                                           ('snomed' in vs_url_lower or 'loinc' in vs_url_lower or 'icd' in vs_url_lower or 'amt' in vs_url_lower):
+                                            result_status = 'NOT_APPLICABLE'
+                                            result_reason = f'Code system not applicable to this ValueSet'
+                                        # Reverse scenario: ValueSet is AIR and coding system is SNOMED/LOINC/AMT/ICD
+                                        elif ('air' in vs_url_lower or 'australian-immunisation-register' in vs_url_lower) and \
+                                             ('snomed' in coding_system or 'loinc' in coding_system or 'icd' in coding_system or 'amt' in coding_system):
+                                            result_status = 'NOT_APPLICABLE'
+                                            result_reason = f'Code system not applicable to this ValueSet'
                                 
-                                # Check if ValueSet is excluded
-                                vs_base = vs_url.split('|')[0] if '|' in vs_url else vs_url
-                                if vs_base in excluded_vs_uris:
-                                    # Find the exclusion reason
-                                    reason = 'ValueSet excluded from validation'
-                                    for exc in excluded_vs_config:
-                                        if exc.get('uri', '').split('|')[0] == vs_base:
-                                            reason = exc.get('reason', reason)
-                                            break
                                     results_rows.append({
                                         'file': split_node_path(ex),
+                                        'source': ex,
                                         'path': path,
                                         'binding_path': mp,
                                         'system': coding.get('system'),
                                         'code': coding.get('code'),
                                         'valueset': vs_url,
                                         'strength': strength,
-                                        'vs_result': 'EXCLUDED',
-                                        'reason': reason
+                                        'vs_result': result_status,
+                                        'reason': result_reason
                                     })
-                                    continue
-                                
-                                validation_key = (vs_url, coding.get('system'), coding.get('code'))
-                                if validation_key in seen_validations:
-                                    check = _valueset_validate_cache.get((endpoint, *validation_key))
-                                    if not check:
-                                        check = validate_code_in_valueset(endpoint, vs_url, coding)
-                                else:
-                                    seen_validations.add(validation_key)
-                                    check = validate_code_in_valueset(endpoint, vs_url, coding)
-                                result_status = check['result']
-                                result_reason = check['reason']
-                                
-                                # If validation checked but code not in ValueSet, detect if it's a system mismatch
-                                if result_status == 'CHECK' and 'Not a member of ValueSet' in result_reason:
-                                    # Heuristic: detect system mismatch by checking if coding system is obviously incompatible
-                                    coding_system = coding.get('system', '').lower()
-                                    vs_url_lower = vs_url.lower()
-                                    # If code is from AIR/PBS/MIMS and ValueSet is for SNOMED/LOINC/AMT, mark as NOT_APPLICABLE
-                                    if ('air-' in coding_system or '/air/' in coding_system or 'pbs' in coding_system or 'mims' in coding_system) and \
-                                       ('snomed' in vs_url_lower or 'loinc' in vs_url_lower or 'icd' in vs_url_lower or 'amt' in vs_url_lower):
-                                        result_status = 'NOT_APPLICABLE'
-                                        result_reason = f'Code system not applicable to this ValueSet'
-                                    # Reverse scenario: ValueSet is AIR and coding system is SNOMED/LOINC/AMT/ICD
-                                    elif ('air' in vs_url_lower or 'australian-immunisation-register' in vs_url_lower) and \
-                                         ('snomed' in coding_system or 'loinc' in coding_system or 'icd' in coding_system or 'amt' in coding_system):
-                                        result_status = 'NOT_APPLICABLE'
-                                        result_reason = f'Code system not applicable to this ValueSet'
-                                
-                                results_rows.append({
-                                    'file': split_node_path(ex),
-                                    'source': ex,
-                                    'path': path,
-                                    'binding_path': mp,
-                                    'system': coding.get('system'),
-                                    'code': coding.get('code'),
-                                    'valueset': vs_url,
-                                    'strength': strength,
-                                    'vs_result': result_status,
-                                    'reason': result_reason
-                                })
                 except Exception as e:
                     logger.debug(f"Error processing example {ex}: {e}")
 
@@ -562,6 +680,7 @@ def run_example_valueset_membership_check(endpoint, config_file, npm_path_list,
                 ".status-check { background-color: #ffe5e5; }",
                 ".status-not-applicable { background-color: #f0f0f0; }",
                 ".status-excluded { background-color: #fff3e0; }",
+                ".status-unavailable { background-color: #e8eaf6; }",
                 "h2 { color: #666; font-size: 14px; font-weight: normal; margin: 10px 0 20px 0; }",
                 "</style>",
                 "</head>",
@@ -584,6 +703,8 @@ def run_example_valueset_membership_check(endpoint, config_file, npm_path_list,
                     status_class = "status-not-applicable"
                 elif r.get('vs_result') == 'EXCLUDED':
                     status_class = "status-excluded"
+                elif r.get('vs_result') == 'UNAVAILABLE':
+                    status_class = "status-unavailable"
                 html_parts.append("<tr>")
                 for col in columns:
                     val = r.get(col, "")
@@ -626,12 +747,5 @@ def run_example_valueset_membership_check(endpoint, config_file, npm_path_list,
 
 
 def glob_json(root, recursive=False):
-    import glob
-    from os.path import isfile
-    if recursive:
-        pattern = f"{root}/**/*.json"
-    else:
-        pattern = f"{root}/*.json"
-    for item in glob.glob(pattern, recursive=recursive):
-        if isfile(item):
-            yield item
+    # root may be a folder inside a package tarball
+    yield from list_json_files(root, recursive=recursive)
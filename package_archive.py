@@ -0,0 +1,205 @@
+import io
+import os
+import glob
+import gzip
+import json
+import shutil
+import tarfile
+import logging
+import tempfile
+import threading
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIXES = (".tgz", ".tar.gz")
+
+##
+## PackageArchive: random access to the members of a package tarball
+##
+class PackageArchive:
+    """
+    An npm package tarball (package.tgz) read without extracting it.
+
+    The gzip stream is decompressed once into a single temporary tar file while
+    the member index (name -> data offset and size) is built; after that each
+    member is read on demand by seeking straight to its data. No per-resource
+    files are written to disk.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._members = {}
+        self._folders = {}
+        self._lock = threading.Lock()
+        self._tar = tempfile.TemporaryFile()
+        with gzip.open(path, 'rb') as stream:
+            shutil.copyfileobj(stream, self._tar, 1024 * 1024)
+        self._tar.seek(0)
+        with tarfile.open(fileobj=self._tar, mode='r:') as tar:
+            for member in tar:
+                if not member.isfile():
+                    continue
+                name = member.name[2:] if member.name.startswith('./') else member.name
+                self._members[name] = (member.offset_data, member.size)
+                folder, file = os.path.split(name)
+                self._folders.setdefault(folder, []).append(file)
+        logger.info(f"Indexed {len(self._members)} members of {path}")
+
+    def __len__(self):
+        return len(self._members)
+
+    def exists(self, member):
+        return member in self._members or self.isdir(member)
+
+    def isdir(self, member):
+        member = member.strip('/')
+        return member in self._folders or any(folder.startswith(member + '/') for folder in self._folders)
+
+    def listdir(self, folder):
+        """File names directly in a folder of the archive"""
+        return sorted(self._folders.get(folder.strip('/'), []))
+
+    def folders(self):
+        return sorted(self._folders)
+
+    def size(self, member):
+        """Uncompressed size of one member in bytes"""
+        try:
+            return self._members[member][1]
+        except KeyError:
+            raise FileNotFoundError(f"{member} not found in {self.path}")
+
+    def read(self, member):
+        """The bytes of one member"""
+        offset, size = self._member(member)
+        return self._read_at(offset, size)
+
+    def open(self, member, buffer_size=io.DEFAULT_BUFFER_SIZE):
+        """A binary file object reading one member in chunks, without loading it whole"""
+        offset, size = self._member(member)
+        return io.BufferedReader(_MemberStream(self, offset, size), buffer_size)
+
+    def _member(self, member):
+        try:
+            return self._members[member]
+        except KeyError:
+            raise FileNotFoundError(f"{member} not found in {self.path}")
+
+    def _read_at(self, offset, size):
+        with self._lock:
+            self._tar.seek(offset)
+            return self._tar.read(size)
+
+    def close(self):
+        self._tar.close()
+
+
+class _MemberStream(io.RawIOBase):
+    """Raw read-only stream over one member's data in a PackageArchive's tar file"""
+
+    def __init__(self, archive, offset, size):
+        self._archive = archive
+        self._offset = offset
+        self._size = size
+        self._pos = 0
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        count = min(len(buffer), self._size - self._pos)
+        if count <= 0:
+            return 0
+        data = self._archive._read_at(self._offset + self._pos, count)
+        buffer[:len(data)] = data
+        self._pos += len(data)
+        return len(data)
+
+
+_archives = {}
+_archive_lock = threading.Lock()
+
+def get_archive(path):
+    """PackageArchive for a tarball, indexed on first use and reused while it is unchanged"""
+    path = os.path.abspath(path)
+    mtime = os.stat(path).st_mtime_ns
+    with _archive_lock:
+        cached = _archives.get(path)
+        if cached is None or cached[0] != mtime:
+            if cached:
+                cached[1].close()
+            cached = (mtime, PackageArchive(path))
+            _archives[path] = cached
+        return cached[1]
+
+
+def split_archive_path(path):
+    """
+    Split a path that runs into a package tarball, e.g.
+    /cache/hl7.fhir.au.base#5.0.0.tgz/package/ValueSet-x.json, into the tarball
+    and the member name. Returns (None, None) for ordinary paths.
+    """
+    normalised = path.replace(os.sep, '/')
+    for suffix in ARCHIVE_SUFFIXES:
+        index = normalised.find(suffix + '/')
+        if index < 0 and normalised.endswith(suffix):
+            index = len(normalised) - len(suffix)
+        if index >= 0:
+            archive = path[:index + len(suffix)]
+            if os.path.isfile(archive):
+                return archive, normalised[index + len(suffix):].strip('/')
+    return None, None
+
+
+def strip_archive_suffix(name):
+    """A package file name without its tarball suffix (hl7.fhir.r4.core#4.0.1.tgz -> hl7.fhir.r4.core#4.0.1)"""
+    for suffix in ARCHIVE_SUFFIXES:
+        if name.endswith(suffix):
+            return name[:-len(suffix)]
+    return name
+
+
+def is_archive(path):
+    return path.endswith(ARCHIVE_SUFFIXES) and os.path.isfile(path)
+
+
+def path_exists(path):
+    archive, member = split_archive_path(path)
+    if archive is None:
+        return os.path.exists(path)
+    return member == '' or get_archive(archive).exists(member)
+
+
+def path_isdir(path):
+    archive, member = split_archive_path(path)
+    if archive is None:
+        return os.path.isdir(path)
+    return member == '' or get_archive(archive).isdir(member)
+
+
+def path_mtime(path):
+    """Modification time in ns of a file, or of the tarball holding it"""
+    archive, member = split_archive_path(path)
+    return os.stat(archive or path).st_mtime_ns
+
+
+def load_json(path):
+    """Parse a JSON file, which may be a member of a package tarball"""
+    archive, member = split_archive_path(path)
+    if archive is None:
+        with open(path, 'r') as f:
+            return json.load(f)
+    return json.loads(get_archive(archive).read(member))
+
+
+def list_json_files(folder, prefix='', recursive=False):
+    """Paths of the *.json files in a folder (or tarball folder), optionally starting with prefix"""
+    archive, member = split_archive_path(folder)
+    if archive is None:
+        pattern = os.path.join(folder, "**", f"{prefix}*.json") if recursive else os.path.join(folder, f"{prefix}*.json")
+        return [item for item in glob.glob(pattern, recursive=recursive) if os.path.isfile(item)]
+    package = get_archive(archive)
+    folders = [member] if not recursive else [f for f in package.folders() if f == member or f.startswith(member + '/') or not member]
+    return [os.path.join(archive, sub, file) if sub else os.path.join(archive, file)
+            for sub in folders for file in package.listdir(sub)
+            if file.startswith(prefix) and file.endswith(".json")]
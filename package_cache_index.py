@@ -0,0 +1,184 @@
+import os
+import json
+import hashlib
+import sqlite3
+import logging
+import threading
+from package_index import IndexEntry, read_folder_index, read_archive_folder_index
+from package_archive import path_isdir, path_mtime, split_archive_path
+
+logger = logging.getLogger(__name__)
+
+# Resource types whose name/title are stored (read from the file once, when a package is indexed)
+TITLED_TYPES = ("ValueSet", "CodeSystem")
+
+##
+## PackageCacheIndex: persistent index of every package in the FHIR package cache
+##
+class PackageCacheIndex:
+    """
+    SQLite index of the canonical resources in every package of a FHIR package
+    cache (~/.fhir/packages), keyed by canonical url.
+
+    update() brings the index up to date incrementally. Packages may be folders
+    or .tgz tarballs. Those whose package/ folder (or tarball) mtime is unchanged
+    are skipped; for the others the .index.json is read
+    (or the folder indexed, if it has none) and the package is only re-indexed if
+    the index's content hash differs from the one recorded. Nothing is written
+    into the package cache itself. Packages removed from the cache are
+    dropped. A warm update is one stat per package.
+
+    Args:
+        path: SQLite database file (created if missing), or ':memory:'
+        fhir_cache_path: root of the FHIR package cache
+    """
+
+    def __init__(self, path, fhir_cache_path):
+        self.path = path
+        self.fhir_cache_path = fhir_cache_path
+        self._updated = False
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        if path != ':memory:':
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS packages (
+                package TEXT PRIMARY KEY,
+                mtime INTEGER NOT NULL,
+                index_hash TEXT NOT NULL
+            )""")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS resources (
+                package TEXT NOT NULL,
+                path TEXT NOT NULL,
+                resource_type TEXT NOT NULL,
+                url TEXT NOT NULL,
+                version TEXT,
+                name TEXT,
+                title TEXT
+            )""")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS resources_url ON resources (url)")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS resources_package ON resources (package)")
+        self._conn.commit()
+
+    @staticmethod
+    def _index_hash(files):
+        return hashlib.sha1(json.dumps(files, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+    def update(self):
+        """Re-index new and changed packages and drop removed ones; returns the number re-indexed"""
+        with self._lock:
+            known = {row[0]: (row[1], row[2]) for row in self._conn.execute("SELECT package, mtime, index_hash FROM packages")}
+            present = set()
+            reindexed = 0
+            try:
+                folders = sorted(os.listdir(self.fhir_cache_path))
+            except OSError as e:
+                logger.warning(f"Unable to read FHIR package cache {self.fhir_cache_path}: {e}")
+                folders = []
+            for folder in folders:
+                # Package folders and package tarballs alike; a tarball's mtime is the file's
+                package_dir = os.path.join(self.fhir_cache_path, folder, "package")
+                try:
+                    if not path_isdir(package_dir):
+                        continue
+                    mtime = path_mtime(package_dir)
+                except OSError:
+                    continue
+                present.add(folder)
+                if folder in known and known[folder][0] == mtime:
+                    continue
+                # A folder without an .index.json is indexed afresh if its files changed
+                files, parsed = self._read_index(package_dir)
+                index_hash = self._index_hash(files)
+                if folder not in known or known[folder][1] != index_hash:
+                    self._index_package(folder, package_dir, files, parsed)
+                    reindexed += 1
+                self._conn.execute("INSERT OR REPLACE INTO packages VALUES (?, ?, ?)", (folder, mtime, index_hash))
+            for folder in set(known) - present:
+                self._conn.execute("DELETE FROM resources WHERE package=?", (folder,))
+                self._conn.execute("DELETE FROM packages WHERE package=?", (folder,))
+            self._conn.commit()
+            self._updated = True
+        if reindexed:
+            logger.info(f"Indexed {reindexed} packages in FHIR package cache {self.fhir_cache_path}")
+        return reindexed
+
+    @staticmethod
+    def _read_index(package_dir):
+        archive, member = split_archive_path(package_dir)
+        if archive:
+            return read_archive_folder_index(archive, member)
+        return read_folder_index(package_dir)
+
+    def _index_package(self, folder, package_dir, files, parsed):
+        self._conn.execute("DELETE FROM resources WHERE package=?", (folder,))
+        rows = []
+        for fields in files:
+            if not (fields.get("filename") and fields.get("resourceType") and fields.get("url")):
+                continue
+            entry = IndexEntry(os.path.join(package_dir, fields["filename"]), fields, loaded=parsed)
+            titled = entry.get("resourceType") in TITLED_TYPES
+            rows.append((folder, entry.path, entry.get("resourceType"), entry.get("url"), entry.get("version"),
+                         entry.get("name") if titled else None, entry.get("title") if titled else None))
+        self._conn.executemany("INSERT INTO resources VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+
+    def find(self, canonical, resource_type=None):
+        """
+        Resources in the cache with this canonical url (a url|version matches that
+        version, else any version), as dicts with package, path, resourceType, url,
+        version, name and title. Updates the index on first use.
+        """
+        if not self._updated:
+            self.update()
+        url, _, version = canonical.partition('|')
+        query = "SELECT package, path, resource_type, url, version, name, title FROM resources WHERE url=?"
+        params = [url]
+        if resource_type:
+            query += " AND resource_type=?"
+            params.append(resource_type)
+        with self._lock:
+            rows = self._conn.execute(query + " ORDER BY package", params).fetchall()
+        matches = [dict(zip(("package", "path", "resourceType", "url", "version", "name", "title"), row)) for row in rows]
+        if version and any(match["version"] == version for match in matches):
+            matches = [match for match in matches if match["version"] == version]
+        return matches
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache_index = None
+_cache_index_lock = threading.Lock()
+
+def get_package_cache_index(fhir_cache_path=None):
+    """
+    Return the process-wide FHIR package cache index. If none was configured and
+    fhir_cache_path is given, an in-memory index of that cache is built on first use.
+    """
+    global _cache_index
+    with _cache_index_lock:
+        if _cache_index is None and fhir_cache_path and os.path.isdir(fhir_cache_path):
+            _cache_index = PackageCacheIndex(':memory:', fhir_cache_path)
+        return _cache_index
+
+def configure_package_cache_index(fhir_cache_path, index_dir):
+    """
+    Open (or create) the persistent package cache index under index_dir, bring it up
+    to date and make it the process-wide index. Pass index_dir=None for an in-memory one.
+    """
+    global _cache_index
+    path = ':memory:'
+    if index_dir:
+        os.makedirs(index_dir, exist_ok=True)
+        path = os.path.join(index_dir, "package-index.sqlite")
+    index = PackageCacheIndex(path, fhir_cache_path)
+    index.update()
+    with _cache_index_lock:
+        if _cache_index is not None:
+            _cache_index.close()
+        _cache_index = index
+    logger.info(f"Using FHIR package cache index: {path}")
+    return index
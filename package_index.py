@@ -0,0 +1,349 @@
+import os
+import json
+import hashlib
+import logging
+import threading
+from package_archive import get_archive, split_archive_path
+from resource_cache import load_resource
+
+logger = logging.getLogger(__name__)
+
+# npm package index (https://hl7.org/fhir/packages.html#2.1.10.4)
+INDEX_FILE = ".index.json"
+# Summary fields read from the resource itself when they're asked for
+SUMMARY_FIELDS = ("resourceType", "id", "url", "version", "name", "title", "kind", "type", "baseDefinition", "derivation")
+# Base definitions of the core resources, whose type is the last url segment
+CORE_DEFINITION_PREFIX = "http://hl7.org/fhir/StructureDefinition/"
+NOT_RESOURCES = (INDEX_FILE, "package.json")
+# Indexes built for folders without a shipped .index.json, kept under the tool's cache folder
+FOLDER_INDEX_DIR = "folder-indexes"
+
+
+##
+## IndexEntry: one resource listed in a package index
+##
+class IndexEntry:
+    """
+    A resource listed in a package's .index.json.
+
+    The fields the index lists for it (usually resourceType, id, url, version,
+    kind, type) are held directly. Any other field, including one of those when
+    the index leaves it out, reads the file the first time it is asked for and
+    keeps just the SUMMARY_FIELDS. load() returns the full resource without keeping it.
+    """
+
+    __slots__ = ("path", "_fields", "_loaded")
+
+    def __init__(self, path, fields, loaded=False):
+        self.path = path
+        self._fields = dict(fields)
+        self._loaded = loaded
+
+    def load(self):
+        """The full resource, through the shared parsed-resource cache (read-only)"""
+        return load_resource(self.path)
+
+    def get(self, field, default=None):
+        if field == "path":
+            return self.path
+        if field not in self._fields and not self._loaded:
+            try:
+                resource = self.load()
+                self._fields.update({key: resource.get(key) for key in SUMMARY_FIELDS if key not in self._fields})
+            except Exception as e:
+                logger.debug(f"Error reading {self.path}: {e}")
+            self._loaded = True
+        value = self._fields.get(field)
+        return default if value is None else value
+
+    def __getitem__(self, field):
+        return self.get(field)
+
+    def listed(self, field):
+        """A field's value as the index lists it, without reading the file"""
+        return self._fields.get(field)
+
+    def __repr__(self):
+        return f"IndexEntry({self.path!r}, {self._fields.get('resourceType')}, {self._fields.get('url')!r})"
+
+
+def _json_files(folder):
+    return sorted(file for file in os.listdir(folder) if file.endswith(".json") and file not in NOT_RESOURCES)
+
+
+_folder_index_dir = None
+_folder_indexes = {}
+_folder_index_lock = threading.Lock()
+
+def configure_folder_index_cache(cache_dir):
+    """
+    Keep the indexes built for folders without an .index.json under cache_dir between
+    runs. Without it they are only kept in memory. They are never written into the
+    indexed folder, which may be (or share files with) the FHIR package cache.
+    """
+    global _folder_index_dir
+    with _folder_index_lock:
+        _folder_index_dir = cache_dir
+
+
+def _folder_index_file(folder):
+    key = hashlib.sha1(os.path.abspath(folder).encode("utf-8")).hexdigest()
+    return os.path.join(_folder_index_dir, FOLDER_INDEX_DIR, f"{key}.json")
+
+
+def _load_folder_index(folder):
+    with _folder_index_lock:
+        record = _folder_indexes.get(folder)
+        if record is not None or not _folder_index_dir:
+            return record
+        path = _folder_index_file(folder)
+    try:
+        with open(path, 'r') as f:
+            record = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return record if isinstance(record, dict) and record.get("folder") == folder else None
+
+
+def _save_folder_index(folder, record, write):
+    with _folder_index_lock:
+        _folder_indexes[folder] = record
+        if not write or not _folder_index_dir:
+            return
+        path = _folder_index_file(folder)
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path + ".tmp", 'w') as f:
+            json.dump(record, f)
+        os.replace(path + ".tmp", path)
+    except OSError as e:
+        logger.debug(f"Unable to save the index of {folder}: {e}")
+
+
+def build_folder_index(folder, write=True):
+    """
+    Parse every resource in a folder and return .index.json style file entries
+    (with the SUMMARY_FIELDS filled in). The entries are kept, along with the .json
+    files that aren't resources, so the next run doesn't need to parse the files
+    again; on disk only when a cache folder is configured (configure_folder_index_cache).
+    """
+    mtime = os.stat(folder).st_mtime_ns
+    files = []
+    skipped = []
+    for file in _json_files(folder):
+        try:
+            with open(os.path.join(folder, file), 'r') as f:
+                resource = json.load(f)
+        except Exception as e:
+            logger.debug(f"Error reading {file} in {folder} while building {INDEX_FILE}: {e}")
+            skipped.append(file)
+            continue
+        if isinstance(resource, dict) and resource.get("resourceType"):
+            entry = {field: resource.get(field) for field in SUMMARY_FIELDS}
+            entry["filename"] = file
+            files.append(entry)
+        else:
+            skipped.append(file)
+    _save_folder_index(folder, {"folder": folder, "mtime": mtime, "files": files, "skipped": skipped}, write)
+    logger.info(f"Indexed {folder} ({len(files)} resources, {len(skipped)} other files)")
+    return files
+
+
+def read_folder_index(folder):
+    """
+    Entries of the folder's .index.json or, if it doesn't ship one, of the index built
+    for it (rebuilt when .json files have been added or removed since).
+    Returns (file entries, True if the entries hold all the SUMMARY_FIELDS)
+    """
+    try:
+        with open(os.path.join(folder, INDEX_FILE), 'r') as f:
+            index = json.load(f)
+        return index["files"], False
+    except FileNotFoundError:
+        pass
+    except (ValueError, KeyError, TypeError) as e:
+        logger.warning(f"Unable to read {INDEX_FILE} in {folder} ({e}), rebuilding")
+    record = _load_folder_index(folder)
+    if record is not None:
+        seen = {entry.get("filename") for entry in record["files"]} | set(record["skipped"])
+        if record["mtime"] == os.stat(folder).st_mtime_ns and seen == set(_json_files(folder)):
+            return record["files"], True
+        logger.info(f"Index of {folder} is out of date, rebuilding")
+    return build_folder_index(folder), True
+
+
+def read_archive_folder_index(package_path, folder):
+    """
+    Entries of the .index.json in a folder of a package tarball, built by parsing
+    the folder's members if the tarball doesn't ship one.
+    Returns (file entries, True if the resources were parsed to build them)
+    """
+    archive = get_archive(package_path)
+    names = archive.listdir(folder)
+    if INDEX_FILE in names:
+        try:
+            return json.loads(archive.read(f"{folder}/{INDEX_FILE}" if folder else INDEX_FILE))["files"], False
+        except (ValueError, KeyError, TypeError) as e:
+            logger.warning(f"Unable to read {INDEX_FILE} in {package_path}/{folder} ({e}), rebuilding")
+    files = []
+    for file in names:
+        if not file.endswith(".json") or file in NOT_RESOURCES:
+            continue
+        try:
+            resource = json.loads(archive.read(f"{folder}/{file}" if folder else file))
+        except Exception as e:
+            logger.debug(f"Error reading {file} in {package_path}/{folder} while building {INDEX_FILE}: {e}")
+            continue
+        if isinstance(resource, dict) and resource.get("resourceType"):
+            entry = {field: resource.get(field) for field in SUMMARY_FIELDS}
+            entry["filename"] = file
+            files.append(entry)
+    return files, True
+
+
+##
+## CanonicalIndex: package-wide index of resources built from .index.json files
+##
+class CanonicalIndex:
+    """
+    Index of the resources in one package folder, built from the .index.json of
+    each folder in the package (package/, package/example/, ...) without opening
+    the resource files. Folders without an .index.json are parsed once (see
+    read_folder_index) and the result kept outside the package. The package
+    may also be a package tarball (or a folder inside one), read without extracting it.
+
+    Entries are IndexEntry objects looked up by url and by url|version, or listed
+    by resourceType. When a url appears in more than one file the first one found
+    wins, as the old directory scans did.
+    """
+
+    def __init__(self):
+        self._entries = []
+        self._by_url = {}
+        self._profiles_by_type = None
+
+    def __len__(self):
+        return len(self._entries)
+
+    @classmethod
+    def build(cls, package_path):
+        """Read (or build) the .index.json of every folder in a package folder or tarball"""
+        index = cls()
+        archive, member = split_archive_path(package_path)
+        if archive:
+            folders = [(os.path.join(archive, folder) if folder else archive, read_archive_folder_index(archive, folder))
+                       for folder in get_archive(archive).folders()
+                       if not member or folder == member or folder.startswith(member + '/')]
+        else:
+            folders = []
+            for root, dirs, files in os.walk(package_path):
+                dirs[:] = sorted(d for d in dirs if not d.startswith('.'))
+                if INDEX_FILE in files or any(file.endswith(".json") and file not in NOT_RESOURCES for file in files):
+                    folders.append((root, read_folder_index(root)))
+        for root, (entries, parsed) in folders:
+            for fields in sorted(entries, key=lambda entry: entry.get("filename") or ""):
+                if fields.get("filename") and fields.get("resourceType"):
+                    index.add(IndexEntry(os.path.join(root, fields["filename"]), fields, loaded=parsed))
+        logger.info(f"Indexed {len(index)} resources in {package_path}")
+        return index
+
+    def add(self, entry):
+        self._entries.append(entry)
+        self._profiles_by_type = None
+        # Registered from what the index lists: reading every file without a url or version
+        # (examples, unversioned resources) would defeat the index; resolve() falls back
+        # to the bare url for a version that isn't listed
+        url = entry.listed("url")
+        if url:
+            self._by_url.setdefault(url, entry)
+            if entry.listed("version"):
+                self._by_url.setdefault(f"{url}|{entry.listed('version')}", entry)
+        return entry
+
+    def get(self, canonical, resource_type=None):
+        """Entry for an exact url or url|version, or None"""
+        entry = self._by_url.get(canonical)
+        if entry and resource_type and entry.get("resourceType") != resource_type:
+            return None
+        return entry
+
+    def resolve(self, canonical, resource_type=None):
+        """Like get(), but a url|version that isn't held falls back to the unversioned url"""
+        entry = self.get(canonical, resource_type)
+        if entry is None and '|' in canonical:
+            entry = self.get(canonical.split('|', 1)[0], resource_type)
+        return entry
+
+    def constrained_type(self, entry, seen=None):
+        """
+        The resource type a StructureDefinition constrains: its own type, or else the
+        type found by following its baseDefinition chain through this package to a
+        core definition. None if it can't be resolved.
+        """
+        if entry.get("type"):
+            return entry.get("type")
+        base = entry.get("baseDefinition") or ''
+        seen = seen or set()
+        if not base or base in seen:
+            return None
+        seen.add(base)
+        parent = self.resolve(base, "StructureDefinition")
+        if parent is not None:
+            return self.constrained_type(parent, seen)
+        if base.startswith(CORE_DEFINITION_PREFIX):
+            return base[len(CORE_DEFINITION_PREFIX):].split('|', 1)[0]
+        return None
+
+    def profiles_of_type(self, resource_type):
+        """
+        The resource profiles (kind resource, derivation constraint) in the package that
+        constrain exactly this resource type, in file order. The type -> profiles map is
+        built on first use, so later lookups are a dict access.
+        """
+        if self._profiles_by_type is None:
+            profiles_by_type = {}
+            for entry in self.of_type("StructureDefinition"):
+                if entry.get("kind") != "resource" or entry.get("derivation", "constraint") != "constraint":
+                    continue
+                constrained = self.constrained_type(entry)
+                if constrained:
+                    profiles_by_type.setdefault(constrained, []).append(entry)
+            self._profiles_by_type = profiles_by_type
+        return list(self._profiles_by_type.get(resource_type, []))
+
+    def of_type(self, resource_type, folder=None):
+        """All entries of one resourceType in file order, optionally only those directly in folder"""
+        return [entry for entry in self._entries
+                if entry.get("resourceType") == resource_type
+                and (folder is None or os.path.dirname(entry.path) == folder)]
+
+
+_indexes = {}
+_index_lock = threading.Lock()
+
+def _folder_signature(path):
+    archive, member = split_archive_path(path)
+    if archive:
+        return (os.stat(archive).st_mtime_ns,)
+    return tuple(os.stat(folder).st_mtime_ns for folder in (path, os.path.join(path, "package"))
+                 if os.path.isdir(folder))
+
+
+def get_package_index(package_path):
+    """
+    CanonicalIndex for a package folder or tarball, built on first use and reused for
+    the rest of the run (rebuilt if files are added to or removed from the folder)
+    """
+    path = os.path.abspath(package_path)
+    try:
+        signature = _folder_signature(path)
+    except OSError:
+        signature = ()
+    if not signature:
+        return CanonicalIndex()
+    with _index_lock:
+        cached = _indexes.get(path)
+        if cached is None or cached[0] != signature:
+            cached = (signature, CanonicalIndex.build(path))
+            _indexes[path] = cached
+        return cached[1]
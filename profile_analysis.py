@@ -0,0 +1,144 @@
+import logging
+import threading
+from collections import namedtuple
+from package_archive import path_mtime
+from resource_cache import load_resource
+
+logger = logging.getLogger(__name__)
+
+BINDING_NAME_URL = "http://hl7.org/fhir/StructureDefinition/elementdefinition-bindingName"
+ADDITIONAL_BINDING_URL = "http://hl7.org/fhir/tools/StructureDefinition/additional-binding"
+DEFAULT_BINDING_STRENGTHS = ["required", "extensible", "preferred"]
+
+# One binding of one element, from either view of the profile.
+#   source   - 'binding', 'additional-binding' (tools extension) or 'additionalBinding' (legacy R5 style)
+#   strength - the binding's strength; for an additional-binding extension the main binding's
+#   purpose  - the additional-binding extension's purpose, else None
+#   views    - the views the binding appears in: ('differential',), ('snapshot',) or both
+Binding = namedtuple("Binding", ["path", "element_id", "source", "valueSet", "strength", "purpose",
+                                 "bindingName", "mustSupport", "views"])
+
+
+def _as_list(value):
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def binding_options(config_options):
+    """(require MustSupport, minimum strengths) from valueset-binding-options, with the defaults"""
+    config_options = config_options or {}
+    return (config_options.get("require-must-support", True),
+            list(config_options.get("minimum-binding-strength", DEFAULT_BINDING_STRENGTHS)))
+
+
+def _element_bindings(el):
+    """(source, valueSet, strength, purpose, bindingName) for every binding of one element"""
+    binding = el.get("binding")
+    if not isinstance(binding, dict):
+        return []
+    found = []
+    strength = binding.get("strength")
+    extensions = [ext for ext in _as_list(binding.get("extension")) if isinstance(ext, dict)]
+    binding_name = next((ext["valueString"] for ext in extensions
+                         if ext.get("url") == BINDING_NAME_URL and "valueString" in ext), None)
+    if binding.get("valueSet"):
+        found.append(("binding", binding["valueSet"], strength, None, binding_name))
+    for ext in extensions:
+        if ext.get("url") != ADDITIONAL_BINDING_URL:
+            continue
+        vs_url = purpose = None
+        for nested in _as_list(ext.get("extension")):
+            if isinstance(nested, dict):
+                if nested.get("url") == "valueSet":
+                    vs_url = nested.get("valueCanonical")
+                elif nested.get("url") == "purpose":
+                    purpose = nested.get("valueCode")
+        if vs_url:
+            found.append(("additional-binding", vs_url, strength, purpose, None))
+    for additional in _as_list(binding.get("additionalBinding")):
+        if isinstance(additional, dict) and additional.get("valueSet"):
+            found.append(("additionalBinding", additional["valueSet"], additional.get("strength"), None, None))
+    return found
+
+
+##
+## ProfileAnalysis: the normalised binding model of one StructureDefinition
+##
+class ProfileAnalysis:
+    """
+    The bindings of a StructureDefinition, read in one pass over its differential
+    and snapshot. Elements from the two views are merged by element id (path when
+    there's no id): an element is MustSupport if either view says so, and a binding
+    listed in both views appears once. Bindings are in snapshot order, followed by
+    any elements only in the differential.
+
+    Both the ValueSet binding report and the membership check query this model,
+    through bindings(config_options), so they apply the same filtering rules.
+    """
+
+    def __init__(self, profile_path, sd):
+        self.path = profile_path
+        self.name = sd.get("name", "Unknown Profile")
+        self.title = sd.get("title", self.name)
+        self.url = sd.get("url", "Unknown URL")
+        self.type = sd.get("type")
+        elements = {}
+        for view in ("snapshot", "differential"):
+            for el in _as_list((sd.get(view) or {}).get("element")):
+                if not isinstance(el, dict) or not el.get("path"):
+                    continue
+                merged = elements.setdefault(el.get("id") or el["path"],
+                                             {"path": el["path"], "mustSupport": False, "bindings": {}})
+                merged["mustSupport"] = merged["mustSupport"] or bool(el.get("mustSupport", False))
+                for source, vs, strength, purpose, binding_name in _element_bindings(el):
+                    key = (source, vs, strength, purpose)
+                    entry = merged["bindings"].setdefault(key, {"bindingName": binding_name, "views": []})
+                    entry["bindingName"] = entry["bindingName"] or binding_name
+                    entry["views"].append(view)
+        self.all_bindings = [
+            Binding(merged["path"], element_id, source, vs, strength, purpose, entry["bindingName"],
+                    merged["mustSupport"], tuple(sorted(set(entry["views"]))))
+            for element_id, merged in elements.items()
+            for (source, vs, strength, purpose), entry in merged["bindings"].items()
+        ]
+
+    def bindings(self, config_options=None, view=None):
+        """
+        (binding, effective strength) for the bindings that pass the MustSupport and
+        minimum-strength options, optionally only those in one view. An additional
+        binding's purpose is its strength when it is one of the allowed strengths,
+        otherwise the main binding's strength is used.
+        """
+        require_must_support, min_strengths = binding_options(config_options)
+        selected = []
+        for binding in self.all_bindings:
+            if require_must_support and not binding.mustSupport:
+                continue
+            if view and view not in binding.views:
+                continue
+            strength = binding.purpose if binding.purpose in min_strengths else binding.strength
+            if strength in min_strengths:
+                selected.append((binding, strength))
+        return selected
+
+
+_analyses = {}
+_analysis_lock = threading.Lock()
+
+def analyse_profile(profile_path):
+    """
+    ProfileAnalysis of a StructureDefinition file, built once per run and reused while
+    the file is unchanged. Returns None if the file isn't a StructureDefinition.
+    """
+    key = (profile_path, path_mtime(profile_path))
+    with _analysis_lock:
+        if key in _analyses:
+            return _analyses[key]
+    sd = load_resource(profile_path)
+    analysis = None
+    if isinstance(sd, dict) and sd.get("resourceType") == "StructureDefinition":
+        analysis = ProfileAnalysis(profile_path, sd)
+    with _analysis_lock:
+        _analyses[key] = analysis
+    return analysis
@@ -0,0 +1,112 @@
+import os
+import json
+import logging
+import threading
+from collections import OrderedDict
+from package_archive import split_archive_path, get_archive
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 64
+
+
+def parse_json(data):
+    """Parse JSON bytes with orjson when it is installed, else the standard library"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def read_bytes(path):
+    """(raw bytes, mtime in ns) of a file, or of a member of a package tarball"""
+    archive, member = split_archive_path(path)
+    if archive is None:
+        with open(path, 'rb') as f:
+            return f.read(), os.fstat(f.fileno()).st_mtime_ns
+    return get_archive(archive).read(member), os.stat(archive).st_mtime_ns
+
+
+##
+## ResourceCache: parse each resource file once per run
+##
+class ResourceCache:
+    """
+    Process-wide, size-bounded cache of parsed FHIR resources.
+
+    Entries are keyed by path and mtime, so a file that changes on disk is parsed
+    again. The bound is on the size of the source JSON; when it is exceeded the
+    least recently used resources are dropped. Cached resources are shared between
+    callers and must be treated as read-only.
+
+    Args:
+        max_bytes: total size of the source JSON to keep parsed
+    """
+
+    def __init__(self, max_bytes=DEFAULT_MAX_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def load(self, path):
+        """The parsed resource at path (a file or a member of a package tarball)"""
+        archive, member = split_archive_path(path)
+        mtime = os.stat(archive or path).st_mtime_ns
+        key = (path, mtime)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            self.misses += 1
+        data, mtime = read_bytes(path)
+        resource = parse_json(data)
+        with self._lock:
+            if (path, mtime) not in self._entries and len(data) <= self.max_bytes:
+                self._entries[(path, mtime)] = (resource, len(data))
+                self.size += len(data)
+                while self.size > self.max_bytes:
+                    _, (_, size) = self._entries.popitem(last=False)
+                    self.size -= size
+                    self.evictions += 1
+        return resource
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+    def stats(self):
+        with self._lock:
+            hits, misses, evictions = self.hits, self.misses, self.evictions
+            entries, size = len(self._entries), self.size
+        total = hits + misses
+        rate = (100.0 * hits / total) if total else 0.0
+        return {"hits": hits, "misses": misses, "hit_rate": rate,
+                "evictions": evictions, "entries": entries, "bytes": size}
+
+
+_resource_cache = ResourceCache()
+
+def get_resource_cache():
+    return _resource_cache
+
+def configure_resource_cache(max_mb):
+    """Replace the process-wide resource cache with one holding up to max_mb of source JSON"""
+    global _resource_cache
+    _resource_cache = ResourceCache(int(max_mb * 1024 * 1024))
+    logger.info(f"Parsed resource cache: up to {max_mb} MB, JSON backend {'orjson' if orjson else 'json'}")
+    return _resource_cache
+
+def load_resource(path):
+    """Parse a resource through the process-wide cache"""
+    return _resource_cache.load(path)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script to verify batched $validate-code requests are fanned back out to the right rows
+"""
+
+import tester
+from txclient import get_client
+from fake_tx import FakeResponse
+
+def validate_code_parameters(valid):
+    return {"resourceType": "Parameters", "parameter": [{"name": "result", "valueBoolean": valid}]}
+
+def test_batch_fan_out():
+    """Each batch response entry lands on the task in the same position"""
+    posted = []
+
+    def fake_post(url, headers=None, json=None, timeout=None, **kwargs):
+        posted.append(json)
+        entries = []
+        for entry in json["entry"]:
+            # Pretend only LOINC codes are valid
+            valid = "loinc" in entry["request"]["url"]
+            entries.append({"resource": validate_code_parameters(valid), "response": {"status": "200 OK"}})
+        return FakeResponse(200, {"resourceType": "Bundle", "type": "batch-response", "entry": entries})
+
+    tasks = [
+        ("ex1.json", "http://loinc.org", "8867-4"),
+        ("ex1.json", "http://snomed.info/sct", "1234"),
+        ("ex2.json", "http://loinc.org", "8310-5"),
+    ]
+    client = get_client()
+    client.post = fake_post
+    try:
+        results = tester.validate_example_codes_batch("http://batch.example.org/fhir", [], tasks)
+    finally:
+        del client.post
+        tester._validate_code_cache.clear()
+
+    assert len(posted) == 1 and posted[0]["type"] == "batch"
+    assert [r['code'] for r in results] == ["8867-4", "1234", "8310-5"]
+    assert [r['result'] for r in results] == ["PASS", "FAIL", "PASS"]
+    print("✅ Batch response entries matched back to their codes")
+
+def test_batch_falls_back_to_single_requests():
+    """A failed batch POST is retried as single $validate-code requests"""
+    singles = []
+
+    def fake_post(url, headers=None, json=None, timeout=None, **kwargs):
+        return FakeResponse(500, {"resourceType": "OperationOutcome"})
+
+    def fake_get(url, headers=None, timeout=None, **kwargs):
+        singles.append(url)
+        return FakeResponse(200, validate_code_parameters(True))
+
+    client = get_client()
+    client.post, client.get = fake_post, fake_get
+    try:
+        results = tester.validate_example_codes_batch(
+            "http://nobatch.example.org/fhir", [], [("ex1.json", "http://loinc.org", "8867-4")])
+    finally:
+        del client.post, client.get
+        tester._validate_code_cache.clear()
+
+    assert len(singles) == 1
+    assert results[0]['result'] == "PASS"
+    print("✅ Failed batch fell back to single requests")
+
+if __name__ == "__main__":
+    test_batch_fan_out()
+    test_batch_falls_back_to_single_requests()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script to verify binding maps are memoized in the membership check
+"""
+
+import os
+import json
+import tempfile
+import membership
+
+OPTIONS = {"require-must-support": False, "minimum-binding-strength": ["required", "extensible"]}
+
+def profile(name, valueset):
+    return {
+        "resourceType": "StructureDefinition",
+        "url": f"http://example.org/StructureDefinition/{name}",
+        "name": name,
+        "kind": "resource",
+        "type": "Observation",
+        "baseDefinition": "http://hl7.org/fhir/StructureDefinition/Observation",
+        "snapshot": {"element": [{"id": "Observation.code", "path": "Observation.code",
+                                  "binding": {"strength": "required", "valueSet": valueset}}]},
+        "differential": {"element": [{"id": "Observation.code", "path": "Observation.code",
+                                      "binding": {"strength": "required", "valueSet": valueset}}]}
+    }
+
+def test_binding_maps_memoized():
+    """Each profile's map is built once per options; merged maps are shared per profile combination"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        for name, valueset in (("a", "http://example.org/ValueSet/x"), ("b", "http://example.org/ValueSet/y")):
+            with open(os.path.join(tmpdir, f"StructureDefinition-{name}.json"), 'w') as f:
+                json.dump(profile(name, valueset), f)
+        calls = []
+        original = membership.build_binding_map
+        membership.build_binding_map = lambda path, options: calls.append(path) or original(path, options)
+        try:
+            profiles = ["http://example.org/StructureDefinition/a", "http://example.org/StructureDefinition/b"]
+            merged = membership.get_merged_bindings(tmpdir, profiles, OPTIONS)
+            assert membership.get_merged_bindings(tmpdir, list(profiles), dict(OPTIONS)) is merged
+            assert membership.get_merged_bindings(tmpdir, profiles[:1], OPTIONS) is not merged
+            assert len(calls) == 2
+            # Editing a profile rebuilds the merged map that uses it
+            path_a = os.path.join(tmpdir, "StructureDefinition-a.json")
+            with open(path_a, 'w') as f:
+                json.dump(profile("a", "http://example.org/ValueSet/z"), f)
+            os.utime(path_a, ns=(1, 1))
+            edited = membership.get_merged_bindings(tmpdir, profiles, OPTIONS)
+            assert edited is not merged
+            assert edited["Observation.code"][0]["valueSet"] == "http://example.org/ValueSet/z"
+        finally:
+            membership.build_binding_map = original
+        # Snapshot and differential list the same binding; the merged map keeps it once
+        assert merged["Observation.code"] == [
+            {"valueSet": "http://example.org/ValueSet/x", "strength": "required"},
+            {"valueSet": "http://example.org/ValueSet/y", "strength": "required"}]
+    print("✅ Binding maps memoized per profile and per profile combination, rebuilt on edits")
+
+if __name__ == "__main__":
+    test_binding_maps_memoized()
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the trie binding-path matcher gives the same answers as the linear scan
+"""
+
+import random
+from membership import best_binding_paths, get_binding_matcher
+
+def linear_best_binding_paths(coding_path, binding_keys):
+    """The original linear-scan best_binding_paths, kept as the reference"""
+
+    def _normalise(path):
+        parts = []
+        for seg in path.split('.'):
+            if seg.startswith('extension:'):
+                parts.append('extension')
+            elif seg.startswith('value'):
+                parts.append('value')
+            else:
+                parts.append(seg)
+        return '.'.join(parts)
+
+    norm_path = _normalise(coding_path)
+    # Some profiles bind at the element level (e.g., Medication.code.extension) while
+    # instance codings sit under Medication.code.coding.extension; allow a variant with
+    # the first '.coding.' segment removed to match those bindings.
+    variants = [norm_path]
+    if '.coding.' in norm_path:
+        variants.append(norm_path.replace('.coding.', '.', 1))
+
+    norm_keys = [(key, _normalise(key)) for key in binding_keys]
+    keys_sorted = sorted(norm_keys, key=lambda kv: len(kv[1]), reverse=True)
+
+    candidates = []
+
+    # First pass: exact and prefix matches
+    # If coding is in an extension context (.extension.), only match bindings that also contain .extension.
+    coding_in_extension = '.extension.' in norm_path
+    
+    for raw_key, norm_key in keys_sorted:
+        # If coding is in extension but binding is not, skip it (don't match parent element bindings to extension codings)
+        if coding_in_extension and '.extension.' not in norm_key:
+            continue
+            
+        for candidate_path in variants:
+            if candidate_path == norm_key or candidate_path.startswith(norm_key + '.'):
+                candidates.append((raw_key, len(norm_key)))
+                break
+    
+    # Return only the longest (most specific) match(es)
+    if candidates:
+        max_len = max(c[1] for c in candidates)
+        return [c[0] for c in candidates if c[1] == max_len]
+
+    # If nothing and path ends with '.coding' or '.valueCoding', try parent using normalised values
+    if coding_path.endswith('.coding') or coding_path.endswith('.valueCoding'):
+        parent_norm = norm_path.rsplit('.', 1)[0]
+        for raw_key, norm_key in keys_sorted:
+            if parent_norm == norm_key or parent_norm.startswith(norm_key + '.') or norm_key.startswith(parent_norm + '.'):
+                candidates.append((raw_key, len(norm_key)))
+        # Return only the longest match from parent fallback
+        if candidates:
+            max_len = max(c[1] for c in candidates)
+            return [c[0] for c in candidates if c[1] == max_len]
+
+    return []
+
+
+BINDING_KEYS = [
+    "Observation.code",
+    "Observation.category",
+    "Observation.category:VSCat",
+    "Observation.value[x]",
+    "Observation.valueCodeableConcept",
+    "Observation.component.code",
+    "Observation.component.value[x]",
+    "Observation.extension:reason.value[x]",
+    "Medication.code",
+    "Medication.code.extension",
+    "Medication.code.coding.extension:pbs.valueCoding",
+    "Condition.bodySite.extension:laterality.value[x]",
+]
+
+CODING_PATHS = [
+    "Observation.code.coding",
+    "Observation.category.coding",
+    "Observation.valueCodeableConcept.coding",
+    "Observation.component.code.coding",
+    "Observation.component.valueCodeableConcept.coding",
+    "Observation.extension.valueCodeableConcept.coding",
+    "Observation.extension.valueCoding",
+    "Observation.method.coding",
+    "Medication.code.coding",
+    "Medication.code.coding.extension.valueCoding",
+    "Medication.code.extension.valueCoding",
+    "Condition.bodySite.coding",
+    "Condition.bodySite.extension.valueCodeableConcept.coding",
+    "Condition.code.coding",
+]
+
+def test_trie_matches_linear_scan():
+    """Longest-match results agree with the original linear scan, for any key order"""
+    rng = random.Random(7)
+    for _ in range(50):
+        keys = rng.sample(BINDING_KEYS, rng.randint(1, len(BINDING_KEYS)))
+        for path in CODING_PATHS:
+            assert best_binding_paths(path, keys) == linear_best_binding_paths(path, keys), (path, keys)
+    print("✅ Trie matcher agrees with the linear scan")
+
+def test_matcher_memoized():
+    """A matcher is built once per binding key set and memoizes repeated coding paths"""
+    matcher = get_binding_matcher(BINDING_KEYS)
+    assert get_binding_matcher(list(BINDING_KEYS)) is matcher
+    assert matcher.match("Observation.category.coding") == ["Observation.category"]
+    assert "Observation.category.coding" in matcher._memo
+    assert matcher.match("Medication.code.coding.extension.valueCoding") == ["Medication.code.coding.extension:pbs.valueCoding"]
+    print("✅ Binding matcher built once and memoized")
+
+if __name__ == "__main__":
+    test_trie_matches_linear_scan()
+    test_matcher_memoized()
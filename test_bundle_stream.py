@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Test script to verify large Bundle examples are streamed one entry at a time
+"""
+
+import io
+import os
+import json
+import tarfile
+import tempfile
+from bundle_stream import iter_example_resources, _iter_text
+from example_scan import scan_example_file
+
+def make_bundle(count):
+    return {
+        "resourceType": "Bundle",
+        "type": "transaction",
+        "meta": {"tag": [{"system": "http://example.org/tags", "code": "big"}]},
+        "entry": [
+            {"fullUrl": f"urn:uuid:{i}",
+             "resource": {"resourceType": "Condition", "id": str(i),
+                          "code": {"coding": [{"system": "http://snomed.info/sct", "code": str(1000 + i % 3)}]}},
+             "request": {"method": "POST", "url": "Condition"}}
+            for i in range(count)
+        ],
+        "signature": {"when": "2024-01-01T00:00:00Z"}
+    }
+
+def test_stream_entries_then_shell():
+    """Entries are yielded one at a time, then the Bundle with its entry list emptied in place"""
+    bundle = make_bundle(5)
+    resources = list(_iter_text(json.dumps(bundle, indent=2)))
+    assert [r["id"] for r in resources[:-1]] == ["0", "1", "2", "3", "4"]
+    shell = resources[-1]
+    assert shell["entry"] == [] and shell["type"] == "transaction" and shell["signature"]["when"]
+    assert list(shell) == list(bundle)
+    assert list(_iter_text('{ "resourceType": "Bundle", "entry": [ ] }')) == [{"resourceType": "Bundle", "entry": []}]
+    print("✅ Bundle entries streamed one resource at a time")
+
+def test_large_example_codings_match():
+    """A streamed Bundle yields the same codings as the whole-file parse"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "Bundle-big.json")
+        with open(path, 'w') as f:
+            json.dump(make_bundle(50), f)
+        whole = list(iter_example_resources(path, threshold_bytes=0))
+        assert len(whole) == 1 and whole[0][0] is None and len(whole[0][1]["entry"]) == 50
+        streamed = list(iter_example_resources(path, threshold_bytes=1024))
+        assert len(streamed) == 51 and streamed[0][0] == "Bundle.entry.resource" and streamed[-1][0] is None
+        codings = scan_example_file(path, threshold_bytes=1024).codings
+        assert sorted(codings) == sorted(scan_example_file(path, threshold_bytes=0).codings)
+        assert ("http://snomed.info/sct", "1002") in codings and ("http://example.org/tags", "big") in codings
+    print("✅ Streamed Bundle codings match the whole-file parse")
+
+def test_stream_reads_in_small_chunks():
+    """Values split across chunk boundaries (numbers included) decode the same as a whole-text parse"""
+    bundle = make_bundle(7)
+    bundle["total"] = 1234567
+    text = json.dumps(bundle, indent=1)
+    for chunk_size in (1, 5, 64):
+        resources = list(_iter_text(text, chunk_size))
+        assert resources[:-1] == [entry["resource"] for entry in bundle["entry"]]
+        assert resources[-1]["total"] == 1234567 and resources[-1]["entry"] == []
+    print("✅ Chunked parse matches across chunk boundaries")
+
+def test_stream_tarball_member():
+    """A large example inside a package tarball is streamed from the archive"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tgz = os.path.join(tmpdir, "example.fhir.ig#1.0.0.tgz")
+        data = json.dumps(make_bundle(20)).encode()
+        with tarfile.open(tgz, "w:gz") as tar:
+            info = tarfile.TarInfo("package/example/Bundle-big.json")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        streamed = list(iter_example_resources(os.path.join(tgz, "package", "example", "Bundle-big.json"), threshold_bytes=1024))
+        assert [r["id"] for _, r in streamed[:-1]] == [str(i) for i in range(20)]
+    print("✅ Tarball member streamed")
+
+def test_streamed_scan_matches_whole_file():
+    """A streamed Bundle scans to the same row as one loaded whole: Bundle profile, Bundle paths"""
+    bundle = {
+        "resourceType": "Bundle", "meta": {"profile": ["http://x/B"]}, "type": "collection",
+        "entry": [{"resource": {"resourceType": "Observation", "meta": {"profile": ["http://x/O"]},
+                                "code": {"coding": [{"system": "http://loinc.org", "code": "8867-4"}]}}}],
+        "identifier": {"type": {"coding": [{"system": "http://x/ids", "code": "after"}]}}
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "Bundle-one.json")
+        with open(path, 'w') as f:
+            json.dump(bundle, f)
+        whole = scan_example_file(path, threshold_bytes=0)
+        streamed = scan_example_file(path, threshold_bytes=10)
+        for paths in ((["*.code"], []), ([], ["Bundle.entry"])):
+            assert scan_example_file(path, 0, paths) == scan_example_file(path, 10, paths)
+    assert streamed == whole
+    assert whole.resources == (("Bundle", ("http://x/B",), (
+        ("Bundle.entry.resource.code.coding", "http://loinc.org", "8867-4"),
+        ("Bundle.identifier.type.coding", "http://x/ids", "after"))),)
+    print("✅ Streamed and whole-file scans agree")
+
+if __name__ == "__main__":
+    test_stream_entries_then_shell()
+    test_large_example_codings_match()
+    test_stream_reads_in_small_chunks()
+    test_stream_tarball_member()
+    test_streamed_scan_matches_whole_file()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the single-pass coding extractor
+"""
+
+from coding_extractor import CodingExtractor
+
+BUNDLE = {
+    "resourceType": "Bundle",
+    "meta": {"tag": [{"system": "http://example.org/tags", "code": "test"}]},
+    "entry": [
+        {"resource": {
+            "resourceType": "Observation",
+            "status": "final",
+            "code": {"coding": [{"system": "http://loinc.org", "code": "8867-4"}]},
+            "valueQuantity": {"value": 72, "unit": "/min", "system": "http://unitsofmeasure.org", "code": "/min"},
+            "extension": [{"url": "http://example.org/ext",
+                           "valueCoding": {"system": "http://snomed.info/sct", "code": "1234"}}],
+            "identifier": [{"system": "http://example.org/ids", "value": "1"}]
+        }},
+        {"resource": {
+            "resourceType": "Condition",
+            "code": {"coding": [{"system": "http://loinc.org", "code": "8867-4"},
+                                {"system": "http://snomed.info/sct", "code": "   "}]}
+        }}
+    ]
+}
+
+def test_every_coding_found_in_one_walk():
+    """Codings, coded Quantities and codings in extensions are found with their paths"""
+    found = CodingExtractor().extract(BUNDLE)
+    assert found == [
+        ("Bundle.meta.tag", "http://example.org/tags", "test"),
+        ("Bundle.entry.resource.code.coding", "http://loinc.org", "8867-4"),
+        ("Bundle.entry.resource.valueQuantity", "http://unitsofmeasure.org", "/min"),
+        ("Bundle.entry.resource.extension.valueCoding", "http://snomed.info/sct", "1234"),
+        ("Bundle.entry.resource.code.coding", "http://loinc.org", "8867-4"),
+    ]
+    assert CodingExtractor().codings(BUNDLE)[1:] == [
+        ("http://loinc.org", "8867-4"), ("http://unitsofmeasure.org", "/min"), ("http://snomed.info/sct", "1234")]
+    print("✅ Every coding found in a single walk")
+
+def test_allow_and_deny_paths():
+    """Deny patterns skip whole subtrees; allow patterns limit what is reported"""
+    denied = CodingExtractor(deny=["*.meta.tag", "Bundle.entry.resource.extension"]).extract(BUNDLE)
+    assert [path for path, _, _ in denied] == [
+        "Bundle.entry.resource.code.coding", "Bundle.entry.resource.valueQuantity", "Bundle.entry.resource.code.coding"]
+    allowed = CodingExtractor(allow=["*.code"]).codings(BUNDLE)
+    assert allowed == [("http://loinc.org", "8867-4")]
+    print("✅ Coding paths filtered by allow and deny patterns")
+
+if __name__ == "__main__":
+    test_every_coding_found_in_one_walk()
+    test_allow_and_deny_paths()
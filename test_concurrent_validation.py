@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the concurrent example validation keeps discovery order
+"""
+
+import os
+import json
+import random
+import time
+import tempfile
+import tester
+
+def create_examples(tmpdir):
+    """Create a few example resources sharing some codings"""
+    examples = {
+        "Observation-a.json": {
+            "resourceType": "Observation",
+            "code": {"coding": [{"system": "http://loinc.org", "code": "8867-4"}]},
+            "category": [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category", "code": "vital-signs"}]}]
+        },
+        "Observation-b.json": {
+            "resourceType": "Observation",
+            "code": {"coding": [{"system": "http://loinc.org", "code": "8310-5"}]},
+            "category": [{"coding": [{"system": "http://terminology.hl7.org/CodeSystem/observation-category", "code": "vital-signs"}]}]
+        },
+        "Condition-c.json": {
+            "resourceType": "Condition",
+            "code": {"coding": [{"system": "http://snomed.info/sct", "code": "38341003"}]}
+        }
+    }
+    paths = []
+    for name, resource in examples.items():
+        path = os.path.join(tmpdir, name)
+        with open(path, 'w') as f:
+            json.dump(resource, f)
+        paths.append(path)
+    return paths
+
+def test_validate_example_files_order():
+    """Rows come back in discovery order and each distinct coding is validated once"""
+    calls = []
+
+    def fake_validate(endpoint, cs_excluded, file, system, code):
+        calls.append((system, code))
+        # Finish in a random order to shake out any ordering assumptions
+        time.sleep(random.uniform(0, 0.05))
+        return {'file': os.path.basename(file), 'code': code, 'system': system,
+                'status_code': 200, 'result': 'PASS', 'reason': ''}
+
+    original = tester.validate_example_code
+    tester.validate_example_code = fake_validate
+    try:
+        with tempfile.TemporaryDirectory() as tmpdir:
+            paths = create_examples(tmpdir)
+            sequential = []
+            for path in paths:
+                sequential.extend((os.path.basename(path), system, code)
+                                  for system, code in tester.extract_example_codings(json.load(open(path))))
+
+            calls.clear()
+            rows = tester.validate_example_files("http://tx.example.org/fhir", [], paths, max_workers=4)
+    finally:
+        tester.validate_example_code = original
+
+    print(f"Validated {len(rows)} rows with {len(calls)} requests")
+    assert [(r['file'], r['system'], r['code']) for r in rows] == sequential
+    assert len(calls) == len(set(calls)) == 4
+    print("✅ Rows kept in discovery order, duplicate codings validated once")
+
+if __name__ == "__main__":
+    test_validate_example_files_order()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script to verify transitive dependency resolution against the FHIR package cache
+"""
+
+import os
+import json
+import tempfile
+from dependencies import DependencyResolver, version_matches, version_key
+
+def make_package(folder, name, version, dependencies=None):
+    package_dir = os.path.join(folder, "package")
+    os.makedirs(package_dir, exist_ok=True)
+    with open(os.path.join(package_dir, "package.json"), 'w') as f:
+        json.dump({"name": name, "version": version, "dependencies": dependencies or {}}, f)
+    return folder
+
+def test_version_matching():
+    """Exact, wildcard and range requests pick versions by semver rules"""
+    assert version_matches("4.0.1", "4.0.1")
+    assert version_matches("4.0.x", "4.0.7") and not version_matches("4.0.x", "4.1.0")
+    assert version_matches("1.x", "1.9.0") and not version_matches("1.x", "2.0.0")
+    assert version_matches("^1.2.0", "1.4.0") and not version_matches("^1.2.0", "2.0.0")
+    assert version_matches("~1.2.0", "1.2.5") and not version_matches("~1.2.0", "1.3.0")
+    assert not version_matches("1.x", "1.3.0-ballot")
+    assert version_key("1.10.0") > version_key("1.9.0") > version_key("1.9.0-ballot")
+    print("✅ FHIR package versions matched by semver rules")
+
+def test_transitive_resolution_and_memo():
+    """Dependencies of dependencies are resolved once each, and the graph is memoized on disk"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache = os.path.join(tmpdir, "packages")
+        root = make_package(os.path.join(tmpdir, "ig"), "example.ig", "1.0.0", {"example.base": "2.0.x", "hl7.fhir.r4.core": "4.0.1"})
+        make_package(os.path.join(cache, "example.base#2.0.1"), "example.base", "2.0.1", {"hl7.terminology": "^5.0.0", "hl7.fhir.r4.core": "4.0.1"})
+        make_package(os.path.join(cache, "example.base#2.0.3"), "example.base", "2.0.3", {"hl7.terminology": "^5.0.0", "hl7.fhir.r4.core": "4.0.1"})
+        make_package(os.path.join(cache, "example.base#3.0.0"), "example.base", "3.0.0")
+        make_package(os.path.join(cache, "hl7.terminology#5.2.0"), "hl7.terminology", "5.2.0")
+        make_package(os.path.join(cache, "hl7.terminology#6.0.0"), "hl7.terminology", "6.0.0")
+        make_package(os.path.join(cache, "hl7.fhir.r4.core#4.0.1"), "hl7.fhir.r4.core", "4.0.1")
+
+        memo = os.path.join(tmpdir, "memo")
+        graph = DependencyResolver(cache, memo).resolve([root])
+        assert [(p["name"], p["version"]) for p in graph] == [
+            ("example.base", "2.0.3"), ("hl7.fhir.r4.core", "4.0.1"), ("hl7.terminology", "5.2.0")]
+        assert os.path.exists(os.path.join(memo, "dependency-graphs.json"))
+
+        resolver = DependencyResolver(cache, memo)
+        assert resolver.resolve([root]) == graph
+        assert resolver._available is None  # answered from the memo without listing the cache
+    print("✅ Transitive dependencies resolved once and memoized")
+
+def test_concurrent_graph_saves():
+    """Graphs saved from several threads at once all end up in the memo file"""
+    from concurrent.futures import ThreadPoolExecutor
+    with tempfile.TemporaryDirectory() as tmpdir:
+        resolver = DependencyResolver(tmpdir, tmpdir)
+        with ThreadPoolExecutor(max_workers=8) as executor:
+            list(executor.map(lambda i: resolver._save_graph(f"key-{i}", [{"name": f"p{i}"}]), range(32)))
+        with open(os.path.join(tmpdir, "dependency-graphs.json")) as f:
+            assert len(json.load(f)) == 32
+        assert [name for name in os.listdir(tmpdir) if name.endswith(".tmp")] == []
+    print("✅ Concurrent graph saves don't lose or corrupt entries")
+
+if __name__ == "__main__":
+    test_version_matching()
+    test_transitive_resolution_and_memo()
+    test_concurrent_graph_saves()
@@ -0,0 +1,54 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the process-pool example scan
+"""
+
+import os
+import json
+import tempfile
+import example_scan
+from example_scan import scan_examples, get_example_scan, balance_chunks, scan_example_file
+
+def write_example(folder, name, resource):
+    path = os.path.join(folder, name)
+    with open(path, 'w') as f:
+        json.dump(resource, f)
+    return path
+
+def observation(i, padding=0):
+    return {"resourceType": "Observation", "id": str(i),
+            "meta": {"profile": ["http://example.org/StructureDefinition/obs"]},
+            "code": {"coding": [{"system": "http://loinc.org", "code": f"{i}-0"}]},
+            "note": [{"text": "x" * padding}]}
+
+def test_chunks_balanced_by_size():
+    """Largest files go out first, and big files get a chunk to themselves"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = [write_example(tmpdir, f"Observation-{i}.json", observation(i, padding=100 * (i + 1) ** 3)) for i in range(8)]
+        chunks = balance_chunks(files, workers=2)
+        assert chunks[0] == [files[7]]
+        assert sorted(file for chunk in chunks for file in chunk) == sorted(files)
+    print("✅ Example files chunked by size, largest first")
+
+def test_pool_scan_matches_in_process():
+    """The pool returns the same codings and coded paths as a scan in this process"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        files = [write_example(tmpdir, f"Observation-{i}.json", observation(i)) for i in range(6)]
+        files.append(write_example(tmpdir, "broken.json", {"resourceType": "Observation"}))
+        with open(files[-1], 'w') as f:
+            f.write("{ not json")
+        assert scan_examples(files, max_workers=3) == 7
+        for i, file in enumerate(files[:-1]):
+            scan = get_example_scan(file)
+            assert scan == scan_example_file(file)
+            assert scan.codings == (("http://loinc.org", f"{i}-0"),)
+            resource_type, profiles, paths = scan.resources[0]
+            assert resource_type == "Observation" and profiles == ("http://example.org/StructureDefinition/obs",)
+            assert paths == (("Observation.code.coding", "http://loinc.org", f"{i}-0"),)
+        assert all((file, os.stat(file).st_mtime_ns) not in example_scan._scans for file in files[-1:])
+        assert scan_examples(files[:-1], max_workers=3) == 0
+    print("✅ Pool scan matches the in-process scan")
+
+if __name__ == "__main__":
+    test_chunks_balanced_by_size()
+    test_pool_scan_matches_in_process()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Test script to verify ValueSet expansion prefetch for membership checks
+"""
+
+import membership
+from txclient import get_client
+from fake_tx import FakeResponse
+
+def fake_expand_server(total, page_size_seen):
+    """GET handler serving an expansion of `total` codes, paged by offset/count"""
+    def fake_get(url, **kwargs):
+        query = dict(part.split('=', 1) for part in url.split('?', 1)[1].split('&'))
+        offset, count = int(query['offset']), int(query['count'])
+        page_size_seen.append(count)
+        contains = [{"system": "http://example.org/cs", "code": f"c{i}"} for i in range(offset, min(total, offset + count))]
+        return FakeResponse(200, {"resourceType": "ValueSet", "expansion": {"total": total, "offset": offset, "contains": contains}})
+    return fake_get
+
+def fail_post(url, **kwargs):
+    raise AssertionError("$validate-code should not be called for a prefetched ValueSet")
+
+def test_prefetch_pages_through_expansion():
+    """Small ValueSets are expanded page by page once and answered in memory"""
+    client = get_client()
+    original_get, original_post = client.get, client.post
+    pages = []
+    client.get = fake_expand_server(5, pages)
+    client.post = fail_post
+    try:
+        vs = "http://example.org/ValueSet/small"
+        passed = membership.validate_code_in_valueset("https://tx.example.org/fhir", vs, {"system": "http://example.org/cs", "code": "c4"}, prefetch_limit=10, page_size=2)
+        checked = membership.validate_code_in_valueset("https://tx.example.org/fhir", vs, {"system": "http://example.org/cs", "code": "c9"}, prefetch_limit=10, page_size=2)
+    finally:
+        client.get, client.post = original_get, original_post
+        membership._valueset_validate_cache.clear()
+        membership._expansion_members_cache.clear()
+    assert passed['result'] == 'PASS'
+    assert checked['result'] == 'CHECK' and checked['reason'] == 'Not a member of ValueSet'
+    assert len(pages) == 3
+    print("✅ Expansion prefetched in pages and reused for each coding")
+
+def test_large_valueset_not_prefetched():
+    """ValueSets above the limit are left to $validate-code"""
+    client = get_client()
+    original_get = client.get
+    pages = []
+    client.get = fake_expand_server(500, pages)
+    try:
+        members = membership.prefetch_valueset_members("https://tx.example.org/fhir", "http://example.org/ValueSet/large", 100, page_size=50)
+        again = membership.prefetch_valueset_members("https://tx.example.org/fhir", "http://example.org/ValueSet/large", 100, page_size=50)
+    finally:
+        client.get = original_get
+        membership._expansion_members_cache.clear()
+    assert members is None and again is None
+    assert len(pages) == 1
+    print("✅ Large ValueSet skipped after the first page")
+
+if __name__ == "__main__":
+    test_prefetch_pages_through_expansion()
+    test_large_valueset_not_prefetched()
@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the fast-path FHIRPath evaluator matches fhirpathpy
+"""
+
+from fhirpathpy import evaluate as fhirpathpy_evaluate
+import fhirpath_eval
+from fhirpath_eval import evaluate
+
+PARAMETERS = {
+    "resourceType": "Parameters",
+    "parameter": [
+        {"name": "result", "valueBoolean": False},
+        {"name": "message", "valueString": "Unknown code"},
+        {"name": "score", "valueDecimal": 0.5},
+    ]
+}
+
+CAPABILITY = {
+    "resourceType": "CapabilityStatement",
+    "instantiates": ["http://hl7.org/fhir/CapabilityStatement/terminology-server"],
+    "fhirVersion": "4.0.1",
+    "rest": [{"interaction": [{"code": "batch"}, {"code": "transaction"}]}, {"interaction": [{"code": "search-system"}]}]
+}
+
+OUTCOME = {"resourceType": "OperationOutcome",
+           "issue": [{"severity": "error", "details": {"text": "Bad"}}, {"severity": "warning", "details": {"text": "Hmm"}}]}
+
+FAST = [
+    (PARAMETERS, "parameter.where(name = 'result').valueBoolean"),
+    (PARAMETERS, "parameter.where(name = 'message').valueString"),
+    (PARAMETERS, "parameter.where(name='score').valueDecimal"),
+    (PARAMETERS, "parameter.where(name = 'missing').valueString"),
+    (CAPABILITY, "instantiates[0]"),
+    (CAPABILITY, "fhirVersion"),
+    (CAPABILITY, "rest.interaction.code"),
+    (CAPABILITY, "rest[1].interaction.code"),
+    (OUTCOME, "issue.where(severity='error').details.text"),
+    (OUTCOME, "snapshot.element"),
+]
+
+SLOW = [
+    (CAPABILITY, "rest.interaction.count()"),
+    (CAPABILITY, "CapabilityStatement.fhirVersion"),
+    (PARAMETERS, "parameter.where(name = 'result').valueBoolean = false"),
+]
+
+def test_fast_path_matches_fhirpathpy():
+    """Simple navigation runs as dict traversal and gives fhirpathpy's answers"""
+    for resource, expression in FAST:
+        assert fhirpath_eval._plan(expression) is not None, expression
+        assert evaluate(resource, expression) == fhirpathpy_evaluate(resource, expression), expression
+    print("✅ Fast-path FHIRPath results match fhirpathpy")
+
+def test_other_expressions_compiled_once():
+    """Anything else goes to fhirpathpy, compiled once per expression"""
+    for resource, expression in SLOW:
+        assert fhirpath_eval._plan(expression) is None, expression
+        assert evaluate(resource, expression) == fhirpathpy_evaluate(resource, expression), expression
+    compiled = fhirpath_eval._compiled["rest.interaction.count()"]
+    evaluate(CAPABILITY, "rest.interaction.count()")
+    assert fhirpath_eval._compiled["rest.interaction.count()"] is compiled
+    print("✅ Other FHIRPath expressions compiled once")
+
+if __name__ == "__main__":
+    test_fast_path_matches_fhirpathpy()
+    test_other_expressions_compiled_once()
@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Test script to verify offline CodeSystem validation from package content
+"""
+
+import os
+import json
+import tempfile
+import tester
+import membership
+import local_terminology
+from local_terminology import LocalCodeSystemProvider, LocalValueSetExpander
+
+def create_codesystem(url, version, content, concepts, case_sensitive=True):
+    return {
+        "resourceType": "CodeSystem",
+        "url": url,
+        "version": version,
+        "content": content,
+        "caseSensitive": case_sensitive,
+        "concept": concepts
+    }
+
+def test_provider_indexes_complete_codesystems():
+    """Complete CodeSystems answer locally (nested concepts too); others defer to the server"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        package_dir = os.path.join(tmpdir, "package")
+        os.makedirs(package_dir)
+        resources = {
+            "CodeSystem-status.json": create_codesystem(
+                "http://example.org/CodeSystem/status", "1.0.0", "complete",
+                [{"code": "active", "concept": [{"code": "active-nested"}]}, {"code": "inactive"}]),
+            "CodeSystem-fragment.json": create_codesystem(
+                "http://example.org/CodeSystem/fragment", "1.0.0", "fragment", [{"code": "a"}]),
+            "CodeSystem-caseless.json": create_codesystem(
+                "http://example.org/CodeSystem/caseless", "1.0.0", "complete", [{"code": "Mixed"}], case_sensitive=False),
+        }
+        for name, resource in resources.items():
+            with open(os.path.join(package_dir, name), 'w') as f:
+                json.dump(resource, f)
+
+        provider = LocalCodeSystemProvider()
+        assert provider.add_package(tmpdir) == 2
+
+    assert provider.validate("http://example.org/CodeSystem/status", "active") is True
+    assert provider.validate("http://example.org/CodeSystem/status", "active-nested") is True
+    assert provider.validate("http://example.org/CodeSystem/status", "unknown") is False
+    assert provider.validate("http://example.org/CodeSystem/fragment", "a") is None
+    assert provider.validate("http://example.org/CodeSystem/other", "a") is None
+    assert provider.validate("http://example.org/CodeSystem/caseless", "MIXED") is True
+    print("✅ Complete CodeSystems validated locally, others left for the server")
+
+def test_highest_version_wins():
+    """When a CodeSystem appears in several packages the highest version is used"""
+    provider = LocalCodeSystemProvider()
+    url = "http://example.org/CodeSystem/versions"
+    provider.add_codesystem(create_codesystem(url, "4.0.10", "complete", [{"code": "new"}]))
+    provider.add_codesystem(create_codesystem(url, "4.0.9", "complete", [{"code": "old"}]))
+    assert provider.version(url) == "4.0.10"
+    assert provider.validate(url, "new") is True
+    assert provider.validate(url, "old") is False
+    print("✅ Highest CodeSystem version kept")
+
+def test_validate_example_code_uses_local_provider():
+    """validate_example_code answers from the local provider without a server call"""
+    provider = LocalCodeSystemProvider()
+    provider.add_codesystem(create_codesystem("http://example.org/CodeSystem/local", "1.0.0", "complete", [{"code": "x"}]))
+    local_terminology._provider = provider
+    try:
+        passed = tester.validate_example_code("http://unreachable.invalid/fhir", [], "ex.json", "http://example.org/CodeSystem/local", "x")
+        failed = tester.validate_example_code("http://unreachable.invalid/fhir", [], "ex.json", "http://example.org/CodeSystem/local", "y")
+    finally:
+        local_terminology._provider = None
+        tester._validate_code_cache.clear()
+    assert passed['result'] == 'PASS'
+    assert failed['result'] == 'FAIL' and 'local CodeSystem' in failed['reason']
+    print("✅ Example codes validated offline")
+
+def create_expander():
+    provider = LocalCodeSystemProvider()
+    provider.add_codesystem(create_codesystem("http://example.org/CodeSystem/animals", "1.0.0", "complete", [
+        {"code": "animal", "concept": [
+            {"code": "mammal", "concept": [{"code": "dog"}, {"code": "cat"}]},
+            {"code": "bird", "property": [{"code": "habitat", "valueCode": "air"}]}
+        ]}
+    ]))
+    expander = LocalValueSetExpander(provider)
+    valuesets = [
+        {"url": "http://example.org/ValueSet/all-animals", "version": "1.0.0",
+         "compose": {"include": [{"system": "http://example.org/CodeSystem/animals"}]}},
+        {"url": "http://example.org/ValueSet/mammals",
+         "compose": {"include": [{"system": "http://example.org/CodeSystem/animals",
+                                  "filter": [{"property": "concept", "op": "is-a", "value": "mammal"}]}],
+                     "exclude": [{"system": "http://example.org/CodeSystem/animals", "concept": [{"code": "cat"}]}]}},
+        {"url": "http://example.org/ValueSet/flying",
+         "compose": {"include": [{"system": "http://example.org/CodeSystem/animals",
+                                  "filter": [{"property": "habitat", "op": "=", "value": "air"}]}]}},
+        {"url": "http://example.org/ValueSet/imported",
+         "compose": {"include": [{"valueSet": ["http://example.org/ValueSet/mammals"]},
+                                 {"system": "http://loinc.org", "concept": [{"code": "8867-4"}]}]}},
+        {"url": "http://example.org/ValueSet/remote",
+         "compose": {"include": [{"system": "http://snomed.info/sct",
+                                  "filter": [{"property": "concept", "op": "is-a", "value": "404684003"}]}]}},
+    ]
+    for vs in valuesets:
+        expander.add_valueset(dict(vs, resourceType="ValueSet"))
+    return expander
+
+def test_local_valueset_expansion():
+    """Concept lists, whole systems, imports and simple filters expand locally"""
+    expander = create_expander()
+    animals = "http://example.org/CodeSystem/animals"
+    assert len(expander.expand("http://example.org/ValueSet/all-animals")) == 5
+    assert len(expander.expand("http://example.org/ValueSet/all-animals|1.0.0")) == 5
+    assert expander.expand("http://example.org/ValueSet/all-animals|2.0.0") is None
+    assert expander.expand("http://example.org/ValueSet/mammals") == {(animals, "mammal"), (animals, "dog")}
+    assert expander.expand("http://example.org/ValueSet/flying") == {(animals, "bird")}
+    assert expander.contains("http://example.org/ValueSet/imported", "http://loinc.org", "8867-4") is True
+    assert expander.contains("http://example.org/ValueSet/imported", animals, "cat") is False
+    assert expander.expand("http://example.org/ValueSet/remote") is None
+    print("✅ Simple ValueSet composes expanded locally, the rest left for $expand")
+
+def test_membership_uses_local_expansion():
+    """validate_code_in_valueset answers from a local expansion without a server call"""
+    local_terminology._expander = create_expander()
+    try:
+        check = membership.validate_code_in_valueset("http://unreachable.invalid/fhir", "http://example.org/ValueSet/mammals",
+                                                     {"system": "http://example.org/CodeSystem/animals", "code": "cat"})
+    finally:
+        local_terminology._expander = None
+        membership._valueset_validate_cache.clear()
+    assert check['result'] == 'CHECK' and check['reason'] == 'Not a member of ValueSet'
+    print("✅ Membership checked against the local expansion")
+
+def test_dependencies_resolved_transitively():
+    """CodeSystems come from the same transitive, semver-resolved dependencies as the binding report"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        def make_package(folder, name, version, dependencies, resources=()):
+            package_dir = os.path.join(folder, "package")
+            os.makedirs(package_dir)
+            with open(os.path.join(package_dir, "package.json"), 'w') as f:
+                json.dump({"name": name, "version": version, "dependencies": dependencies}, f)
+            for resource in resources:
+                with open(os.path.join(package_dir, f"CodeSystem-{resource['version']}.json"), 'w') as f:
+                    json.dump(resource, f)
+            return folder
+
+        url = "http://example.org/CodeSystem/deep"
+        cache = os.path.join(tmpdir, "packages")
+        root = make_package(os.path.join(tmpdir, "ig"), "example.ig", "1.0.0", {"example.base": "1.0.0"})
+        make_package(os.path.join(cache, "example.base#1.0.0"), "example.base", "1.0.0", {"example.terms": "2.0.x"})
+        make_package(os.path.join(cache, "example.terms#2.0.1"), "example.terms", "2.0.1", {},
+                     [create_codesystem(url, "2.0.1", "complete", [{"code": "two"}])])
+        # A later major version with a newer mtime must not be picked over the 2.0.x match
+        make_package(os.path.join(cache, "example.terms#3.0.0"), "example.terms", "3.0.0", {},
+                     [create_codesystem(url, "3.0.0", "complete", [{"code": "three"}])])
+        config_file = os.path.join(tmpdir, "config.json")
+        with open(config_file, 'w') as f:
+            json.dump({"fhir-package-cache": cache}, f)
+        provider = local_terminology.configure_local_terminology([root], config_file)
+        try:
+            assert provider.version(url) == "2.0.1"
+            assert provider.validate(url, "two") is True
+        finally:
+            local_terminology._provider = None
+            local_terminology._expander = None
+    print("✅ Local terminology loads transitive dependencies")
+
+def test_abstract_and_inactive_concepts_left_to_server():
+    """Whole-system and filter includes that take in abstract or inactive concepts aren't expanded locally"""
+    system = "http://example.org/CodeSystem/flags"
+    provider = LocalCodeSystemProvider()
+    provider.add_codesystem(create_codesystem(system, "1.0.0", "complete", [
+        {"code": "group", "property": [{"code": "notSelectable", "valueBoolean": True}],
+         "concept": [{"code": "a"}, {"code": "old", "property": [{"code": "status", "valueCode": "retired"}]}]},
+        {"code": "b"}
+    ]))
+    expander = LocalValueSetExpander(provider)
+    for url, include in (("whole", {"system": system}),
+                         ("is-a", {"system": system, "filter": [{"property": "concept", "op": "is-a", "value": "group"}]}),
+                         ("listed", {"system": system, "concept": [{"code": "group"}, {"code": "b"}]}),
+                         ("clean", {"system": system, "filter": [{"property": "concept", "op": "=", "value": "b"}]})):
+        expander.add_valueset({"resourceType": "ValueSet", "url": f"http://example.org/ValueSet/{url}", "compose": {"include": [include]}})
+    assert expander.expand("http://example.org/ValueSet/whole") is None
+    assert expander.expand("http://example.org/ValueSet/is-a") is None
+    assert expander.expand("http://example.org/ValueSet/listed") == {(system, "group"), (system, "b")}
+    assert expander.expand("http://example.org/ValueSet/clean") == {(system, "b")}
+    print("✅ Abstract and inactive concepts left to the server's $expand")
+
+if __name__ == "__main__":
+    test_provider_indexes_complete_codesystems()
+    test_highest_version_wins()
+    test_validate_example_code_uses_local_provider()
+    test_local_valueset_expansion()
+    test_membership_uses_local_expansion()
+    test_dependencies_resolved_transitively()
+    test_abstract_and_inactive_concepts_left_to_server()
@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Test script to verify zero-copy package materialisation from the FHIR cache
+"""
+
+import os
+import json
+import tempfile
+from getter import materialise_package, get_fhir_packages
+
+def create_cached_package(cache_dir, name, version):
+    package_dir = os.path.join(cache_dir, f"{name}#{version}", "package")
+    os.makedirs(package_dir)
+    with open(os.path.join(package_dir, "package.json"), 'w') as f:
+        json.dump({"name": name, "version": version}, f)
+    return os.path.dirname(package_dir)
+
+def test_materialise_methods():
+    """Each method makes the package readable at the destination"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        src = create_cached_package(os.path.join(tmpdir, "cache"), "example.fhir.ig", "1.0.0")
+        for method in ("hardlink", "symlink", "copy"):
+            dst = os.path.join(tmpdir, method)
+            assert materialise_package(src, dst, method) == method
+            assert os.path.exists(os.path.join(dst, "package", "package.json"))
+        # Hardlinked files share the cached file's inode, but the folders are separate
+        cached = os.path.join(src, "package", "package.json")
+        assert os.path.samefile(cached, os.path.join(tmpdir, "hardlink", "package", "package.json"))
+        assert not os.path.islink(os.path.join(tmpdir, "hardlink"))
+        assert os.path.islink(os.path.join(tmpdir, "symlink"))
+        assert materialise_package(src, os.path.join(tmpdir, "auto")) in ("reflink", "hardlink")
+    print("✅ Packages materialised without copying")
+
+def test_clean_mode_keeps_cache_intact():
+    """A clean run removes the local tree but never the cached package"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        cache_dir = os.path.join(tmpdir, "cache")
+        src = create_cached_package(cache_dir, "example.fhir.ig", "1.0.0")
+        config_file = os.path.join(tmpdir, "config.json")
+        with open(config_file, 'w') as f:
+            json.dump({"fhir-package-cache": cache_dir, "package-materialisation": "hardlink",
+                       "packages": [{"name": "example.fhir.ig", "version": "1.0.0", "title": "Example"}]}, f)
+        data_dir = os.path.join(tmpdir, "data")
+        paths = get_fhir_packages('clean', data_dir, config_file)
+        assert paths == [os.path.join(data_dir, "packages", "example.fhir.ig#1.0.0")]
+        paths = get_fhir_packages('clean', data_dir, config_file)
+        assert os.path.exists(os.path.join(paths[0], "package", "package.json"))
+        assert os.path.exists(os.path.join(src, "package", "package.json"))
+
+        with open(config_file, 'w') as f:
+            json.dump({"fhir-package-cache": cache_dir, "package-materialisation": "in-place",
+                       "packages": [{"name": "example.fhir.ig", "version": "1.0.0", "title": "Example"}]}, f)
+        assert get_fhir_packages('clean', data_dir, config_file) == [src]
+    print("✅ Clean runs isolated from the FHIR cache")
+
+if __name__ == "__main__":
+    test_materialise_methods()
+    test_clean_mode_keeps_cache_intact()
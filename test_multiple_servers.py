@@ -2,9 +2,7 @@
 
 import os
 import sys
-import json
 from tester import run_valueset_binding_report
-from utils import get_config
 
 def test_multiple_servers():
     """Test TSV generation with different terminology servers"""
@@ -34,33 +32,12 @@ def test_multiple_servers():
     for server in servers:
         print(f"\n=== Testing with server: {server} ===")
         
-        # Temporarily update config
-        with open(config_file, 'r') as f:
-            config = json.load(f)
-        
-        original_endpoint = config['init'][0]['endpoint']
-        config['init'][0]['endpoint'] = server
-        
-        # Write temporary config
-        temp_config = 'temp_config.json'
-        with open(temp_config, 'w') as f:
-            json.dump(config, f, indent=2)
-        
         try:
-            # Run the binding report
-            run_valueset_binding_report(npm_path_list, outdir, temp_config)
+            # Run the binding report against this server without touching config.json
+            run_valueset_binding_report(npm_path_list, outdir, config_file, endpoint=server)
             print(f"Report generated for {server}")
         except Exception as e:
             print(f"Error with {server}: {e}")
-        finally:
-            # Restore original config
-            config['init'][0]['endpoint'] = original_endpoint
-            with open(config_file, 'w') as f:
-                json.dump(config, f, indent=2)
-            
-            # Clean up temp config
-            if os.path.exists(temp_config):
-                os.remove(temp_config)
 
 if __name__ == '__main__':
     test_multiple_servers()
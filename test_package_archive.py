@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Test script to verify reading packages straight from .tgz tarballs
+"""
+
+import io
+import os
+import json
+import tarfile
+import tempfile
+import tester
+import membership
+from getter import find_cached_package
+from package_archive import get_archive, load_json
+from package_index import get_package_index
+
+PROFILE = {
+    "resourceType": "StructureDefinition", "url": "http://example.org/StructureDefinition/p",
+    "name": "P", "title": "P", "kind": "resource", "type": "Patient",
+    "baseDefinition": "http://hl7.org/fhir/StructureDefinition/Patient",
+    "snapshot": {"element": [{"id": "Patient.gender", "path": "Patient.gender", "mustSupport": True,
+                              "binding": {"strength": "required", "valueSet": "http://hl7.org/fhir/ValueSet/administrative-gender"}}]}
+}
+EXAMPLE = {"resourceType": "Observation", "code": {"coding": [{"system": "http://loinc.org", "code": "8867-4"}]}}
+
+def create_tarball(path, resources):
+    with tarfile.open(path, "w:gz") as tar:
+        for name, resource in resources.items():
+            data = json.dumps(resource).encode()
+            info = tarfile.TarInfo(name)
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+
+def test_resources_read_from_tarball():
+    """Index, profile bindings and example codings come straight from the tarball"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        tgz = os.path.join(tmpdir, "example.fhir.ig#1.0.0.tgz")
+        create_tarball(tgz, {
+            "package/package.json": {"name": "example.fhir.ig", "version": "1.0.0"},
+            "package/StructureDefinition-p.json": PROFILE,
+            "package/example/Observation-ex.json": EXAMPLE,
+        })
+        assert len(get_archive(tgz)) == 3
+        assert load_json(os.path.join(tgz, "package", "package.json"))["version"] == "1.0.0"
+
+        index = get_package_index(tgz)
+        assert index.get("http://example.org/StructureDefinition/p")["title"] == "P"
+        assert membership.find_profile_by_url(tgz, "http://example.org/StructureDefinition/p") == os.path.join(tgz, "package", "StructureDefinition-p.json")
+
+        bindings = tester.process_ig_bindings(tgz, [], {"require-must-support": True, "minimum-binding-strength": ["required"]})
+        assert [b["valueset_url"] for b in bindings] == ["http://hl7.org/fhir/ValueSet/administrative-gender"]
+
+        examples = list(tester.get_json_files(os.path.join(tgz, "package", "example")))
+        assert examples == [os.path.join(tgz, "package", "example", "Observation-ex.json")]
+        assert tester.load_example_codings(examples[0]) == [("http://loinc.org", "8867-4")]
+
+        assert find_cached_package(tmpdir, "example.fhir.ig", "1.0.0") == tgz
+        # Nothing was extracted next to the tarball
+        assert os.listdir(tmpdir) == [os.path.basename(tgz)]
+    print("✅ Package read from tarball without extraction")
+
+if __name__ == "__main__":
+    test_resources_read_from_tarball()
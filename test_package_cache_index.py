@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the persistent FHIR package cache index
+"""
+
+import io
+import os
+import json
+import tarfile
+import tempfile
+from package_cache_index import PackageCacheIndex
+
+def write_package(cache_dir, folder, resources):
+    package_dir = os.path.join(cache_dir, folder, "package")
+    os.makedirs(package_dir, exist_ok=True)
+    for filename, resource in resources.items():
+        with open(os.path.join(package_dir, filename), 'w') as f:
+            json.dump(resource, f)
+    return package_dir
+
+def valueset(url, version, title):
+    return {"resourceType": "ValueSet", "url": url, "version": version, "title": title}
+
+def test_cache_index_lookup_and_incremental_update():
+    """Packages are indexed once, changed or removed packages are picked up on update"""
+    with tempfile.TemporaryDirectory() as cache_dir, tempfile.TemporaryDirectory() as db_dir:
+        db = os.path.join(db_dir, "package-index.sqlite")
+        write_package(cache_dir, "hl7.fhir.r4.core#4.0.1", {"ValueSet-gender.json": valueset("http://hl7.org/fhir/ValueSet/administrative-gender", "4.0.1", "AdministrativeGender")})
+        au = write_package(cache_dir, "hl7.fhir.au.base#5.0.0", {"ValueSet-indigenous.json": valueset("https://healthterminologies.gov.au/fhir/ValueSet/indigenous-status-1", "1.0.0", "Indigenous Status")})
+
+        index = PackageCacheIndex(db, cache_dir)
+        assert index.update() == 2
+        matches = index.find("http://hl7.org/fhir/ValueSet/administrative-gender|4.0.1", "ValueSet")
+        assert [m["title"] for m in matches] == ["AdministrativeGender"]
+        assert index.find("http://hl7.org/fhir/ValueSet/administrative-gender|9.9.9")[0]["package"] == "hl7.fhir.r4.core#4.0.1"
+        assert index.find("http://example.org/ValueSet/missing") == []
+        # Nothing is written into the package cache
+        assert not os.path.exists(os.path.join(au, ".index.json"))
+        index.close()
+
+        # Warm start: nothing to re-read
+        index = PackageCacheIndex(db, cache_dir)
+        assert index.update() == 0
+
+        # A new resource in one package re-indexes just that package, a removed package is dropped
+        with open(os.path.join(au, "ValueSet-extra.json"), 'w') as f:
+            json.dump(valueset("http://example.org/ValueSet/extra", "1.0.0", "Extra"), f)
+        os.utime(au, ns=(1, 1))
+        os.rename(os.path.join(cache_dir, "hl7.fhir.r4.core#4.0.1"), os.path.join(db_dir, "removed"))
+        assert index.update() == 1
+        assert index.find("http://example.org/ValueSet/extra")[0]["title"] == "Extra"
+        assert index.find("http://hl7.org/fhir/ValueSet/administrative-gender") == []
+        index.close()
+    print("✅ Package cache index updated incrementally")
+
+def test_cache_index_reads_tarballs():
+    """Packages cached as .tgz tarballs are indexed too"""
+    with tempfile.TemporaryDirectory() as cache_dir:
+        tgz = os.path.join(cache_dir, "example.terms#1.0.0.tgz")
+        data = json.dumps(valueset("http://example.org/ValueSet/packed", "1.0.0", "Packed")).encode()
+        with tarfile.open(tgz, "w:gz") as tar:
+            info = tarfile.TarInfo("package/ValueSet-packed.json")
+            info.size = len(data)
+            tar.addfile(info, io.BytesIO(data))
+        index = PackageCacheIndex(":memory:", cache_dir)
+        assert index.update() == 1
+        match = index.find("http://example.org/ValueSet/packed")[0]
+        assert match["title"] == "Packed" and match["package"] == "example.terms#1.0.0.tgz"
+        assert index.update() == 0
+        index.close()
+    print("✅ Tarball packages indexed")
+
+if __name__ == "__main__":
+    test_cache_index_lookup_and_incremental_update()
+    test_cache_index_reads_tarballs()
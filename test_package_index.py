@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the per-package canonical resource index
+"""
+
+import os
+import json
+import tempfile
+import membership
+import package_index
+from package_index import get_package_index
+
+def write_resource(folder, filename, resource):
+    os.makedirs(folder, exist_ok=True)
+    with open(os.path.join(folder, filename), 'w') as f:
+        json.dump(resource, f)
+
+def test_canonical_index_lookups():
+    """url and url|version lookups, type filtering and profile discovery from one pass"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        package_dir = os.path.join(tmpdir, "package")
+        write_resource(package_dir, "StructureDefinition-au-patient.json", {
+            "resourceType": "StructureDefinition", "url": "http://example.org/StructureDefinition/au-patient",
+            "version": "1.0.0", "name": "AUPatient", "title": "AU Patient", "kind": "resource", "type": "Patient",
+            "baseDefinition": "http://hl7.org/fhir/StructureDefinition/Patient"})
+        write_resource(package_dir, "ValueSet-gender.json", {
+            "resourceType": "ValueSet", "url": "http://example.org/ValueSet/gender", "version": "2.0.0", "title": "Gender"})
+
+        index = get_package_index(tmpdir)
+        assert len(index) == 2
+        assert index.get("http://example.org/ValueSet/gender")["title"] == "Gender"
+        assert index.get("http://example.org/ValueSet/gender|2.0.0")["title"] == "Gender"
+        assert index.get("http://example.org/ValueSet/gender|1.0.0") is None
+        assert index.resolve("http://example.org/ValueSet/gender|1.0.0")["title"] == "Gender"
+        assert index.get("http://example.org/ValueSet/gender", "CodeSystem") is None
+        assert get_package_index(tmpdir) is index
+
+        profile_path = os.path.join(package_dir, "StructureDefinition-au-patient.json")
+        assert membership.find_profile_by_url(tmpdir, "http://example.org/StructureDefinition/au-patient") == profile_path
+        assert membership.find_profiles_by_resource_type(tmpdir, "Patient") == [profile_path]
+        assert membership.find_profiles_by_resource_type(tmpdir, "Observation") == []
+
+        # Adding a file to the package rebuilds the index
+        write_resource(package_dir, "CodeSystem-status.json", {"resourceType": "CodeSystem", "url": "http://example.org/CodeSystem/status"})
+        os.utime(package_dir, ns=(0, 0))
+        assert get_package_index(tmpdir).get("http://example.org/CodeSystem/status") is not None
+    print("✅ Canonical index answers url, version and type lookups")
+
+def test_index_flat_folder():
+    """Folders without a package/ sub folder are indexed too"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write_resource(tmpdir, "ValueSet-flat.json", {"resourceType": "ValueSet", "url": "http://example.org/ValueSet/flat", "name": "Flat"})
+        assert get_package_index(tmpdir).get("http://example.org/ValueSet/flat")["name"] == "Flat"
+    print("✅ Flat package folders indexed")
+
+def test_index_json_used_without_opening_files():
+    """A shipped .index.json answers discovery; files are only read for fields it doesn't list"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        package_dir = os.path.join(tmpdir, "package")
+        write_resource(package_dir, ".index.json", {"index-version": 1, "files": [
+            {"filename": "StructureDefinition-p.json", "resourceType": "StructureDefinition",
+             "url": "http://example.org/StructureDefinition/p", "kind": "resource", "type": "Patient"},
+            {"filename": "ValueSet-v.json", "resourceType": "ValueSet", "url": "http://example.org/ValueSet/v"}]})
+        # The profile's file is deliberately unreadable: discovery mustn't open it
+        with open(os.path.join(package_dir, "StructureDefinition-p.json"), 'w') as f:
+            f.write("not json")
+        write_resource(package_dir, "ValueSet-v.json", {"resourceType": "ValueSet", "url": "http://example.org/ValueSet/v", "title": "V"})
+
+        index = get_package_index(tmpdir)
+        assert [entry["url"] for entry in index.of_type("StructureDefinition")] == ["http://example.org/StructureDefinition/p"]
+        assert index.get("http://example.org/ValueSet/v")["title"] == "V"
+    print("✅ .index.json used for discovery, files loaded on demand")
+
+def test_missing_index_json_is_built():
+    """Folders without an .index.json are indexed into the tool's cache, not the folder itself"""
+    with tempfile.TemporaryDirectory() as tmpdir, tempfile.TemporaryDirectory() as cache_dir:
+        package_index.configure_folder_index_cache(cache_dir)
+        try:
+            write_resource(tmpdir, "CodeSystem-c.json", {"resourceType": "CodeSystem", "url": "http://example.org/CodeSystem/c", "title": "C"})
+            assert get_package_index(tmpdir).get("http://example.org/CodeSystem/c")["title"] == "C"
+            assert not os.path.exists(os.path.join(tmpdir, ".index.json"))
+            saved = os.listdir(os.path.join(cache_dir, package_index.FOLDER_INDEX_DIR))
+            assert len(saved) == 1
+        finally:
+            package_index.configure_folder_index_cache(None)
+    print("✅ Missing .index.json built and kept outside the package")
+
+def test_built_index_not_stale_with_other_json():
+    """.json files that aren't resources are remembered, so they don't make the index look stale"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        write_resource(tmpdir, "ValueSet-v.json", {"resourceType": "ValueSet", "url": "http://example.org/ValueSet/v"})
+        write_resource(tmpdir, "openapi.json", {"openapi": "3.0.0"})
+        with open(os.path.join(tmpdir, "broken.json"), 'w') as f:
+            f.write("not json")
+        files, _ = package_index.read_folder_index(tmpdir)
+        assert [entry["filename"] for entry in files] == ["ValueSet-v.json"]
+        calls = []
+        original = package_index.build_folder_index
+        package_index.build_folder_index = lambda folder, write=True: calls.append(folder) or original(folder, write)
+        try:
+            package_index.read_folder_index(tmpdir)
+            assert calls == []
+            write_resource(tmpdir, "ValueSet-w.json", {"resourceType": "ValueSet", "url": "http://example.org/ValueSet/w"})
+            os.utime(tmpdir, ns=(0, 0))
+            files, _ = package_index.read_folder_index(tmpdir)
+            assert calls == [tmpdir] and len(files) == 2
+        finally:
+            package_index.build_folder_index = original
+    print("✅ Built index reused while only non-resource files sit beside the resources")
+
+def test_profiles_indexed_by_constrained_type():
+    """Profiles are found by exact type, following baseDefinition chains; substrings don't match"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        package_dir = os.path.join(tmpdir, "package")
+        base = "http://example.org/StructureDefinition/"
+        write_resource(package_dir, "StructureDefinition-obs.json", {
+            "resourceType": "StructureDefinition", "url": base + "obs", "kind": "resource", "derivation": "constraint",
+            "type": "Observation", "baseDefinition": "http://hl7.org/fhir/StructureDefinition/Observation"})
+        # No type: resolved through its base profile
+        write_resource(package_dir, "StructureDefinition-obs-child.json", {
+            "resourceType": "StructureDefinition", "url": base + "obs-child", "kind": "resource",
+            "baseDefinition": base + "obs"})
+        # Base url contains "Observation" but the profile constrains DiagnosticReport
+        write_resource(package_dir, "StructureDefinition-report.json", {
+            "resourceType": "StructureDefinition", "url": base + "report", "kind": "resource", "derivation": "constraint",
+            "type": "DiagnosticReport", "baseDefinition": base + "ObservationReportBase"})
+        write_resource(package_dir, "StructureDefinition-model.json", {
+            "resourceType": "StructureDefinition", "url": base + "model", "kind": "logical", "derivation": "specialization",
+            "type": base + "model", "baseDefinition": "http://hl7.org/fhir/StructureDefinition/Base"})
+
+        index = get_package_index(tmpdir)
+        assert [entry["url"] for entry in index.profiles_of_type("Observation")] == [base + "obs-child", base + "obs"]
+        assert [entry["url"] for entry in index.profiles_of_type("DiagnosticReport")] == [base + "report"]
+        assert membership.find_profiles_by_resource_type(tmpdir, "Observation") == [
+            os.path.join(package_dir, "StructureDefinition-obs-child.json"), os.path.join(package_dir, "StructureDefinition-obs.json")]
+    print("✅ Profiles indexed by the resource type they constrain")
+
+def test_unlisted_index_fields_read_from_file():
+    """Fields an .index.json leaves out (kind, type) are read from the resource, so profiles aren't dropped"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        package_dir = os.path.join(tmpdir, "package")
+        write_resource(package_dir, ".index.json", {"index-version": 1, "files": [
+            {"filename": "StructureDefinition-obs.json", "resourceType": "StructureDefinition",
+             "url": "http://example.org/StructureDefinition/obs"}]})
+        write_resource(package_dir, "StructureDefinition-obs.json", {
+            "resourceType": "StructureDefinition", "url": "http://example.org/StructureDefinition/obs",
+            "kind": "resource", "derivation": "constraint", "type": "Observation",
+            "baseDefinition": "http://hl7.org/fhir/StructureDefinition/Observation"})
+        profiles = get_package_index(tmpdir).profiles_of_type("Observation")
+        assert [entry["url"] for entry in profiles] == ["http://example.org/StructureDefinition/obs"]
+    print("✅ Fields missing from .index.json read from the resource")
+
+if __name__ == "__main__":
+    test_canonical_index_lookups()
+    test_index_flat_folder()
+    test_index_json_used_without_opening_files()
+    test_missing_index_json_is_built()
+    test_built_index_not_stale_with_other_json()
+    test_profiles_indexed_by_constrained_type()
+    test_unlisted_index_fields_read_from_file()
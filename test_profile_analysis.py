@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the shared profile analysis used by the binding report and membership checks
+"""
+
+import os
+import json
+import tempfile
+import tester
+import membership
+from profile_analysis import analyse_profile
+
+CODE = {"id": "Observation.code", "path": "Observation.code",
+        "binding": {"strength": "extensible", "valueSet": "https://healthterminologies.gov.au/fhir/ValueSet/obs-1",
+                    "extension": [
+                        {"url": "http://hl7.org/fhir/StructureDefinition/elementdefinition-bindingName", "valueString": "ObsCode"},
+                        {"url": "http://hl7.org/fhir/tools/StructureDefinition/additional-binding",
+                         "extension": [{"url": "purpose", "valueCode": "required"},
+                                       {"url": "valueSet", "valueCanonical": "https://example.org/ValueSet/extra"}]}]}}
+
+PROFILE = {
+    "resourceType": "StructureDefinition",
+    "url": "http://example.org/StructureDefinition/obs",
+    "name": "Obs",
+    "title": "Obs Profile",
+    "type": "Observation",
+    "snapshot": {"element": [
+        {"id": "Observation", "path": "Observation"},
+        dict(CODE),
+        {"id": "Observation.method", "path": "Observation.method",
+         "binding": {"strength": "example", "valueSet": "http://hl7.org/fhir/ValueSet/observation-methods"}}]},
+    "differential": {"element": [dict(CODE, mustSupport=True)]}
+}
+
+OPTIONS = {"require-must-support": True, "minimum-binding-strength": ["required", "extensible"]}
+
+def test_views_merged_by_element_id():
+    """Snapshot and differential elements merge by id; MustSupport from either view counts"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "StructureDefinition-obs.json")
+        with open(path, 'w') as f:
+            json.dump(PROFILE, f)
+        analysis = analyse_profile(path)
+        assert analyse_profile(path) is analysis
+        code = [b for b in analysis.all_bindings if b.element_id == "Observation.code"]
+        assert [(b.source, b.views, b.mustSupport) for b in code] == [
+            ("binding", ("differential", "snapshot"), True),
+            ("additional-binding", ("differential", "snapshot"), True)]
+        selected = [(b.valueSet, strength) for b, strength in analysis.bindings(OPTIONS)]
+        assert selected == [("https://healthterminologies.gov.au/fhir/ValueSet/obs-1", "extensible"),
+                            ("https://example.org/ValueSet/extra", "required")]
+    print("✅ Profile views merged by element id")
+
+def test_report_and_membership_agree():
+    """The binding report and the membership binding map see the same bindings"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "StructureDefinition-obs.json")
+        with open(path, 'w') as f:
+            json.dump(PROFILE, f)
+        rows = tester.process_profile_bindings(path, [], OPTIONS)
+        assert [(r["valueset_url"], r["binding_name"]) for r in rows] == [
+            ("https://healthterminologies.gov.au/fhir/ValueSet/obs-1", "ObsCode"),
+            ("https://example.org/ValueSet/extra", None)]
+        bmap = membership.build_binding_map(path, OPTIONS)
+        assert [entry["valueSet"] for entry in bmap["Observation.code"]] == [r["valueset_url"] for r in rows]
+    print("✅ Report and membership share one binding model")
+
+if __name__ == "__main__":
+    test_views_merged_by_element_id()
+    test_report_and_membership_agree()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the parse-once resource cache
+"""
+
+import os
+import json
+import tempfile
+from resource_cache import ResourceCache
+
+def write_json(path, resource):
+    with open(path, 'w') as f:
+        json.dump(resource, f)
+
+def test_resource_parsed_once():
+    """Repeated loads hit the cache until the file changes"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = os.path.join(tmpdir, "StructureDefinition-p.json")
+        write_json(path, {"resourceType": "StructureDefinition", "name": "P"})
+        cache = ResourceCache()
+        first = cache.load(path)
+        assert cache.load(path) is first
+        write_json(path, {"resourceType": "StructureDefinition", "name": "Q"})
+        os.utime(path, ns=(1, 1))
+        assert cache.load(path)["name"] == "Q"
+        stats = cache.stats()
+        assert stats["hits"] == 1 and stats["misses"] == 2
+    print("✅ Resources parsed once per path and mtime")
+
+def test_resource_cache_size_bound():
+    """Least recently used resources are dropped once the size bound is exceeded"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        paths = []
+        for i in range(3):
+            path = os.path.join(tmpdir, f"Patient-{i}.json")
+            write_json(path, {"resourceType": "Patient", "id": str(i), "text": "x" * 100})
+            paths.append(path)
+        size = os.path.getsize(paths[0])
+        cache = ResourceCache(max_bytes=2 * size)
+        for path in paths:
+            cache.load(path)
+        assert cache.stats()["evictions"] == 1 and cache.stats()["entries"] == 2
+        cache.load(paths[2])
+        assert cache.stats()["hits"] == 1
+        cache.load(paths[0])
+        assert cache.stats()["misses"] == 4
+    print("✅ Resource cache stays within its size bound")
+
+if __name__ == "__main__":
+    test_resource_parsed_once()
+    test_resource_cache_size_bound()
@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the cross-server comparison matrix and shared package parsing
+"""
+
+import os
+import json
+import tempfile
+import tester
+
+def test_write_server_matrix():
+    """One column per server, ValueSet rows then code rows, with disagreements flagged"""
+    summaries = {
+        "https://tx.fhir.org/r4": {
+            "valuesets": {"http://example.org/ValueSet/a": {"title": "A", "expansion": "12"}},
+            "codes": {("http://loinc.org", "8867-4"): "PASS", ("http://snomed.info/sct", "1"): "PASS"}
+        },
+        "https://tx.hl7.org.au/fhir": {
+            "valuesets": {"http://example.org/ValueSet/a": {"title": "A", "expansion": "12"}},
+            "codes": {("http://loinc.org", "8867-4"): "PASS", ("http://snomed.info/sct", "1"): "FAIL"}
+        }
+    }
+    with tempfile.TemporaryDirectory() as tmpdir:
+        df = tester.write_server_matrix(summaries, tmpdir)
+        assert os.path.exists(os.path.join(tmpdir, "ServerComparison.tsv"))
+        assert os.path.exists(os.path.join(tmpdir, "ServerComparison.html"))
+    assert list(df.columns) == ["Type", "System", "Item", "https://tx.fhir.org/r4", "https://tx.hl7.org.au/fhir", "Differs"]
+    assert list(df["Type"]) == ["ValueSet", "Code", "Code"]
+    assert list(df["Differs"]) == [False, False, True]
+    print("✅ Server comparison matrix written")
+
+def test_ig_bindings_parsed_once():
+    """Binding report runs for several servers share one parse of the IG profiles"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        sd = {
+            "resourceType": "StructureDefinition", "url": "http://example.org/StructureDefinition/p",
+            "name": "P", "title": "P", "type": "Patient",
+            "snapshot": {"element": [{"id": "Patient.gender", "path": "Patient.gender", "mustSupport": True,
+                                      "binding": {"strength": "required", "valueSet": "http://hl7.org/fhir/ValueSet/administrative-gender"}}]}
+        }
+        with open(os.path.join(tmpdir, "StructureDefinition-p.json"), "w") as f:
+            json.dump(sd, f)
+        options = {"require-must-support": True, "minimum-binding-strength": ["required"]}
+        calls = []
+        original = tester.process_ig_bindings
+        tester.process_ig_bindings = lambda folder, results, opts: calls.append(folder) or original(folder, results, opts)
+        try:
+            first = tester.get_ig_bindings(tmpdir, options)
+            second = tester.get_ig_bindings(tmpdir, options)
+        finally:
+            tester.process_ig_bindings = original
+            tester._ig_bindings_cache.clear()
+    assert first == second and len(first) == 1
+    assert len(calls) == 1
+    print("✅ IG bindings parsed once and shared")
+
+if __name__ == "__main__":
+    test_write_server_matrix()
+    test_ig_bindings_parsed_once()
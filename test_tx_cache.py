@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the persistent terminology result cache
+"""
+
+import tempfile
+from txcache import ResultCache
+
+def test_result_cache_round_trip():
+    """Results survive reopening the cache and are keyed by version and coding"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = f"{tmpdir}/tx-cache.sqlite"
+        cache = ResultCache(path)
+        endpoint = "https://tx.example.org/fhir"
+        vs = "http://hl7.org/fhir/ValueSet/administrative-gender"
+        cache.put(endpoint, "ValueSet/$validate-code", vs, "4.0.1", "http://hl7.org/fhir/administrative-gender", "male",
+                  result={"result": "PASS", "reason": "", "status_code": 200})
+        cache.close()
+
+        cache = ResultCache(path)
+        hit = cache.get(endpoint, "ValueSet/$validate-code", vs, "4.0.1", "http://hl7.org/fhir/administrative-gender", "male")
+        assert hit == {"result": "PASS", "reason": "", "status_code": 200}
+        # Different version and different code are separate entries
+        assert cache.get(endpoint, "ValueSet/$validate-code", vs, None, "http://hl7.org/fhir/administrative-gender", "male") is None
+        assert cache.get(endpoint, "ValueSet/$validate-code", vs, "4.0.1", "http://hl7.org/fhir/administrative-gender", "female") is None
+        assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+        cache.close()
+    print("✅ Cache entries persisted and keyed correctly")
+
+def test_result_cache_ttl_and_refresh():
+    """Expired entries are misses, and refresh mode ignores existing entries"""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        path = f"{tmpdir}/tx-cache.sqlite"
+        cache = ResultCache(path)
+        cache.put("e", "CodeSystem/$validate-code", "http://loinc.org", code="8867-4", result={"status_code": 200}, ttl=-1)
+        cache.put("e", "CodeSystem/$validate-code", "http://loinc.org", code="8310-5", result={"status_code": 200})
+        assert cache.get("e", "CodeSystem/$validate-code", "http://loinc.org", code="8867-4") is None
+        cache.close()
+
+        cache = ResultCache(path, refresh=True)
+        assert cache.get("e", "CodeSystem/$validate-code", "http://loinc.org", code="8310-5") is None
+        cache.close()
+    print("✅ TTL expiry and refresh mode behave as expected")
+
+if __name__ == "__main__":
+    test_result_cache_round_trip()
+    test_result_cache_ttl_and_refresh()
@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""
+Test script to verify the terminology client's throttling behaviour
+"""
+
+import time
+import requests
+from txclient import TerminologyClient, RateLimiter, EndpointUnavailable, parse_retry_after
+from fake_tx import FakeResponse
+
+class FakeSession:
+    """Answers with the queued status codes in order"""
+    def __init__(self, responses):
+        self.responses = list(responses)
+        self.calls = 0
+
+    def request(self, method, url, timeout=None, **kwargs):
+        self.calls += 1
+        response = self.responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+def test_parse_retry_after():
+    """Retry-After accepts delta-seconds, and falls back to the default otherwise"""
+    assert parse_retry_after("2") == 2.0
+    assert parse_retry_after(None) == 1.0
+    assert parse_retry_after("not a date", default=3.0) == 3.0
+    assert parse_retry_after("Wed, 21 Oct 2015 07:28:00 GMT") == 0.0
+    print("✅ Retry-After parsed")
+
+def test_rate_limiter_aimd():
+    """Successes grow the rate additively, throttling halves it within bounds"""
+    limiter = RateLimiter(rate=10, min_rate=1, max_rate=11)
+    for _ in range(100):
+        limiter.on_success()
+    assert limiter.rate == 11
+    limiter.on_throttle(0)
+    assert limiter.rate == 5.5
+    for _ in range(10):
+        limiter.on_throttle(0)
+    assert limiter.rate == 1
+    print("✅ Rate adapts additively up and multiplicatively down")
+
+def test_client_retries_throttled_requests():
+    """429/503 responses are retried after Retry-After instead of being returned"""
+    client = TerminologyClient({"requests-per-second": 100, "throttle-retries": 3})
+    session = FakeSession([FakeResponse(429, headers={"Retry-After": "0.05"}), FakeResponse(503, headers={"Retry-After": "0"}), FakeResponse(200)])
+    client.session = lambda url: session
+    started = time.monotonic()
+    response = client.get("https://tx.example.org/fhir/metadata")
+    assert response.status_code == 200
+    assert session.calls == 3
+    assert client.throttled == 2
+    assert time.monotonic() - started >= 0.05
+    print("✅ Throttled requests retried until they succeed")
+
+def test_client_gives_up_after_throttle_retries():
+    """After throttle_retries the throttled response is handed back"""
+    client = TerminologyClient({"requests-per-second": 100, "throttle-retries": 1})
+    session = FakeSession([FakeResponse(429, headers={"Retry-After": "0"}), FakeResponse(429, headers={"Retry-After": "0"})])
+    client.session = lambda url: session
+    assert client.get("https://tx.example.org/fhir/metadata").status_code == 429
+    assert session.calls == 2
+    print("✅ Throttled response returned once retries are used up")
+
+def test_client_retries_server_errors_with_backoff():
+    """Idempotent requests are retried on connection errors and 5xx, POSTs are not by default"""
+    client = TerminologyClient({"requests-per-second": 100, "max-retries": 2, "backoff-base-seconds": 0.001})
+    session = FakeSession([requests.ConnectionError("reset"), FakeResponse(502), FakeResponse(200)])
+    client.session = lambda url: session
+    assert client.get("https://tx.example.org/fhir/metadata").status_code == 200
+    assert client.stats()["retries"] == 2
+
+    session = FakeSession([FakeResponse(500)])
+    client.session = lambda url: session
+    assert client.post("https://tx.example.org/fhir/ValueSet", json={}).status_code == 500
+    assert session.calls == 1
+    print("✅ Idempotent requests retried with backoff")
+
+def test_circuit_breaker_short_circuits():
+    """After breaker-threshold consecutive failures calls fail fast with EndpointUnavailable"""
+    client = TerminologyClient({"requests-per-second": 100, "max-retries": 0, "breaker-threshold": 2, "breaker-reset-seconds": 60})
+    session = FakeSession([FakeResponse(500), FakeResponse(500)])
+    client.session = lambda url: session
+    client.get("https://tx.example.org/fhir/a")
+    client.get("https://tx.example.org/fhir/b")
+    try:
+        client.get("https://tx.example.org/fhir/c")
+        assert False, "expected EndpointUnavailable"
+    except EndpointUnavailable:
+        pass
+    assert session.calls == 2
+    assert client.stats()["breaker_trips"] == 1
+    print("✅ Circuit breaker opened and short-circuited further calls")
+
+def test_throttled_trial_releases_breaker():
+    """A half-open trial answered with a throttled response ends the trial instead of wedging the breaker"""
+    client = TerminologyClient({"requests-per-second": 100, "max-retries": 0, "throttle-retries": 0,
+                                "breaker-threshold": 1, "breaker-reset-seconds": 0.05})
+    session = FakeSession([FakeResponse(500), FakeResponse(429, headers={"Retry-After": "0"}), FakeResponse(200)])
+    client.session = lambda url: session
+    client.get("https://tx.example.org/fhir/a")
+    time.sleep(0.06)
+    assert client.get("https://tx.example.org/fhir/b").status_code == 429
+    time.sleep(0.06)
+    assert client.get("https://tx.example.org/fhir/c").status_code == 200
+    assert session.calls == 3
+    print("✅ Throttled trial request released the circuit breaker")
+
+def test_bare_503_counts_as_failure():
+    """A 503 without Retry-After isn't waited out as throttling; it trips the breaker like any 5xx"""
+    client = TerminologyClient({"requests-per-second": 100, "max-retries": 0, "throttle-retries": 3,
+                                "breaker-threshold": 2, "breaker-reset-seconds": 60})
+    session = FakeSession([FakeResponse(503), FakeResponse(503)])
+    client.session = lambda url: session
+    assert client.get("https://tx.example.org/fhir/a").status_code == 503
+    assert client.get("https://tx.example.org/fhir/b").status_code == 503
+    assert session.calls == 2
+    assert client.throttled == 0
+    try:
+        client.get("https://tx.example.org/fhir/c")
+        assert False, "expected EndpointUnavailable"
+    except EndpointUnavailable:
+        pass
+    print("✅ 503 without Retry-After counted as a breaker failure")
+
+def test_server_errors_do_not_raise_rate():
+    """5xx responses leave the rate alone; only successful responses grow it"""
+    client = TerminologyClient({"requests-per-second": 10, "max-requests-per-second": 100, "max-retries": 0, "breaker-threshold": 100})
+    session = FakeSession([FakeResponse(500), FakeResponse(502), FakeResponse(200)])
+    client.session = lambda url: session
+    client.get("https://tx.example.org/fhir/a")
+    client.get("https://tx.example.org/fhir/b")
+    assert client.limiter("https://tx.example.org/fhir").rate == 10
+    client.get("https://tx.example.org/fhir/c")
+    assert client.limiter("https://tx.example.org/fhir").rate > 10
+    print("✅ Server errors don't raise the request rate")
+
+if __name__ == "__main__":
+    test_parse_retry_after()
+    test_rate_limiter_aimd()
+    test_client_retries_throttled_requests()
+    test_client_gives_up_after_throttle_retries()
+    test_client_retries_server_errors_with_backoff()
+    test_circuit_breaker_short_circuits()
+    test_throttled_trial_releases_breaker()
+    test_bare_503_counts_as_failure()
+    test_server_errors_do_not_raise_rate()
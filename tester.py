@@ -1,13 +1,22 @@
 import os
-import requests
-import os
-from os.path import isfile
 import json
-import glob
+import threading
 import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from urllib.parse import quote
-from fhirpathpy import evaluate
-from utils import get_config, split_node_path
+from fhirpath_eval import evaluate
+from utils import get_config, get_tx_client_options, split_node_path, endpoint_slug
+from requests import RequestException
+from txclient import get_client, EndpointUnavailable
+from txcache import get_cache
+from dependencies import resolve_dependencies
+from package_index import get_package_index
+from package_archive import list_json_files, path_exists, path_mtime, strip_archive_suffix
+from example_scan import get_example_scan
+from coding_extractor import get_coding_extractor
+from profile_analysis import analyse_profile, binding_options
+from package_cache_index import get_package_cache_index
+from local_terminology import get_local_provider, get_local_expander
 import logging
 
 ##
@@ -36,73 +45,34 @@ def get_valueset_title(vs_url, endpoint=None, local_packages=None, binding_name=
     # First try to find ValueSet in local packages
     if local_packages:
         for package_path in local_packages:
-            try:
-                # Look for ValueSet files in the package
-                package_dir = os.path.join(package_path, "package") if os.path.exists(os.path.join(package_path, "package")) else package_path
-                
-                if os.path.exists(package_dir):
-                    for root, dirs, files in os.walk(package_dir):
-                        for file in files:
-                            if file.startswith("ValueSet") and file.endswith(".json"):
-                                file_path = os.path.join(root, file)
-                                try:
-                                    with open(file_path, 'r') as f:
-                                        vs_data = json.load(f)
-                                    
-                                    # Check with both versioned and unversioned URLs
-                                    vs_file_url = vs_data.get("url", "")
-                                    if (vs_data.get("resourceType") == "ValueSet" and 
-                                        (vs_file_url == vs_url or vs_file_url == base_vs_url)):
-                                        # Found the ValueSet locally
-                                        title = vs_data.get("title")
-                                        if title:
-                                            logger.info(f"Found ValueSet title locally: {title}")
-                                            return clean_valueset_name(title)
-                                        # Fallback to name if no title
-                                        name = vs_data.get("name")
-                                        if name:
-                                            return clean_valueset_name(name)
-                                except Exception as e:
-                                    logger.debug(f"Error reading ValueSet file {file_path}: {e}")
-                                    continue
-            except Exception as e:
-                logger.debug(f"Error searching for ValueSets in {package_path}: {e}")
-                continue
+            entry = get_package_index(package_path).resolve(vs_url, "ValueSet")
+            if entry:
+                # Found the ValueSet locally
+                title = entry.get("title")
+                if title:
+                    logger.info(f"Found ValueSet title locally: {title}")
+                    return clean_valueset_name(title)
+                # Fallback to name if no title
+                name = entry.get("name")
+                if name:
+                    return clean_valueset_name(name)
     
     # If not found in local packages, search the entire FHIR package cache
     try:
         fhir_package_cache = get_config('config/config.json', key='fhir-package-cache')
-        if fhir_package_cache and os.path.exists(fhir_package_cache):
-            logger.info(f"Searching FHIR package cache for ValueSet: {vs_url}")
-            for package_dir in os.listdir(fhir_package_cache):
-                package_path = os.path.join(fhir_package_cache, package_dir)
-                if os.path.isdir(package_path):
-                    package_subdir = os.path.join(package_path, "package")
-                    if os.path.exists(package_subdir):
-                        for file in os.listdir(package_subdir):
-                            if file.startswith("ValueSet") and file.endswith(".json"):
-                                file_path = os.path.join(package_subdir, file)
-                                try:
-                                    with open(file_path, 'r') as f:
-                                        vs_data = json.load(f)
-                                    
-                                    # Check with both versioned and unversioned URLs
-                                    vs_file_url = vs_data.get("url", "")
-                                    if (vs_data.get("resourceType") == "ValueSet" and 
-                                        (vs_file_url == vs_url or vs_file_url == base_vs_url)):
-                                        # Found the ValueSet in cache
-                                        title = vs_data.get("title")
-                                        if title:
-                                            logger.info(f"Found ValueSet title in cache: {title}")
-                                            return clean_valueset_name(title)
-                                        # Fallback to name if no title
-                                        name = vs_data.get("name")
-                                        if name:
-                                            logger.info(f"Found ValueSet name in cache: {name}")
-                                            return clean_valueset_name(name)
-                                except Exception as e:
-                                    logger.debug(f"Error reading ValueSet file {file_path}: {e}")
-                                    continue
+        cache_index = get_package_cache_index(fhir_package_cache)
+        if cache_index:
+            # Prefer a copy with a title, then one with a name
+            matches = sorted(cache_index.find(vs_url, "ValueSet"), key=lambda match: (not match["title"], not match["name"]))
+            if matches:
+                title = matches[0]["title"]
+                if title:
+                    logger.info(f"Found ValueSet title in cache: {title}")
+                    return clean_valueset_name(title)
+                name = matches[0]["name"]
+                if name:
+                    logger.info(f"Found ValueSet name in cache: {name}")
+                    return clean_valueset_name(name)
     except Exception as e:
         logger.debug(f"Error searching FHIR package cache: {e}")
     
@@ -111,7 +81,7 @@ def get_valueset_title(vs_url, endpoint=None, local_packages=None, binding_name=
         try:
             # Try to fetch ValueSet from terminology server
             headers = {'Accept': 'application/fhir+json'}
-            response = requests.get(f"{endpoint}/ValueSet?url={vs_url}", headers=headers, timeout=10)
+            response = get_client().get(f"{endpoint}/ValueSet?url={vs_url}", headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -161,15 +131,28 @@ def get_valueset_expansion_count(vs_url, endpoint=None):
     Returns:
         int: Number of concepts in the expansion, or None if expansion failed
     """
+    # ValueSets with simple composes over local CodeSystems are expanded without the server
+    expander = get_local_expander()
+    members = expander.expand(vs_url) if expander else None
+    if members is not None:
+        logger.debug(f"ValueSet {vs_url} expanded locally: {len(members)}")
+        return len(members)
+
     if not endpoint:
         return None
-        
+
+    cache = get_cache()
+    if cache:
+        stored = cache.get(endpoint, VS_EXPAND, vs_url)
+        if stored is not None:
+            return stored['total']
+
     def try_expand(url):
         """Helper function to try expanding a single URL"""
         try:
             headers = {'Accept': 'application/fhir+json'}
             expand_url = f"{endpoint}/ValueSet/$expand?url={quote(url)}&count=0"
-            response = requests.get(expand_url, headers=headers, timeout=30)
+            response = get_client().get(expand_url, headers=headers)
             
             if response.status_code == 200:
                 data = response.json()
@@ -204,16 +187,17 @@ def get_valueset_expansion_count(vs_url, endpoint=None):
     
     # First try the original URL
     result = try_expand(vs_url)
-    if result is not None:
-        return result
-    
+
     # If failed and URL contains version (|), try without version
-    if '|' in vs_url:
+    if result is None and '|' in vs_url:
         unversioned_url = vs_url.split('|')[0]
         logger.debug(f"Retrying expansion without version: {unversioned_url}")
         result = try_expand(unversioned_url)
-        if result is not None:
-            return result
+
+    if result is not None:
+        if cache:
+            cache.put(endpoint, VS_EXPAND, vs_url, result={'total': result})
+        return result
     
     # If all attempts failed, log warning and return None
     logger.warning(f"Failed to expand ValueSet {vs_url} (tried versioned and unversioned)")
@@ -221,6 +205,11 @@ def get_valueset_expansion_count(vs_url, endpoint=None):
 
 logger = logging.getLogger(__name__)
 _validate_code_cache = {}
+# Package content parsed once per run and shared across terminology servers
+_ig_bindings_cache = {}
+_parse_lock = threading.Lock()
+CS_VALIDATE_CODE = 'CodeSystem/$validate-code'
+VS_EXPAND = 'ValueSet/$expand'
 SKIP_DIRS = ["assets", "temp", "templates"]
 EXTS = ["json"]
 
@@ -231,181 +220,44 @@ logger = logging.getLogger(__name__)
 ##    return valuesets for that category in the Structure Defn
 ##
 def process_binding(category,profile,value_sets):
-    with open(profile) as f:
-       data = json.load(f)
-    if data and data["resourceType"] == "StructureDefinition":         
-        snapshot = evaluate(data,f"{category}.element") 
-        # Ensure snapshot is iterable
-        if not isinstance(snapshot, (list, tuple)):
-            snapshot = [snapshot] if snapshot is not None else []
-        for el in snapshot:
-            # Ensure el is a dict before checking for keys
-            if isinstance(el, dict):
-                vs_canonical = ""
-                if "binding" in el:              
-                    if "valueSet" in el["binding"]:
-                        vs = el["binding"]["valueSet"]
-                        if vs != None:                                  
-                            value_sets.append(vs)             
+    analysis = analyse_profile(profile)
+    if analysis:
+        for binding in analysis.all_bindings:
+            if binding.source == "binding" and category in binding.views:
+                value_sets.append(binding.valueSet)
     return value_sets
 
+def _binding_report_row(analysis, binding, require_must_support):
+    """A binding report row for one selected binding, or None if it is filtered out"""
+    vs = binding.valueSet
+    # Additional filter for Australian content when MustSupport is not required
+    if not require_must_support:
+        # Skip international HL7 content, but allow AU-specific content
+        if ('hl7.org/fhir' in vs or 'terminology.hl7.org/' in vs) and 'terminology.hl7.org.au' not in vs:
+            return None
+    # Extract ValueSet name from URL (last part after /)
+    vs_name = vs.split('/')[-1] if '/' in vs else vs
+    return {
+        'valueset_name': vs_name,
+        'valueset_url': vs,
+        'binding_name': binding.bindingName,  # Only main bindings carry a binding name
+        'profile_name': analysis.name,
+        'profile_title': analysis.title,
+        'profile_url': analysis.url
+    }
+
 ##
 ## process_binding_with_profile: interogate element binding and return both valueset and profile info
 ##    return list of dicts with valueset and profile information
 ##
 def process_binding_with_profile(category, profile, binding_results, config_options):
-    with open(profile) as f:
-        data = json.load(f)
-    if data and data["resourceType"] == "StructureDefinition":
-        profile_name = data.get("name", "Unknown Profile")
-        profile_title = data.get("title", profile_name)  # Use title if available, fallback to name
-        profile_url = data.get("url", "Unknown URL")
-        
-        # Get configuration options with defaults
-        require_must_support = config_options.get("require-must-support", True)
-        minimum_binding_strengths = config_options.get("minimum-binding-strength", ["required", "extensible", "preferred"])
-        
-        snapshot = evaluate(data, f"{category}.element") 
-        # Ensure snapshot is iterable
-        if not isinstance(snapshot, (list, tuple)):
-            snapshot = [snapshot] if snapshot is not None else []
-        for el in snapshot:
-            # Ensure el is a dict before checking for keys
-            if isinstance(el, dict):
-                # Check if element is MustSupport (if required by config)
-                must_support = el.get("mustSupport", False)
-                
-                # Apply MustSupport filter based on configuration
-                if (not require_must_support or must_support):
-                    # Process main binding
-                    if "binding" in el and "valueSet" in el["binding"]:
-                        vs = el["binding"]["valueSet"]
-                        binding_strength = el["binding"].get("strength", "")
-                        
-                        # Extract binding name from extension if available
-                        binding_name = None
-                        if "extension" in el["binding"]:
-                            binding_extensions = el["binding"]["extension"]
-                            if not isinstance(binding_extensions, (list, tuple)):
-                                binding_extensions = [binding_extensions] if binding_extensions is not None else []
-                            
-                            for ext in binding_extensions:
-                                if (isinstance(ext, dict) and 
-                                    ext.get("url") == "http://hl7.org/fhir/StructureDefinition/elementdefinition-bindingName" and
-                                    "valueString" in ext):
-                                    binding_name = ext["valueString"]
-                                    break
-                        
-                        # Only include if binding strength meets minimum requirements
-                        if (vs is not None and 
-                            binding_strength in minimum_binding_strengths):
-                            
-                            # Additional filter for Australian content when MustSupport is not required
-                            include_valueset = True
-                            if not require_must_support:
-                                # Skip international HL7 content, but allow AU-specific content
-                                if ('hl7.org/fhir' in vs or 'terminology.hl7.org/' in vs) and 'terminology.hl7.org.au' not in vs:
-                                    include_valueset = False
-                            
-                            if include_valueset:
-                                # Extract ValueSet name from URL (last part after /)
-                                vs_name = vs.split('/')[-1] if '/' in vs else vs
-                                binding_results.append({
-                                    'valueset_name': vs_name,
-                                    'valueset_url': vs,
-                                    'binding_name': binding_name,  # Add binding name
-                                    'profile_name': profile_name,
-                                    'profile_title': profile_title,
-                                    'profile_url': profile_url
-                                })
-                    
-                    # Process additional bindings from extensions
-                    if "binding" in el and "extension" in el["binding"]:
-                        binding_extensions = el["binding"]["extension"]
-                        # Ensure binding_extensions is iterable
-                        if not isinstance(binding_extensions, (list, tuple)):
-                            binding_extensions = [binding_extensions] if binding_extensions is not None else []
-                        
-                        for binding_ext in binding_extensions:
-                            if (isinstance(binding_ext, dict) and 
-                                binding_ext.get("url") == "http://hl7.org/fhir/tools/StructureDefinition/additional-binding" and
-                                "extension" in binding_ext):
-                                
-                                # Parse the nested extensions to extract valueSet and purpose
-                                vs_url = None
-                                purpose = None
-                                
-                                nested_extensions = binding_ext["extension"]
-                                if not isinstance(nested_extensions, (list, tuple)):
-                                    nested_extensions = [nested_extensions] if nested_extensions is not None else []
-                                
-                                for nested_ext in nested_extensions:
-                                    if isinstance(nested_ext, dict):
-                                        if nested_ext.get("url") == "valueSet":
-                                            vs_url = nested_ext.get("valueCanonical")
-                                        elif nested_ext.get("url") == "purpose":
-                                            purpose = nested_ext.get("valueCode")
-                                
-                                # If we found a ValueSet in the additional binding
-                                if vs_url:
-                                    # Use purpose as binding strength if available, otherwise use main binding strength
-                                    binding_strength = purpose if purpose in minimum_binding_strengths else el["binding"].get("strength", "")
-                                    
-                                    # Only include if binding strength meets minimum requirements
-                                    if binding_strength in minimum_binding_strengths:
-                                        # Additional filter for Australian content when MustSupport is not required
-                                        include_valueset = True
-                                        if not require_must_support:
-                                            # Skip international HL7 content, but allow AU-specific content
-                                            if ('hl7.org/fhir' in vs_url or 'terminology.hl7.org/' in vs_url) and 'terminology.hl7.org.au' not in vs_url:
-                                                include_valueset = False
-                                        
-                                        if include_valueset:
-                                            # Extract ValueSet name from URL (last part after /)
-                                            vs_name = vs_url.split('/')[-1] if '/' in vs_url else vs_url
-                                            binding_results.append({
-                                                'valueset_name': vs_name,
-                                                'valueset_url': vs_url,
-                                                'binding_name': None,  # No binding name available for additional bindings
-                                                'profile_name': profile_name,
-                                                'profile_title': profile_title,
-                                                'profile_url': profile_url
-                                            })
-                    
-                    # Process legacy additional bindings (for backward compatibility)
-                    if "binding" in el and "additionalBinding" in el["binding"]:
-                        additional_bindings = el["binding"]["additionalBinding"]
-                        # Ensure additional_bindings is iterable
-                        if not isinstance(additional_bindings, (list, tuple)):
-                            additional_bindings = [additional_bindings] if additional_bindings is not None else []
-                        
-                        for add_binding in additional_bindings:
-                            if isinstance(add_binding, dict) and "valueSet" in add_binding:
-                                vs = add_binding["valueSet"]
-                                binding_strength = add_binding.get("strength", "")
-                                
-                                # Only include if binding strength meets minimum requirements
-                                if (vs is not None and 
-                                    binding_strength in minimum_binding_strengths):
-                                    
-                                    # Additional filter for Australian content when MustSupport is not required
-                                    include_valueset = True
-                                    if not require_must_support:
-                                        # Skip international HL7 content, but allow AU-specific content
-                                        if ('hl7.org/fhir' in vs or 'terminology.hl7.org/' in vs) and 'terminology.hl7.org.au' not in vs:
-                                            include_valueset = False
-                                    
-                                    if include_valueset:
-                                        # Extract ValueSet name from URL (last part after /)
-                                        vs_name = vs.split('/')[-1] if '/' in vs else vs
-                                        binding_results.append({
-                                            'valueset_name': vs_name,
-                                            'valueset_url': vs,
-                                            'binding_name': None,  # No binding name available for legacy additional bindings
-                                            'profile_name': profile_name,
-                                            'profile_title': profile_title,
-                                            'profile_url': profile_url
-                                        })
+    analysis = analyse_profile(profile)
+    if analysis:
+        require_must_support, _ = binding_options(config_options)
+        for binding, _ in analysis.bindings(config_options, view=category):
+            row = _binding_report_row(analysis, binding, require_must_support)
+            if row:
+                binding_results.append(row)
     return binding_results
 
 def process_profile(profile,value_sets):
@@ -414,73 +266,49 @@ def process_profile(profile,value_sets):
     return value_sets
 
 def process_profile_bindings(profile, binding_results, config_options):
-    """Process a profile and collect ValueSet binding information from both differential and snapshot views"""
-    # Process differential view (profile customizations)
-    binding_results = process_binding_with_profile("differential", profile, binding_results, config_options)
-    
-    # Also process snapshot view (complete computed view)
-    binding_results = process_binding_with_profile("snapshot", profile, binding_results, config_options)
-    
+    """
+    Process a profile and collect ValueSet binding information. The differential and
+    snapshot views are merged by element id in the shared profile analysis, so each
+    binding is reported once.
+    """
+    analysis = analyse_profile(profile)
+    if analysis:
+        require_must_support, _ = binding_options(config_options)
+        for binding, _ in analysis.bindings(config_options):
+            row = _binding_report_row(analysis, binding, require_must_support)
+            if row:
+                binding_results.append(row)
     return binding_results
 
-def process_dependencies_for_valuesets(npm_path_list, binding_results, config_options, config_file):
+def process_dependencies_for_valuesets(npm_path_list, binding_results, config_options, config_file, max_workers=8):
     """
-    Process package dependencies to find additional ValueSets that meet binding strength criteria
+    Process the transitive dependencies of the packages to find additional ValueSets that
+    meet binding strength criteria. Each dependency is resolved to one cached package and
+    the packages are scanned concurrently; results come back in dependency order.
     """
+    fhir_cache_path = get_config(config_file, key="fhir-package-cache")
+    if not fhir_cache_path:
+        logger.warning("FHIR package cache path not configured")
+        return []
+
+    dep_package_paths = []
+    for package in resolve_dependencies(npm_path_list, fhir_cache_path):
+        dep_package_path = os.path.join(package["path"], "package")
+        if path_exists(dep_package_path):
+            logger.info(f"Processing dependency: {package['name']}#{package['version']}")
+            dep_package_paths.append(dep_package_path)
+
+    def scan(dep_package_path):
+        try:
+            return process_ig_bindings(dep_package_path, [], config_options)
+        except Exception as e:
+            logger.error(f"Error processing dependency {dep_package_path}: {e}")
+            return []
+
     dependency_binding_results = []
-    processed_packages = set()
-    
-    for npm_path in npm_path_list:
-        package_json_path = os.path.join(npm_path, "package", "package.json")
-        if os.path.exists(package_json_path):
-            try:
-                with open(package_json_path, 'r') as f:
-                    package_data = json.load(f)
-                
-                dependencies = package_data.get("dependencies", {})
-                fhir_cache_path = get_config(config_file, key="fhir-package-cache")
-                
-                if not fhir_cache_path:
-                    logger.warning("FHIR package cache path not configured")
-                    continue
-                
-                # Process each dependency
-                for dep_name, dep_version in dependencies.items():
-                    if dep_name in processed_packages:
-                        continue
-                    processed_packages.add(dep_name)
-                    
-                    # Look for the dependency in the FHIR cache
-                    dep_pattern = f"{dep_name}#{dep_version}"
-                    dep_cache_path = os.path.join(fhir_cache_path, dep_pattern)
-                    
-                    # Handle version aliases
-                    if not os.path.exists(dep_cache_path):
-                        import glob
-                        matching_deps = glob.glob(os.path.join(fhir_cache_path, f"{dep_name}#*"))
-                        if dep_version in ['dev', 'current', 'cibuild'] and matching_deps:
-                            for dep_path in matching_deps:
-                                if dep_path.endswith(f"#{dep_version}"):
-                                    dep_cache_path = dep_path
-                                    break
-                        
-                        if not os.path.exists(dep_cache_path) and matching_deps:
-                            # Use most recent version
-                            matching_deps.sort(key=os.path.getmtime, reverse=True)
-                            dep_cache_path = matching_deps[0]
-                    
-                    if os.path.exists(dep_cache_path):
-                        logger.info(f"Processing dependency: {dep_name}")
-                        # Process the dependency package for bindings
-                        dep_package_path = os.path.join(dep_cache_path, "package")
-                        if os.path.exists(dep_package_path):
-                            dependency_binding_results = process_ig_bindings(dep_package_path, dependency_binding_results, config_options)
-                    else:
-                        logger.warning(f"Dependency package not found in cache: {dep_pattern}")
-                        
-            except Exception as e:
-                logger.error(f"Error processing dependencies for {npm_path}: {e}")
-    
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(dep_package_paths) or 1))) as executor:
+        for results in executor.map(scan, dep_package_paths):
+            dependency_binding_results.extend(results)
     return dependency_binding_results
 
 ##
@@ -503,16 +331,28 @@ def process_ig(ig_folder,value_sets):
 ## process_ig_bindings: parse the ig folder and find all FHIR Profiles 
 ##   return valueset bindings with profile information for that IG
 ##
+def get_ig_bindings(ig_folder, config_options):
+    """
+    process_ig_bindings for one IG, parsed once per run and shared by every
+    terminology server being checked (the bindings don't depend on the server)
+    """
+    # Key on the profile files' mtimes too, so edited packages are re-parsed
+    profiles = [(entry["path"], path_mtime(entry["path"]))
+                for entry in get_package_index(ig_folder).of_type("StructureDefinition")]
+    cache_key = (os.path.abspath(ig_folder), tuple(sorted(profiles)), json.dumps(config_options, sort_keys=True, default=str))
+    with _parse_lock:
+        if cache_key not in _ig_bindings_cache:
+            _ig_bindings_cache[cache_key] = process_ig_bindings(ig_folder, [], config_options)
+        return list(_ig_bindings_cache[cache_key])
+
 def process_ig_bindings(ig_folder, binding_results, config_options):
-    # Check if the folder exists
-    if os.path.exists(ig_folder):
-        # Iterate through files in the folder
-        for root, dirs, files in os.walk(ig_folder):
-            for file in files:
-                if file.startswith("StructureDefinition") and file.endswith(".json"):
-                    logger.info(f'...Processing bindings in IG Folder: {ig_folder}, Profile file: {file}')
-                    file_path = os.path.join(root, file)
-                    binding_results = process_profile_bindings(file_path, binding_results, config_options)
+    # Check if the folder (or package tarball) exists
+    if path_exists(ig_folder):
+        # Iterate through the profiles in the package's canonical index
+        for entry in get_package_index(ig_folder).of_type("StructureDefinition"):
+            file_path = entry["path"]
+            logger.info(f'...Processing bindings in IG Folder: {ig_folder}, Profile file: {os.path.basename(file_path)}')
+            binding_results = process_profile_bindings(file_path, binding_results, config_options)
     return binding_results
 
 ##
@@ -532,20 +372,12 @@ def get_all_files(root, exclude=SKIP_DIRS):
 ## get_json_files: find all json files 
 ##
 def get_json_files(root,filter=None):
-    if filter == None:
-        pattern = "%s/*.json" % (root)
-    else:
-        pattern = "%s/%s*.json" % (root,filter)
-    for item in glob.glob(pattern):
-        if isfile(item):
-            yield item
+    # root may be a folder inside a package tarball
+    yield from list_json_files(root, prefix=filter or '')
 
 
 def get_json_files_recursive(root):
-    pattern = os.path.join(root, "**", "*.json")
-    for item in glob.glob(pattern, recursive=True):
-        if isfile(item):
-            yield item
+    yield from list_json_files(root, recursive=True)
 
 
 def get_additional_example_dirs(config_file):
@@ -565,33 +397,15 @@ def get_additional_example_dirs(config_file):
     return dirs
 
 
-def validate_code_with_fhirpath(resource, fhirpath_expression, endpoint, cs_excluded, file, seen_validations=None):
-    results = []
-    codes = evaluate(resource, fhirpath_expression)
-    # Ensure codes is iterable
-    if not isinstance(codes, (list, tuple)):
-        codes = [codes] if codes is not None else []
-    for code_info in codes:
-        if isinstance(code_info, dict):
-            # This is a Coding object with system and code
-            system = code_info.get('system')
-            code = code_info.get('code')
-            if system and code and isinstance(system, str) and isinstance(code, str) and system.strip() and code.strip():
-                if seen_validations is not None:
-                    key = (system, code)
-                    if key in seen_validations:
-                        continue
-                    seen_validations.add(key)
-                result = validate_example_code(endpoint, cs_excluded, file, system, code)
-                results.append(result)
-            else:
-                logging.debug(f'Invalid system or code in coding: system={system}, code={code}')
-        elif isinstance(code_info, str):
-            # Skip string values - these are usually status codes or other non-coded elements
-            logging.debug(f'Skipping string value from FHIRPath expression "{fhirpath_expression}": {code_info}')
-        else:
-            logging.debug(f'Unexpected type for code_info from expression "{fhirpath_expression}": {type(code_info)} - {code_info}')
-    return results
+def get_example_files(npm_path_list, config_file):
+    """Every example file the checks read: each IG's package/example folder, then the additional-examples folders"""
+    files = []
+    for ig_folder in npm_path_list:
+        files.extend(get_json_files(os.path.join(ig_folder, "package", "example")))
+    for extra_dir in get_additional_example_dirs(config_file):
+        if os.path.exists(extra_dir):
+            files.extend(get_json_files_recursive(extra_dir))
+    return files
 
 
 def validate_example_code(endpoint, cs_excluded, file, system, code):
@@ -600,23 +414,92 @@ def validate_example_code(endpoint, cs_excluded, file, system, code):
      
        Return: test_result dict , code and error
     """
-    cache_key = (endpoint, system, code)
-    if cache_key in _validate_code_cache:
-        cached = _validate_code_cache[cache_key]
-        result = cached.copy()
-        result['file'] = split_node_path(file)
-        return result
+    cached = cached_example_result(endpoint, cs_excluded, file, system, code)
+    if cached is not None:
+        return cached
+
+    # Complete CodeSystems from the loaded packages are checked without the server
+    provider = get_local_provider()
+    valid = provider.validate(system, code) if provider else None
+    if valid is not None:
+        test_result = build_example_result(cs_excluded, file, system, code, 200,
+                                           {"parameter": [{"name": "result", "valueBoolean": valid}]})
+        if test_result['result'] == 'FAIL':
+            test_result['reason'] = f"Not a valid code in local CodeSystem (version {provider.version(system)})"
+        _validate_code_cache[(endpoint, system, code)] = test_result.copy()
+        return test_result
 
-    cmd = f'{endpoint}/CodeSystem/$validate-code?url='
-    query = cmd + quote(system, safe='') + f'&code={code}'
     headers = {'Accept': 'application/fhir+json'}
-    response = requests.get(query, headers=headers)
-    data = response.json()
+    try:
+        response = get_client().get(f'{endpoint}/{validate_code_query(system, code)}', headers=headers)
+    except (EndpointUnavailable, RequestException) as e:
+        logger.debug(f"Unable to validate {system}|{code} against {endpoint}: {e}")
+        return unavailable_example_result(cs_excluded, file, system, code, str(e))
+    try:
+        data = response.json()
+    except ValueError:
+        # Error pages (proxies, gateways) are often HTML rather than an OperationOutcome
+        data = {}
+    return store_example_result(endpoint, cs_excluded, file, system, code, response.status_code, data)
+
+
+def unavailable_example_result(cs_excluded, file, system, code, reason):
+    """Result row for a code that couldn't be checked because the server was unreachable"""
+    test_result = build_example_result(cs_excluded, file, system, code, 0, {})
+    if test_result['result'] == 'UNAVAILABLE':
+        test_result['reason'] = reason
+    return test_result
+
+
+def cached_example_result(endpoint, cs_excluded, file, system, code):
+    """
+       Look up a previous CodeSystem/$validate-code answer, first in this run's
+       cache and then in the persistent cache. Return: test_result dict or None
+    """
+    cache_key = (endpoint, system, code)
+    if cache_key not in _validate_code_cache:
+        cache = get_cache()
+        stored = cache.get(endpoint, CS_VALIDATE_CODE, system, code=code) if cache else None
+        if stored is None:
+            return None
+        _validate_code_cache[cache_key] = build_example_result(cs_excluded, file, system, code, stored['status_code'], stored['data'])
+    result = _validate_code_cache[cache_key].copy()
+    result['file'] = split_node_path(file)
+    return result
+
+
+def store_example_result(endpoint, cs_excluded, file, system, code, status_code, data):
+    """
+       Build the result row for a CodeSystem/$validate-code answer and remember it.
+       Only definitive (HTTP 200) answers go into the persistent cache; exclusions
+       are applied when the row is built, so config changes take effect on reruns.
+    """
+    test_result = build_example_result(cs_excluded, file, system, code, status_code, data)
+    if test_result['result'] == 'UNAVAILABLE':
+        # Ask again later in the run rather than remembering a transient failure
+        return test_result
+    _validate_code_cache[(endpoint, system, code)] = test_result.copy()
+    cache = get_cache()
+    if cache and status_code == 200:
+        cache.put(endpoint, CS_VALIDATE_CODE, system, code=code, result={'status_code': status_code, 'data': data})
+    return test_result
+
+
+def validate_code_query(system, code):
+    """Relative CodeSystem/$validate-code query for a (system, code) pair"""
+    return 'CodeSystem/$validate-code?url=' + quote(system, safe='') + f'&code={code}'
+
+
+def build_example_result(cs_excluded, file, system, code, status_code, data):
+    """
+       Interpret a CodeSystem/$validate-code response (status and Parameters body)
+       as an example check result row, applying the codesystem-excluded config
+    """
     test_result = {
         'file': split_node_path(file),
         'code': code,
         'system': system,
-        'status_code': response.status_code,
+        'status_code': status_code,
         'reason': ''
     }
     excluded = False
@@ -627,7 +510,7 @@ def validate_example_code(endpoint, cs_excluded, file, system, code):
             excluded = True
             break
     if not excluded:
-        if response.status_code == 200:
+        if status_code == 200:
             result_params = evaluate(data, "parameter.where(name = 'result').valueBoolean")
             # Ensure result_params is a list and has elements
             if isinstance(result_params, (list, tuple)) and len(result_params) > 0:
@@ -639,125 +522,169 @@ def validate_example_code(endpoint, cs_excluded, file, system, code):
             else:
                 test_result['result'] = 'FAIL'
                 test_result['reason'] = 'Unable to parse validation result'
+        elif status_code == 0 or status_code == 429 or status_code >= 500:
+            # The server couldn't answer; that says nothing about the code itself
+            test_result['result'] = 'UNAVAILABLE'
+            test_result['reason'] = f'http status: {status_code}' if status_code else 'Terminology server unavailable'
         else:
             test_result['result'] = 'FAIL'
-            test_result['reason'] = f'http status: {response.status_code}'
-    _validate_code_cache[cache_key] = test_result.copy()
+            test_result['reason'] = f'http status: {status_code}'
     return test_result
 
 
+_batch_support_cache = {}
+
+def server_supports_batch(endpoint):
+    """
+       Check the server CapabilityStatement advertises the 'batch' system interaction.
+       The answer is remembered per endpoint for the rest of the run.
+    """
+    if endpoint in _batch_support_cache:
+        return _batch_support_cache[endpoint]
+    supported = False
+    try:
+        headers = {'Accept': 'application/fhir+json'}
+        response = get_client().get(f'{endpoint}/metadata', headers=headers)
+        if response.status_code == 200:
+            interactions = evaluate(response.json(), "rest.interaction.code")
+            supported = isinstance(interactions, (list, tuple)) and 'batch' in interactions
+    except Exception as e:
+        logger.debug(f"Unable to read batch support from {endpoint}/metadata: {e}")
+    if not supported:
+        logger.info(f"{endpoint} does not advertise batch support, using single $validate-code requests")
+    _batch_support_cache[endpoint] = supported
+    return supported
+
+
+def validate_example_codes_batch(endpoint, cs_excluded, tasks):
+    """
+       Validate a list of (file, system, code) tasks with a single FHIR batch Bundle
+       POSTed to the endpoint root. Each response entry is matched back to its task
+       by position. If the batch as a whole fails, each task is sent on its own.
+
+       Return: list of test_result dicts in the same order as tasks
+    """
+    bundle = {
+        "resourceType": "Bundle",
+        "type": "batch",
+        "entry": [
+            {"request": {"method": "GET", "url": validate_code_query(system, code)}}
+            for _, system, code in tasks
+        ]
+    }
+    headers = {
+        'Accept': 'application/fhir+json',
+        'Content-Type': 'application/fhir+json'
+    }
+    entries = None
+    try:
+        # A batch carries many operations, so give it longer than a single request
+        response = get_client().post(endpoint, headers=headers, json=bundle, timeout=get_client().timeout * 4, idempotent=True)
+        if response.status_code == 200:
+            data = response.json()
+            if data.get('resourceType') == 'Bundle' and len(data.get('entry', [])) == len(tasks):
+                entries = data['entry']
+        if entries is None:
+            logger.warning(f"Batch $validate-code to {endpoint} failed (http status: {response.status_code}), retrying {len(tasks)} codes individually")
+    except EndpointUnavailable as e:
+        return [unavailable_example_result(cs_excluded, file, system, code, str(e)) for file, system, code in tasks]
+    except Exception as e:
+        logger.warning(f"Batch $validate-code to {endpoint} failed ({e}), retrying {len(tasks)} codes individually")
+    if entries is None:
+        return [validate_example_code(endpoint, cs_excluded, file, system, code) for file, system, code in tasks]
+
+    results = []
+    for (file, system, code), entry in zip(tasks, entries):
+        # entry.response.status is e.g. "200 OK"
+        status = str(entry.get('response', {}).get('status', '0')).split(' ')[0]
+        status_code = int(status) if status.isdigit() else 0
+        results.append(store_example_result(endpoint, cs_excluded, file, system, code, status_code, entry.get('resource', {})))
+    return results
+
+
 ##
 ## search_json_file: search a json file for FHIR coding elements
 ##
 
-def search_json_file(endpoint, cs_excluded, file):
-    with open(file, 'r') as f:
-        resource = json.load(f)
-
-    # Base FHIRPath expressions for individual resources
-    base_expressions = [
-        "category.coding",
-        "code.coding",
-        "coding",
-        "type.coding",
-        "status",
-        "priority.coding",
-        "severity.coding",
-        "clinicalStatus.coding",
-        "verificationStatus.coding",
-        "intent.coding",
-        "use.coding",
-        "action.coding",
-        "outcome.coding",
-        "subType.coding",
-        "reasonCode.coding",
-        "route.coding",
-        "vaccineCode.coding",
-        "medicationCodeableConcept.coding",
-        "bodySite.coding",
-        "relationship.coding",
-        "sex.coding",
-        "morphology.coding",
-        "location.coding",
-        "format.coding",
-        "class.coding",
-        "modality.coding",
-        "jurisdiction.coding",
-        "topic.coding",
-        "contentType.coding",
-        "connectionType.coding",
-        "operationalStatus.coding",
-        "color.coding",
-        "measurementPeriod.coding",
-        "doseQuantity.coding",
-        "substanceCodeableConcept.coding",
-        "valueCodeableConcept.coding",
-        "valueCoding",
-        "valueQuantity.coding",
-        "ingredient.itemCodeableConcept.coding",
-        "dosageInstruction.route.coding",
-        "ingredient.quantity",
-        "ingredient.quantity.numerator",
-        "ingredient.quantity.denominator"
-    ]
-    
-    # Check if this is a Bundle resource and add Bundle-specific expressions
-    fhirpath_expressions = base_expressions.copy()
-    if resource.get("resourceType") == "Bundle":
-        # Add Bundle-specific expressions that traverse into entries
-        bundle_expressions = [
-            "entry.resource.category.coding",
-            "entry.resource.code.coding", 
-            "entry.resource.coding",
-            "entry.resource.type.coding",
-            "entry.resource.status",
-            "entry.resource.priority.coding",
-            "entry.resource.severity.coding", 
-            "entry.resource.clinicalStatus.coding",
-            "entry.resource.verificationStatus.coding",
-            "entry.resource.intent.coding",
-            "entry.resource.use.coding",
-            "entry.resource.action.coding",
-            "entry.resource.outcome.coding",
-            "entry.resource.subType.coding",
-            "entry.resource.reasonCode.coding",
-            "entry.resource.route.coding",
-            "entry.resource.vaccineCode.coding",
-            "entry.resource.medicationCodeableConcept.coding",
-            "entry.resource.bodySite.coding",
-            "entry.resource.relationship.coding",
-            "entry.resource.sex.coding",
-            "entry.resource.morphology.coding",
-            "entry.resource.location.coding",
-            "entry.resource.format.coding",
-            "entry.resource.class.coding",
-            "entry.resource.modality.coding",
-            "entry.resource.jurisdiction.coding",
-            "entry.resource.topic.coding",
-            "entry.resource.contentType.coding",
-            "entry.resource.connectionType.coding",
-            "entry.resource.operationalStatus.coding",
-            "entry.resource.color.coding",
-            "entry.resource.measurementPeriod.coding",
-            "entry.resource.doseQuantity.coding",
-            "entry.resource.substanceCodeableConcept.coding",
-            "entry.resource.valueCodeableConcept.coding",
-            "entry.resource.valueCoding",
-            "entry.resource.valueQuantity.coding",
-            "entry.resource.ingredient.itemCodeableConcept.coding",
-            "entry.resource.dosageInstruction.route.coding",
-            "entry.resource.ingredient.quantity",
-            "entry.resource.ingredient.quantity.numerator",
-            "entry.resource.ingredient.quantity.denominator"
-        ]
-        fhirpath_expressions.extend(bundle_expressions)
+def extract_example_codings(resource):
+    """
+    Extract the unique (system, code) pairs from an example resource, in document
+    order, with a single walk of the resource (see coding_extractor.CodingExtractor).
+    """
+    return get_coding_extractor().codings(resource)
 
+
+def search_json_file(endpoint, cs_excluded, file):
     test_result_list = []
-    seen_validations = set()
-    for expression in fhirpath_expressions:
-        results = validate_code_with_fhirpath(resource, expression, endpoint, cs_excluded, file, seen_validations)
-        if results:
-            test_result_list.extend(results)
+    for system, code in load_example_codings(file):
+        test_result_list.append(validate_example_code(endpoint, cs_excluded, file, system, code))
+
+    return test_result_list
+
+
+def load_example_codings(file):
+    """
+    The (system, code) pairs in an example file. Each file is parsed once per run,
+    usually by the scan_examples process pool before the checks start; when several
+    terminology servers are checked they share the result.
+    """
+    return list(get_example_scan(file).codings)
+
+
+def validate_example_files(endpoint, cs_excluded, files, max_workers=1, batch_size=0):
+    """
+    Validate the codings found in a list of example files, with up to max_workers
+    $validate-code requests in flight at once.
+
+    Each distinct (system, code) pair is sent to the server once; the result rows are
+    returned in the order the codings were discovered (file order, then coding order)
+    so the HTML reports stay deterministic regardless of completion order.
+
+    With batch_size > 1, and a server that advertises batch support, uncached codes
+    are sent as FHIR batch Bundles of up to batch_size entries instead.
+    """
+    tasks = []
+    for file in files:
+        try:
+            codings = load_example_codings(file)
+        except Exception as e:
+            logger.warning(f"Unable to read example {file}: {e}")
+            continue
+        for system, code in codings:
+            tasks.append((file, system, code))
+
+    if max_workers is None or max_workers < 1:
+        max_workers = 1
+
+    first_seen = {}
+    for file, system, code in tasks:
+        first_seen.setdefault((system, code), (file, system, code))
+
+    use_batch = batch_size and batch_size > 1 and server_supports_batch(endpoint)
+
+    pending = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        if use_batch:
+            provider = get_local_provider()
+            uncached = [task for task in first_seen.values()
+                        if not (provider and provider.knows(task[1]))
+                        and cached_example_result(endpoint, cs_excluded, *task) is None]
+            for i in range(0, len(uncached), batch_size):
+                chunk = uncached[i:i + batch_size]
+                future = executor.submit(validate_example_codes_batch, endpoint, cs_excluded, chunk)
+                for position, (_, system, code) in enumerate(chunk):
+                    pending[(system, code)] = (future, position)
+        for key, (file, system, code) in first_seen.items():
+            if key not in pending:
+                pending[key] = (executor.submit(validate_example_code, endpoint, cs_excluded, file, system, code), None)
+
+        test_result_list = []
+        for file, system, code in tasks:
+            future, position = pending[(system, code)]
+            result = future.result() if position is None else future.result()[position]
+            result = result.copy()
+            result['file'] = split_node_path(file)
+            test_result_list.append(result)
 
     return test_result_list
 
@@ -769,7 +696,7 @@ def run_capability_test(endpoint):
     """
     query = f'{endpoint}/metadata'
     headers = {'Accept': 'application/fhir+json'}
-    response = requests.get(query, headers=headers)
+    response = get_client().get(query, headers=headers)
     if response.status_code == 200:
         data = response.json()
         server_type = evaluate(data, "instantiates[0]")
@@ -788,25 +715,26 @@ def run_capability_test(endpoint):
         return response.status_code   # I'm most likely offline
 
 
-def run_example_check(endpoint, testconf, npm_path_list, outdir):
+def run_example_check(endpoint, testconf, npm_path_list, outdir, summary=None):
     """
       Test that the IG example instance codes are in the terminology server
       Results are reported in per-IG html files to avoid overwrite across runs.
+      If a summary dict is passed, each (system, code) result is recorded in
+      summary['codes'] for the cross-server matrix.
     """
     cs_excluded = get_config(testconf, 'codesystem-excluded')
+    tx_options = get_tx_client_options(testconf)
+    max_workers = tx_options['max-concurrent-requests']
+    batch_size = tx_options['batch-size']
     overall_fail = False
 
     for ig_folder in npm_path_list:
-        ig_suffix = os.path.basename(ig_folder)
+        ig_suffix = strip_archive_suffix(os.path.basename(ig_folder))
         outfile = os.path.join(outdir, f'ExampleCodeSystemChecks-{ig_suffix}.html')
 
-        ig_results = []
         example_dir = os.path.join(ig_folder, "package", "example")
-
-        for ex in get_json_files(example_dir):
-            results = search_json_file(endpoint, cs_excluded, ex)
-            if results:
-                ig_results.extend(results)
+        ig_results = validate_example_files(endpoint, cs_excluded, get_json_files(example_dir), max_workers, batch_size)
+        record_code_results(summary, ig_results)
 
         # Output as HTML per IG
         header = ['file','code','system','result','reason']
@@ -826,11 +754,8 @@ def run_example_check(endpoint, testconf, npm_path_list, outdir):
             continue
         extra_suffix = os.path.basename(extra_dir)
         outfile = os.path.join(outdir, f'ExampleCodeSystemChecks-additional-{extra_suffix}.html')
-        extra_results = []
-        for ex in get_json_files_recursive(extra_dir):
-            results = search_json_file(endpoint, cs_excluded, ex)
-            if results:
-                extra_results.extend(results)
+        extra_results = validate_example_files(endpoint, cs_excluded, get_json_files_recursive(extra_dir), max_workers, batch_size)
+        record_code_results(summary, extra_results)
 
         header = ['file','code','system','result','reason']
         df_results = pd.DataFrame(extra_results, columns=header)
@@ -845,11 +770,22 @@ def run_example_check(endpoint, testconf, npm_path_list, outdir):
     return 1 if overall_fail else 0
 
 
-def run_valueset_binding_report(npm_path_list, outdir, config_file):
+def record_code_results(summary, results):
+    """Add example check rows to a cross-server summary as (system, code) -> result"""
+    if summary is None:
+        return
+    codes = summary.setdefault('codes', {})
+    for row in results:
+        codes[(row['system'], row['code'])] = row['result']
+
+
+def run_valueset_binding_report(npm_path_list, outdir, config_file, endpoint=None, summary=None):
     """
       Generate per-IG reports of ValueSet bindings from FHIR profiles.
       Each IG produces its own HTML with ValueSet and Profile information.
       Filtering based on configuration options for MustSupport and binding strength.
+      endpoint defaults to the one in the config's init section. If a summary dict
+      is passed, each ValueSet's expansion count is recorded in summary['valuesets'].
     """
     # Load configuration options with defaults
     try:
@@ -866,21 +802,22 @@ def run_valueset_binding_report(npm_path_list, outdir, config_file):
         }
 
     # Get endpoint for ValueSet title lookup
-    try:
-        endpoint_config = get_config(config_file, 'init')
-        endpoint = endpoint_config[0].get('endpoint') if endpoint_config else None
-    except:
-        endpoint = None
+    if endpoint is None:
+        try:
+            endpoint_config = get_config(config_file, 'init')
+            endpoint = endpoint_config[0].get('endpoint') if endpoint_config else None
+        except:
+            endpoint = None
 
     for ig_folder in npm_path_list:
-        ig_suffix = os.path.basename(ig_folder)
+        ig_suffix = strip_archive_suffix(os.path.basename(ig_folder))
         outfile = os.path.join(outdir, f'ValueSetBindings-{ig_suffix}.html')
 
         vs_title_cache = {}
         vs_expansion_cache = {}
 
         logger.info(f'Processing ValueSet bindings for IG folder: {ig_folder}')
-        ig_bindings = process_ig_bindings(ig_folder, [], config_options)
+        ig_bindings = get_ig_bindings(ig_folder, config_options)
 
         logger.info(f'Total bindings found for {ig_suffix}: {len(ig_bindings)}')
 
@@ -923,6 +860,8 @@ def run_valueset_binding_report(npm_path_list, outdir, config_file):
                     vs_expansion_cache[vs_url] = get_valueset_expansion_count(vs_url, endpoint)
                 expansion_count = vs_expansion_cache[vs_url]
                 expansion_display = str(expansion_count) if expansion_count is not None else "N/A"
+                if summary is not None:
+                    summary.setdefault('valuesets', {})[vs_url] = {'title': vs_title, 'expansion': expansion_display}
 
                 # Create ValueSet link using title
                 vs_link = f'<a href="{vs_url}" target="_blank">{vs_title}</a>'
@@ -1066,9 +1005,7 @@ def run_valueset_binding_report(npm_path_list, outdir, config_file):
                 ig_id = 'unknown'
             
             # Clean server URL for filename (remove protocol, replace special chars)
-            server_name = 'no-server'
-            if endpoint:
-                server_name = endpoint.replace('http://', '').replace('https://', '').replace('/', '_').replace(':', '_')
+            server_name = endpoint_slug(endpoint) if endpoint else 'no-server'
             
             tsv_filename = f'ValueSetBindings-{ig_id}-{server_name}.tsv'
             tsv_outfile = os.path.join(outdir, tsv_filename)
@@ -1166,3 +1103,48 @@ def run_valueset_binding_report(npm_path_list, outdir, config_file):
 
     return 0
 
+
+##
+## write_server_matrix: compare the results of several terminology servers
+##
+def write_server_matrix(summaries, outdir):
+    """
+      Write a cross-server comparison of the summaries collected by run_example_check
+      and run_valueset_binding_report, one column per server.
+      ValueSet rows hold expansion counts, code rows hold the $validate-code result.
+      The Differs column flags rows where the servers don't agree.
+      Written as ServerComparison.tsv and ServerComparison.html in outdir.
+    """
+    servers = list(summaries)
+    rows = []
+
+    valuesets = {}
+    for summary in summaries.values():
+        for vs_url, info in summary.get('valuesets', {}).items():
+            valuesets.setdefault(vs_url, info['title'])
+    for vs_url, title in sorted(valuesets.items(), key=lambda item: item[1].lower()):
+        row = {'Type': 'ValueSet', 'System': vs_url, 'Item': title}
+        for server in servers:
+            row[server] = summaries[server].get('valuesets', {}).get(vs_url, {}).get('expansion', 'N/A')
+        rows.append(row)
+
+    codes = set()
+    for summary in summaries.values():
+        codes.update(summary.get('codes', {}))
+    for system, code in sorted(codes):
+        row = {'Type': 'Code', 'System': system, 'Item': code}
+        for server in servers:
+            row[server] = summaries[server].get('codes', {}).get((system, code), 'N/A')
+        rows.append(row)
+
+    for row in rows:
+        row['Differs'] = len({row[server] for server in servers}) > 1
+
+    df_matrix = pd.DataFrame(rows, columns=['Type', 'System', 'Item'] + servers + ['Differs'])
+    tsv_outfile = os.path.join(outdir, 'ServerComparison.tsv')
+    df_matrix.to_csv(tsv_outfile, sep='\t', index=False)
+    with open(os.path.join(outdir, 'ServerComparison.html'), 'w') as fh:
+        fh.write(df_matrix.to_html(index=False))
+    differing = int(df_matrix['Differs'].sum()) if not df_matrix.empty else 0
+    logger.info(f"Server comparison written to: {tsv_outfile} ({len(rows)} rows, {differing} differ)")
+    return df_matrix
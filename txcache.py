@@ -0,0 +1,113 @@
+import os
+import json
+import time
+import sqlite3
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+##
+## ResultCache: persistent on-disk cache of terminology server answers
+##
+class ResultCache:
+    """
+    SQLite-backed cache of terminology operation results that survives between runs.
+
+    Entries are keyed by endpoint, operation, the CodeSystem/ValueSet url and version,
+    and the coding (system and code). Each entry carries its own expiry time.
+
+    Args:
+        path: SQLite database file (created if missing)
+        ttl: default time-to-live in seconds for new entries
+        refresh: if True, ignore existing entries (always a miss) but store new answers
+    """
+
+    def __init__(self, path, ttl=7 * 24 * 3600, refresh=False):
+        self.path = path
+        self.ttl = ttl
+        self.refresh = refresh
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS results (
+                endpoint TEXT NOT NULL,
+                operation TEXT NOT NULL,
+                url TEXT NOT NULL,
+                version TEXT NOT NULL,
+                system TEXT NOT NULL,
+                code TEXT NOT NULL,
+                result TEXT NOT NULL,
+                expires REAL NOT NULL,
+                PRIMARY KEY (endpoint, operation, url, version, system, code)
+            )""")
+        self._conn.execute("DELETE FROM results WHERE expires < ?", (time.time(),))
+        self._conn.commit()
+
+    @staticmethod
+    def _key(endpoint, operation, url, version=None, system=None, code=None):
+        return (endpoint, operation, url, version or '', system or '', code or '')
+
+    def get(self, endpoint, operation, url, version=None, system=None, code=None):
+        """Return the cached result dict, or None on a miss (or an expired entry)"""
+        row = None
+        if not self.refresh:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT result, expires FROM results WHERE endpoint=? AND operation=? AND url=? "
+                    "AND version=? AND system=? AND code=?",
+                    self._key(endpoint, operation, url, version, system, code)).fetchone()
+        hit = row is not None and row[1] >= time.time()
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+        return json.loads(row[0]) if hit else None
+
+    def put(self, endpoint, operation, url, version=None, system=None, code=None, result=None, ttl=None):
+        """Store a result dict, expiring after ttl seconds (default: the cache ttl)"""
+        expires = time.time() + (ttl if ttl is not None else self.ttl)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (*self._key(endpoint, operation, url, version, system, code), json.dumps(result), expires))
+            self._conn.commit()
+
+    def stats(self):
+        with self._lock:
+            hits, misses = self.hits, self.misses
+        total = hits + misses
+        rate = (100.0 * hits / total) if total else 0.0
+        return {"hits": hits, "misses": misses, "hit_rate": rate}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+_cache = None
+
+def get_cache():
+    """Return the configured persistent cache, or None if caching is disabled"""
+    return _cache
+
+def configure_cache(cache_dir, ttl=None, refresh=False):
+    """
+    Open (or create) the persistent terminology cache under cache_dir and make it
+    the process-wide cache. Pass cache_dir=None to disable caching.
+    """
+    global _cache
+    if _cache is not None:
+        _cache.close()
+        _cache = None
+    if cache_dir:
+        os.makedirs(cache_dir, exist_ok=True)
+        path = os.path.join(cache_dir, "tx-cache.sqlite")
+        _cache = ResultCache(path, ttl=ttl, refresh=refresh) if ttl is not None else ResultCache(path, refresh=refresh)
+        logger.info(f"Using terminology result cache: {path}{' (refreshing)' if refresh else ''}")
+    return _cache
@@ -0,0 +1,351 @@
+import time
+import random
+import logging
+import threading
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+import requests
+from requests.adapters import HTTPAdapter
+from utils import TX_CLIENT_DEFAULTS
+
+logger = logging.getLogger(__name__)
+
+##
+## RateLimiter: client-side token bucket that adapts to server throttling
+##
+class RateLimiter:
+    """
+    Token bucket limiting requests per second to one endpoint.
+
+    The rate adapts AIMD-style: every successful (non-5xx) response nudges it up additively
+    (by roughly one request/second per second of traffic), while a throttled
+    response (429/503) halves it and pauses all callers until the server's
+    Retry-After has passed.
+
+    Args:
+        rate: starting requests per second
+        min_rate: the rate never drops below this
+        max_rate: the rate never grows above this
+    """
+
+    def __init__(self, rate, min_rate, max_rate):
+        self.rate = float(rate)
+        self.min_rate = float(min_rate)
+        self.max_rate = float(max_rate)
+        self._tokens = 1.0
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Block until a request may be sent"""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now >= self._paused_until:
+                    self._tokens = min(max(self.rate, 1.0), self._tokens + (now - self._last) * self.rate)
+                    self._last = now
+                    if self._tokens >= 1.0:
+                        self._tokens -= 1.0
+                        return
+                    wait = (1.0 - self._tokens) / self.rate
+                else:
+                    wait = self._paused_until - now
+            time.sleep(wait)
+
+    def on_success(self):
+        with self._lock:
+            self.rate = min(self.max_rate, self.rate + 1.0 / self.rate)
+
+    def on_throttle(self, retry_after):
+        with self._lock:
+            self.rate = max(self.min_rate, self.rate / 2.0)
+            self._tokens = 0.0
+            self._last = time.monotonic()
+            self._paused_until = max(self._paused_until, self._last + retry_after)
+
+
+##
+## CircuitBreaker: stop calling an endpoint after repeated failures
+##
+class CircuitBreaker:
+    """
+    Per-endpoint circuit breaker.
+
+    After `threshold` consecutive failed requests the breaker opens and every
+    further call is refused straight away (EndpointUnavailable) instead of
+    waiting on another timeout. Once `reset_timeout` seconds have passed one
+    trial request is let through; success closes the breaker again.
+    """
+
+    def __init__(self, threshold, reset_timeout):
+        self.threshold = threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            if not self._trial_in_flight and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self._trial_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial_in_flight = False
+
+    def record_failure(self):
+        """Count a failure; return True if this failure tripped the breaker"""
+        with self._lock:
+            self.failures += 1
+            if self.opened_at is not None:
+                # A failed trial request keeps the breaker open for another period
+                self.opened_at = time.monotonic()
+                self._trial_in_flight = False
+                return False
+            if self.failures >= self.threshold:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+
+class EndpointUnavailable(Exception):
+    """Raised instead of sending a request while an endpoint's circuit breaker is open"""
+
+
+def parse_retry_after(value, default=1.0):
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date)"""
+    if not value:
+        return default
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, (parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds())
+    except (TypeError, ValueError):
+        return default
+
+
+##
+## TerminologyClient: shared HTTP client for all terminology server traffic
+##
+class TerminologyClient:
+    """
+    Pooled HTTP client used for every request to a terminology server.
+
+    One requests.Session is kept per endpoint (scheme + host), so connections are
+    reused across calls instead of paying a new TCP/TLS handshake each time. All
+    requests ask for FHIR JSON with gzip encoding and get a default timeout.
+
+    Requests to each endpoint pass through a RateLimiter. Throttled responses
+    (429 Too Many Requests, or 503 Service Unavailable with a Retry-After) are
+    retried after the server's Retry-After rather than being handed back to the
+    caller. A 503 without Retry-After is treated as a server error.
+
+    Idempotent requests (GETs, and POSTs the caller marks idempotent) that fail
+    with a connection error, timeout or 5xx are retried with jittered exponential
+    backoff. Each endpoint has a CircuitBreaker; while it is open requests raise
+    EndpointUnavailable without touching the network. Server errors and responses
+    still throttled after every throttle retry count as breaker failures.
+
+    Args:
+        options: tx-client-options settings; missing keys use TX_CLIENT_DEFAULTS
+    """
+
+    THROTTLE_STATUSES = (429, 503)
+    RETRY_STATUSES = (500, 502, 503, 504)
+
+    DEFAULT_HEADERS = {
+        'Accept': 'application/fhir+json',
+        'Accept-Encoding': 'gzip'
+    }
+
+    def __init__(self, options=None):
+        settings = dict(TX_CLIENT_DEFAULTS)
+        settings.update(options or {})
+        self.pool_size = settings["pool-size"]
+        self.timeout = settings["timeout"]
+        self.rate = settings["requests-per-second"]
+        self.min_rate = settings["min-requests-per-second"]
+        self.max_rate = settings["max-requests-per-second"]
+        self.throttle_retries = settings["throttle-retries"]
+        self.max_retries = settings["max-retries"]
+        self.backoff_base = settings["backoff-base-seconds"]
+        self.backoff_max = settings["backoff-max-seconds"]
+        self.breaker_threshold = settings["breaker-threshold"]
+        self.breaker_reset = settings["breaker-reset-seconds"]
+        self.throttled = 0
+        self.retries = 0
+        self.breaker_trips = 0
+        self._sessions = {}
+        self._limiters = {}
+        self._breakers = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _endpoint_key(url):
+        parts = urlsplit(url)
+        return (parts.scheme, parts.netloc)
+
+    def session(self, url):
+        """Return the pooled session for the endpoint that serves url"""
+        key = self._endpoint_key(url)
+        with self._lock:
+            session = self._sessions.get(key)
+            if session is None:
+                session = requests.Session()
+                adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+                session.mount(f"{key[0]}://", adapter)
+                session.headers.update(self.DEFAULT_HEADERS)
+                self._sessions[key] = session
+                logger.debug(f"Opened connection pool for {key[0]}://{key[1]} (size {self.pool_size})")
+        return session
+
+    def limiter(self, url):
+        """Return the rate limiter for the endpoint that serves url"""
+        key = self._endpoint_key(url)
+        with self._lock:
+            limiter = self._limiters.get(key)
+            if limiter is None:
+                limiter = RateLimiter(self.rate, self.min_rate, self.max_rate)
+                self._limiters[key] = limiter
+        return limiter
+
+    def breaker(self, url):
+        """Return the circuit breaker for the endpoint that serves url"""
+        key = self._endpoint_key(url)
+        with self._lock:
+            breaker = self._breakers.get(key)
+            if breaker is None:
+                breaker = CircuitBreaker(self.breaker_threshold, self.breaker_reset)
+                self._breakers[key] = breaker
+        return breaker
+
+    def is_throttled(self, response):
+        """429, or 503 with a Retry-After; a bare 503 is an outage rather than throttling"""
+        if response.status_code not in self.THROTTLE_STATUSES:
+            return False
+        return response.status_code != 503 or bool(response.headers.get('Retry-After'))
+
+    def backoff(self, attempt):
+        """Full-jitter exponential backoff delay for a retry attempt (1-based)"""
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    def _record_failure(self, url, breaker):
+        if breaker.record_failure():
+            with self._lock:
+                self.breaker_trips += 1
+            logger.error(f"Circuit breaker opened for {urlsplit(url).netloc} after {breaker.failures} consecutive failures")
+
+    def _send(self, method, url, timeout, **kwargs):
+        """Send one request, waiting out any throttling"""
+        session = self.session(url)
+        limiter = self.limiter(url)
+        attempt = 0
+        while True:
+            limiter.acquire()
+            response = session.request(method, url, timeout=timeout or self.timeout, **kwargs)
+            if not self.is_throttled(response):
+                # A failing server mustn't earn a higher rate; backoff and the breaker handle 5xx
+                if response.status_code < 500:
+                    limiter.on_success()
+                return response
+            retry_after = parse_retry_after(response.headers.get('Retry-After'))
+            limiter.on_throttle(retry_after)
+            with self._lock:
+                self.throttled += 1
+            if attempt >= self.throttle_retries:
+                logger.warning(f"{method} {url} still throttled (http status: {response.status_code}) after {attempt} retries")
+                return response
+            attempt += 1
+            logger.info(f"Throttled by {urlsplit(url).netloc} (http status: {response.status_code}), "
+                        f"retrying in {retry_after:.1f}s at {limiter.rate:.1f} requests/s")
+
+    def request(self, method, url, timeout=None, idempotent=None, **kwargs):
+        """
+        Send a request to a terminology server.
+
+        Raises EndpointUnavailable if the endpoint's circuit breaker is open, and
+        re-raises the last requests exception if every attempt failed to connect.
+        """
+        if idempotent is None:
+            idempotent = method in ('GET', 'HEAD')
+        breaker = self.breaker(url)
+        attempts = 1 + (self.max_retries if idempotent else 0)
+        for attempt in range(1, attempts + 1):
+            if not breaker.allow():
+                raise EndpointUnavailable(f"{urlsplit(url).netloc} is unavailable (circuit breaker open)")
+            try:
+                response = self._send(method, url, timeout, **kwargs)
+            except requests.RequestException as e:
+                self._record_failure(url, breaker)
+                if attempt == attempts:
+                    raise
+                failure = str(e)
+            else:
+                if self.is_throttled(response):
+                    # Still throttled after waiting: not retried again, but it counts against
+                    # the breaker (and ends a half-open trial, which would otherwise stay in flight)
+                    self._record_failure(url, breaker)
+                    return response
+                if response.status_code not in self.RETRY_STATUSES:
+                    breaker.record_success()
+                    return response
+                self._record_failure(url, breaker)
+                if attempt == attempts:
+                    return response
+                failure = f"http status: {response.status_code}"
+            delay = self.backoff(attempt)
+            with self._lock:
+                self.retries += 1
+            logger.info(f"{method} {url} failed ({failure}), retry {attempt} of {attempts - 1} in {delay:.1f}s")
+            time.sleep(delay)
+
+    def get(self, url, **kwargs):
+        return self.request('GET', url, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.request('POST', url, **kwargs)
+
+    def stats(self):
+        return {"retries": self.retries, "throttled": self.throttled, "breaker_trips": self.breaker_trips}
+
+    def close(self):
+        with self._lock:
+            for session in self._sessions.values():
+                session.close()
+            self._sessions.clear()
+
+
+_client = None
+_client_lock = threading.Lock()
+
+def get_client():
+    """Return the process-wide terminology client, creating it with defaults if needed"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = TerminologyClient()
+        return _client
+
+def configure_client(options):
+    """
+    Replace the process-wide terminology client using the tx-client-options config
+    (see utils.get_tx_client_options)
+    """
+    global _client
+    client = TerminologyClient(options)
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = client
+    return client
@@ -15,6 +15,14 @@ def check_path(path):
             print(f"Error creating directory: {e}")
             sys.exit(1)
 
+##
+## endpoint_slug():
+## Filesystem-safe name for a terminology server endpoint,
+## e.g. https://tx.fhir.org/r4 -> tx.fhir.org_r4
+##
+def endpoint_slug(endpoint):
+    return endpoint.replace('http://', '').replace('https://', '').replace('/', '_').replace(':', '_')
+
 ## get_config()
 ## get the json config file for this script
 ## return: dict containing the contents of the config of the specifc section based on the keys
@@ -26,6 +34,38 @@ def get_config(filepath,key=None):
         return config[key]        
     return config
 
+## get_tx_client_options()
+## get the terminology client tuning options, falling back to defaults for any
+## missing keys (or a missing 'tx-client-options' section)
+
+TX_CLIENT_DEFAULTS = {
+    "max-concurrent-requests": 8,
+    "batch-size": 0,
+    "pool-size": 8,
+    "timeout": 30,
+    "cache-ttl-hours": 168,
+    "requests-per-second": 10,
+    "min-requests-per-second": 1,
+    "max-requests-per-second": 50,
+    "throttle-retries": 5,
+    "max-retries": 3,
+    "backoff-base-seconds": 0.5,
+    "backoff-max-seconds": 30,
+    "breaker-threshold": 5,
+    "breaker-reset-seconds": 60,
+    "expansion-prefetch-limit": 0,
+    "expansion-page-size": 1000
+}
+
+def get_tx_client_options(filepath):
+    options = dict(TX_CLIENT_DEFAULTS)
+    try:
+        configured = get_config(filepath, "tx-client-options") or {}
+    except Exception:
+        configured = {}
+    options.update(configured)
+    return options
+
 ##
 ## split node path: Split up the node_modules path to the IG name and file
 ##